@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, Category,SubCategory,CartItem,Cart,OrderItem,Order,WishlistItem,Wishlist,Seller,DeliveryAgent,DeliveryAssignment,UserAddress
+from .models import Product, Category,SubCategory,CartItem,Cart,OrderItem,Order,WishlistItem,Wishlist,Seller,DeliveryAgent,DeliveryAssignment,UserAddress,StockReservation,IdempotencyKey,Task,RequestProfile,Notification,ProductRecommendation,JobCheckpoint,SalesRollup,Promotion
 
 # Register your models
 admin.site.register(Category)
@@ -15,4 +15,13 @@ admin.site.register(Seller)
 admin.site.register(DeliveryAssignment)
 admin.site.register(DeliveryAgent)
 admin.site.register(UserAddress)
+admin.site.register(StockReservation)
 
+admin.site.register(IdempotencyKey)
+admin.site.register(Task)
+admin.site.register(RequestProfile)
+admin.site.register(Notification)
+admin.site.register(ProductRecommendation)
+admin.site.register(JobCheckpoint)
+admin.site.register(SalesRollup)
+admin.site.register(Promotion)
@@ -0,0 +1,297 @@
+"""
+Async versions of the read-heavy endpoints, for ASGI deployments.
+
+With ASYNC_VIEWS set, api/urls.py routes the catalog, product detail, order
+history, delivery feed, seller dashboard and login to these views instead of
+their views.py counterparts. The responses are the same, ETags included, but
+a worker waiting on the database keeps serving other requests. DRF has no
+async views, so `async_api_view` does what @api_view does for these
+endpoints: method check, JWT authentication, permission classes, error
+responses and JSON rendering.
+
+Django's async ORM runs one query at a time per request. Where a view needs
+several independent queries, `gather_queries` runs them side by side on a
+pool of ASYNC_QUERY_WORKERS threads. Password hashing at login runs on its
+own pool of ASYNC_PASSWORD_HASH_WORKERS threads, so a burst of logins can't
+use every thread.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import InvalidPage, Paginator
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.decorators import permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .conditional import aconditional
+from .db_router import replica_reads
+from .guest_cart import merge_guest_cart
+from .models import Category, DeliveryAgent, DeliveryAssignment, Order, Product, Seller, SubCategory
+from .pagination import OrderHistoryPagination
+from .recommendations import recommendations_for
+from .serializers import (
+    CategorySerializer, DeliveryAssignmentSerializer, ProductSerializer, RecommendedProductSerializer,
+    SubCategorySerializer,
+)
+from .views import (
+    _order_history_query, _product_context, _seller_dashboard_data, _seller_dashboard_queries, _wishlist_etag,
+)
+
+
+_query_pool = ThreadPoolExecutor(max_workers=settings.ASYNC_QUERY_WORKERS, thread_name_prefix='async-query')
+_password_pool = ThreadPoolExecutor(max_workers=settings.ASYNC_PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+
+
+def _on_pool_thread(func, *args, **kwargs):
+    # Pool threads keep their own connections; expire them the way Django does around a request
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_on_pool(pool, func, *args, **kwargs):
+    return await sync_to_async(_on_pool_thread, thread_sensitive=False, executor=pool)(func, *args, **kwargs)
+
+
+async def gather_queries(queries):
+    """Run a {name: callable} of independent sync queries concurrently; returns {name: result}."""
+    results = await asyncio.gather(*(run_on_pool(_query_pool, query) for query in queries.values()))
+    return dict(zip(queries, results))
+
+
+def _render(response):
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = JSONRenderer.media_type
+    response.renderer_context = {}
+    return response.render()
+
+
+def _error_response(request, exc):
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        exc.auth_header = request.authenticators[0].authenticate_header(request)
+    return exception_handler(exc, {'request': request})
+
+
+def async_api_view(http_method_names):
+    """
+    @api_view for async views. The view receives a DRF Request, so
+    `query_params`, `data` and `user` work as usual; @permission_classes goes
+    directly below this decorator, as with @api_view.
+    """
+    allowed = [method.upper() for method in http_method_names]
+
+    def decorator(view):
+        permissions = getattr(view, 'permission_classes', api_settings.DEFAULT_PERMISSION_CLASSES)
+
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request = Request(
+                request,
+                parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            )
+            try:
+                if request.method not in allowed:
+                    raise exceptions.MethodNotAllowed(request.method)
+                # Authentication loads the user, so it runs in a thread
+                await sync_to_async(lambda: request.user)()
+                for permission in permissions:
+                    if not permission().has_permission(request, None):
+                        if request.authenticators and not request.successful_authenticator:
+                            raise exceptions.NotAuthenticated()
+                        raise exceptions.PermissionDenied()
+                response = await view(request, *args, **kwargs)
+            except (exceptions.APIException, Http404, PermissionDenied) as exc:
+                response = _error_response(request, exc)
+            if isinstance(response, Response):
+                response = _render(response)
+            # The headers APIView.finalize_response adds
+            response['Allow'] = ', '.join(allowed)
+            patch_vary_headers(response, ['Accept'])
+            return response
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+# ------------------- Product and Category -------------------
+
+@async_api_view(['GET'])
+@replica_reads
+@aconditional(lambda request: Category.objects.all())
+async def get_categories(request):
+    categories = [category async for category in Category.objects.all()]
+    serializer = CategorySerializer(categories, many=True)
+    return Response(serializer.data)
+
+
+@async_api_view(['GET'])
+@replica_reads
+@aconditional(lambda request, category_id: SubCategory.objects.filter(category_id=category_id))
+async def get_subcategories(request, category_id):
+    subcategories = [sub async for sub in SubCategory.objects.filter(category_id=category_id).select_related('category')]
+    serializer = SubCategorySerializer(subcategories, many=True)
+    return Response(serializer.data)
+
+
+@async_api_view(['GET'])
+@replica_reads
+@aconditional(lambda request, category_slug: SubCategory.objects.filter(category__slug=category_slug))
+async def get_subcategories_by_slug(request, category_slug):
+    category = await aget_object_or_404(Category, slug=category_slug)
+    subcategories = [sub async for sub in SubCategory.objects.filter(category=category).select_related('category')]
+    serializer = SubCategorySerializer(subcategories, many=True)
+    return Response(serializer.data)
+
+
+@async_api_view(['GET'])
+@replica_reads
+@aconditional(lambda request: Product.objects.all(), vary_on=_wishlist_etag)
+async def get_products(request):
+    context = await sync_to_async(_product_context)(request)
+    products = ProductSerializer.setup_queryset(Product.objects.all(), context).order_by('-created_at')
+    serializer = ProductSerializer([product async for product in products], many=True, context=context)
+    return Response(serializer.data)
+
+
+@async_api_view(['GET'])
+@replica_reads
+@aconditional(lambda request, category_slug, subcategory_slug: Product.objects.filter(
+    subcategory__category__slug=category_slug, subcategory__slug=subcategory_slug), vary_on=_wishlist_etag)
+async def get_products_by_subcategory_slug(request, category_slug, subcategory_slug):
+    subcategory = await aget_object_or_404(
+        SubCategory.objects.select_related('category'), category__slug=category_slug, slug=subcategory_slug
+    )
+    context = await sync_to_async(_product_context)(request)
+    products = ProductSerializer.setup_queryset(Product.objects.filter(subcategory=subcategory), context)
+    serializer = ProductSerializer([product async for product in products], many=True, context=context)
+    return Response({
+        "category": subcategory.category.name,
+        "subcategory": subcategory.name,
+        "products": serializer.data
+    })
+
+
+@async_api_view(['GET'])
+@replica_reads
+@aconditional(lambda request, product_id: Product.objects.filter(id=product_id), vary_on=_wishlist_etag)
+async def get_product_detail(request, product_id):
+    context = await sync_to_async(_product_context)(request)
+    product = await aget_object_or_404(ProductSerializer.setup_queryset(Product.objects.all(), context), id=product_id)
+    data = ProductSerializer(product, context=context).data
+    if context.get('fields') is None or 'frequently_bought_together' in context['fields']:
+        recommendations = [row async for row in recommendations_for(product.id)]
+        data['frequently_bought_together'] = RecommendedProductSerializer(recommendations, many=True).data
+    return Response(data)
+
+
+# ------------------- User Authentication -------------------
+
+@async_api_view(['POST'])
+async def login_user(request):
+    data = request.data
+    username = data.get('username')
+    password = data.get('password')
+
+    user = await run_on_pool(_password_pool, authenticate, username=username, password=password)
+
+    if user is None:
+        return Response({'error': 'Invalid username or password'}, status=status.HTTP_400_BAD_REQUEST)
+
+    refresh = RefreshToken.for_user(user)
+
+    # Include is_staff to check admin
+    response = Response({
+        'user_id': user.id,
+        'username': user.username,
+        'is_staff': user.is_staff,
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+    })
+    await sync_to_async(merge_guest_cart)(request, user, response)
+    return response
+
+
+# ------------------- Orders -------------------
+
+async def _paginated(request, orders, serializer_class, context):
+    """OrderHistoryPagination's page, counted and sliced on the async ORM."""
+    pagination = OrderHistoryPagination()
+    page_size = pagination.get_page_size(request)
+    # A range stands in for the rows so Paginator only does the page arithmetic
+    paginator = Paginator(range(await orders.acount()), page_size)
+    page_number = request.query_params.get(pagination.page_query_param) or 1
+    if page_number in pagination.last_page_strings:
+        page_number = paginator.num_pages
+    try:
+        page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise exceptions.NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    start = (page.number - 1) * page_size
+    rows = [order async for order in orders[start:start + page_size]]
+    pagination.page, pagination.request = page, request
+    return pagination.get_paginated_response(serializer_class(rows, many=True, context=context).data)
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@aconditional(lambda request: Order.objects.filter(user=request.user))
+async def get_orders(request):
+    try:
+        orders, serializer_class, context = _order_history_query(request, Order.objects.filter(user=request.user))
+    except ValueError:
+        return Response({"error": "Dates must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+    if 'page' in request.query_params or 'page_size' in request.query_params:
+        return await _paginated(request, orders, serializer_class, context)
+    serializer = serializer_class([order async for order in orders], many=True, context=context)
+    return Response(serializer.data)
+
+
+# ------------------- Delivery agent -------------------
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def get_assigned_orders(request):
+    """
+    Delivery agent retrieves all orders assigned to them.
+    """
+    agent = await DeliveryAgent.objects.filter(user=request.user).afirst()
+    if agent is None:
+        return Response({"error": "You are not a registered delivery agent."}, status=status.HTTP_403_FORBIDDEN)
+
+    assignments = (
+        DeliveryAssignment.objects.filter(delivery_agent=agent).select_related('order__user').order_by('-assigned_at')
+    )
+    serializer = DeliveryAssignmentSerializer([assignment async for assignment in assignments], many=True)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+# ------------------- Seller -------------------
+
+@async_api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+async def seller_dashboard(request):
+    seller = await Seller.objects.filter(user=request.user).afirst()
+    if seller is None:
+        return Response({"error": "Seller profile not found"}, status=404)
+
+    results = await gather_queries(_seller_dashboard_queries(seller))
+    return Response(_seller_dashboard_data(request.user, seller, results))
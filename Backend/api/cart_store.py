@@ -0,0 +1,324 @@
+"""
+Logged-in carts, kept in the cache and written to the database behind.
+
+Each user's cart is one cache entry: the Cart row's id and creation time
+plus a list of [product_id, quantity, cart_item_id] lines. The cart views
+read and change the entry, never the CartItem table. When an entry is
+missing, it is rebuilt from the database copy. Losing the cache therefore
+loses at most the changes that hadn't been written yet.
+
+A change marks the entry dirty and queues the `flush_cart` task to run
+CART_WRITE_BEHIND_DELAY seconds later, unless one is already queued. Every
+change in that window goes out in the same flush: a delete of the removed
+lines and one bulk upsert of the rest. Checkout (`checkout()`) flushes
+synchronously before it reads CartItem. With a delay of 0 every change is
+written through at once, and cached only once it's written.
+
+All of this needs a cache every web and task worker shares. Without one
+(CART_CACHE off, the default without REDIS_URL) each process would keep its
+own, soon stale, copy of a cart, so entries are read from and written to
+CartItem directly, with the Cart row locked instead of the cache lock.
+
+A short per-user lock in the cache serializes the changes and flushes of
+one cart. A change that can't get it within LOCK_WAIT seconds, e.g. during
+a slow checkout, raises CartBusy rather than going ahead unlocked.
+CartItem rows edited directly, e.g. in the admin, show up once the entry
+expires after CART_CACHE_TIMEOUT.
+
+With CART_CACHE on, the product fields a cart shows are cached per product
+and shared by all carts, guest carts included (see guest_cart.py). Product
+save/delete signals drop them. Without it they're read with the cart. Promotions are applied as the cart is rendered (see
+promotions.py). Items get `discount` and `promotions`, and `total_price`
+is net of them.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Cart, CartItem, Product
+from .promotions import price_lines
+from .serializers import CartSerializer, ProductSerializer, check_selection
+
+
+LOCK_TIMEOUT = 30  # seconds; a crashed holder's lock expires after this
+LOCK_WAIT = 5
+
+
+def _cache_key(user_id):
+    return f'cart:{user_id}'
+
+
+def _product_key(product_id):
+    return f'cart:product:{product_id}'
+
+
+class CartBusy(Exception):
+    """The cart is locked by a checkout or another change; try again shortly."""
+
+
+@contextmanager
+def _locked(user_id, wait=None):
+    """Hold the user's cart lock; yields False if it couldn't be had within `wait` (LOCK_WAIT) seconds."""
+    if not settings.CART_CACHE:
+        # The Cart row is the lock; it's taken by _from_db(lock=True) inside this transaction
+        with transaction.atomic():
+            yield True
+        return
+    key = f'cart:{user_id}:lock'
+    deadline = time.monotonic() + (LOCK_WAIT if wait is None else wait)
+    acquired = cache.add(key, 1, LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.01)
+        acquired = cache.add(key, 1, LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+@contextmanager
+def _changing(user_id):
+    with _locked(user_id) as acquired:
+        if not acquired:
+            raise CartBusy(user_id)
+        yield
+
+
+# ------------------- Products -------------------
+
+def product_lookup(product_ids):
+    """{product_id: ProductSerializer data} for the ids that still exist, from the cache where possible."""
+    if not settings.CART_CACHE:
+        return _products_from_db(product_ids)
+    keys = {_product_key(product_id): product_id for product_id in product_ids}
+    found = {keys[key]: entry for key, entry in cache.get_many(keys).items()}
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    if missing:
+        fresh = _products_from_db(missing)
+        cache.set_many({_product_key(product_id): entry for product_id, entry in fresh.items()},
+                       settings.CART_PRODUCT_CACHE_TIMEOUT)
+        found.update(fresh)
+    return found
+
+
+def _products_from_db(product_ids):
+    if not product_ids:
+        return {}
+    products = ProductSerializer.setup_queryset(Product.objects.filter(pk__in=product_ids))
+    return {row['id']: dict(row) for row in ProductSerializer(products, many=True).data}
+
+
+def invalidate_products(product_ids):
+    cache.delete_many([_product_key(product_id) for product_id in product_ids])
+
+
+def _select(data, selection, expand):
+    # DynamicFieldsMixin's pruning, applied to already rendered data
+    check_selection(data, selection, expand)
+    selected = {}
+    for name, value in data.items():
+        if name not in selection and name not in expand:
+            continue
+        if selection.get(name):
+            nested = (selection[name], expand.get(name) or {})
+            if isinstance(value, list):
+                value = [_select(item, *nested) for item in value]
+            elif isinstance(value, dict):
+                value = _select(value, *nested)
+        selected[name] = value
+    return selected
+
+
+def cart_data(entry, context=None, coupon=None):
+    """
+    The cart entry in the shape CartSerializer renders, honouring
+    ?fields=/?expand= in `context`, with promotions (and the coupon, a rule
+    from promotions.find_coupon) applied to each item.
+    """
+    products = product_lookup([product_id for product_id, _, _ in entry['lines']])
+    lines = [(products[product_id], quantity, item_id)
+             for product_id, quantity, item_id in entry['lines']
+             if product_id in products]  # deleted since it was added
+    priced = price_lines([
+        {'product_id': product['id'], 'subcategory_id': product['subcategory'], 'category_id': product['category'],
+         'seller_id': product['seller'], 'unit_price': product['discounted_price'], 'quantity': quantity}
+        for product, quantity, _ in lines
+    ], coupon)
+    items = [
+        {'id': item_id, 'product': product, 'discounted_price': product['discounted_price'], 'quantity': quantity,
+         'discount': promotion['discount'], 'promotions': promotion['promotions']}
+        for (product, quantity, item_id), promotion in zip(lines, priced)
+    ]
+    data = {
+        'id': entry['id'],
+        'user': entry['user'],
+        'items': items,
+        'discount': round(sum(item['discount'] for item in items), 2),
+        'total_price': sum(item['discounted_price'] * item['quantity'] - item['discount'] for item in items),
+        'coupon': coupon['code'] if coupon else None,
+        'created_at': entry['created_at'],
+    }
+    context = context or {}
+    if context.get('fields') is None:
+        return data
+    return _select(data, context['fields'], context.get('expand') or {})
+
+
+# ------------------- Cart entries -------------------
+
+def db_queries(user_id, cart_id):
+    """The queries that rebuild an entry; `manage.py audit_query_plans` EXPLAINs them."""
+    return (
+        Cart.objects.filter(user_id=user_id),
+        CartItem.objects.filter(cart_id=cart_id).order_by('pk').values_list('product_id', 'quantity', 'id'),
+    )
+
+
+def _from_db(user_id, lock=False):
+    carts = db_queries(user_id, None)[0]
+    cart = (carts.select_for_update() if lock else carts).first()
+    if cart is None:
+        return {'id': None, 'user': user_id, 'created_at': None, 'lines': [], 'dirty': False}
+    entry = dict(CartSerializer(cart, context={'fields': {'id': {}, 'user': {}, 'created_at': {}}}).data)
+    entry['lines'] = [list(line) for line in db_queries(user_id, cart.pk)[1]]
+    entry['dirty'] = False
+    return entry
+
+
+def load(user):
+    """The user's cart entry, rebuilt from the database when the cache doesn't have it."""
+    if not settings.CART_CACHE:
+        return _from_db(user.pk)
+    entry = cache.get(_cache_key(user.pk))
+    if entry is None:
+        entry = _from_db(user.pk)
+        # add, not set: a change saved meanwhile wins over this copy
+        cache.add(_cache_key(user.pk), entry, settings.CART_CACHE_TIMEOUT)
+    return entry
+
+
+def _load_for_change(user):
+    # Caller holds the lock
+    if settings.CART_CACHE:
+        return load(user)
+    # Created first so there's a row to lock, even for the first add
+    Cart.objects.get_or_create(user=user)
+    return _from_db(user.pk, lock=True)
+
+
+def quantities(user):
+    """{product_id: quantity} in the user's cart."""
+    return {product_id: quantity for product_id, quantity, _ in load(user)['lines']}
+
+
+def _save(user, entry):
+    # Caller holds the lock
+    if entry['id'] is None:
+        cart, _ = Cart.objects.get_or_create(user=user)
+        entry.update(CartSerializer(cart, context={'fields': {'id': {}, 'user': {}, 'created_at': {}}}).data)
+    delay = settings.CART_WRITE_BEHIND_DELAY
+    if not settings.CART_CACHE or not delay:
+        # Written first, so a write that fails never leaves its entry behind in the cache
+        entry['lines'] = _write(entry)
+        entry['dirty'] = False
+        if settings.CART_CACHE:
+            cache.set(_cache_key(user.pk), entry, settings.CART_CACHE_TIMEOUT)
+        return
+    entry['dirty'] = True
+    cache.set(_cache_key(user.pk), entry, settings.CART_CACHE_TIMEOUT)
+    from .tasks import flush_cart
+
+    # One queued flush per cart picks up every change until it runs
+    if cache.add(f'cart:{user.pk}:flush', 1, delay + LOCK_TIMEOUT):
+        flush_cart.enqueue_in(delay, user.pk)
+
+
+def add(user, quantities_to_add):
+    """Add {product_id: quantity} to the user's cart; returns the updated entry. CartBusy if it's locked."""
+    if any(quantity < 1 for quantity in quantities_to_add.values()):
+        raise ValueError("Cart quantities must be at least 1")
+    with _changing(user.pk):
+        entry = _load_for_change(user)
+        lines = {line[0]: line for line in entry['lines']}
+        for product_id, quantity in quantities_to_add.items():
+            if product_id in lines:
+                lines[product_id][1] += quantity
+            else:
+                entry['lines'].append([product_id, quantity, None])
+        _save(user, entry)
+    return entry
+
+
+def remove(user, product_id):
+    """Drop a product from the user's cart; the updated entry, or None if it wasn't there. CartBusy if it's locked."""
+    with _changing(user.pk):
+        entry = _load_for_change(user)
+        lines = [line for line in entry['lines'] if line[0] != product_id]
+        if len(lines) == len(entry['lines']):
+            return None
+        entry['lines'] = lines
+        _save(user, entry)
+    return entry
+
+
+def discard(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+# ------------------- Persistence -------------------
+
+def _write(entry):
+    """Make CartItem match the entry's lines; returns the lines with their CartItem ids."""
+    with transaction.atomic():
+        wanted = {product_id: quantity for product_id, quantity, _ in entry['lines']}
+        live = set(Product.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+        CartItem.objects.filter(cart_id=entry['id']).exclude(product_id__in=live).delete()
+        CartItem.objects.bulk_create(
+            [CartItem(cart_id=entry['id'], product_id=product_id, quantity=wanted[product_id]) for product_id in live],
+            update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity'],
+        )
+        item_ids = dict(CartItem.objects.filter(cart_id=entry['id']).values_list('product_id', 'id'))
+    return [[product_id, quantity, item_ids[product_id]]
+            for product_id, quantity, _ in entry['lines'] if product_id in item_ids]
+
+
+def _persist(user_id):
+    # Caller holds the lock
+    entry = cache.get(_cache_key(user_id))
+    if entry is None or not entry['dirty']:
+        return
+    if not Cart.objects.filter(pk=entry['id']).exists():
+        # The user was deleted
+        discard(user_id)
+        return
+    entry['lines'] = _write(entry)
+    entry['dirty'] = False
+    cache.set(_cache_key(user_id), entry, settings.CART_CACHE_TIMEOUT)
+
+
+def flush(user_id):
+    """Write the cached cart to CartItem. False if the cart is busy and the flush should be retried."""
+    cache.delete(f'cart:{user_id}:flush')
+    with _locked(user_id, wait=0) as acquired:
+        if acquired:
+            _persist(user_id)
+    return acquired
+
+
+@contextmanager
+def checkout(user):
+    """
+    Flush the user's cart to CartItem and keep it from changing while the
+    block runs, so checkout can read the database copy. Call discard() in
+    the block once the order has cleared the cart. CartBusy if it's locked.
+    """
+    with _changing(user.pk):
+        if settings.CART_CACHE:
+            _persist(user.pk)
+        else:
+            list(db_queries(user.pk, None)[0].select_for_update())
+        yield
@@ -0,0 +1,54 @@
+"""
+Name-to-slug lookups for the legacy name based catalog routes.
+
+Category and subcategory names are not unique, so the old
+`products/subcategory/<name>/` and `categories/<name>/subcategories/` routes
+resolve names through a small cached map instead of querying by name. The
+map is rebuilt lazily after any Category/SubCategory change (see signals.py).
+Without SHARED_CACHE a change could only drop the map in the process that
+made it, so the map is built from two small queries on every lookup instead.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Category, SubCategory
+
+
+CACHE_KEY = 'catalog:name_map'
+CACHE_TIMEOUT = 60 * 60
+
+
+def _build_name_map():
+    categories, subcategories = {}, {}
+    rows = SubCategory.objects.order_by('pk').values_list('id', 'name', 'slug', 'category_id', 'category__slug')
+    for sub_id, name, slug, category_id, category_slug in rows:
+        subcategories.setdefault(name, []).append(
+            {'id': sub_id, 'slug': slug, 'category_id': category_id, 'category_slug': category_slug}
+        )
+    for category_id, name, slug in Category.objects.order_by('pk').values_list('id', 'name', 'slug'):
+        categories.setdefault(name.lower(), {'id': category_id, 'slug': slug})
+    return {'categories': categories, 'subcategories': subcategories}
+
+
+def name_map():
+    if not settings.SHARED_CACHE:
+        return _build_name_map()
+    data = cache.get(CACHE_KEY)
+    if data is None:
+        data = _build_name_map()
+        cache.set(CACHE_KEY, data, CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_name_map():
+    cache.delete(CACHE_KEY)
+
+
+def category_for_name(name):
+    """{'id', 'slug'} of the category with this name (case-insensitive), or None."""
+    return name_map()['categories'].get(name.lower())
+
+
+def subcategories_for_name(name):
+    """Every subcategory called `name`, across all categories."""
+    return name_map()['subcategories'].get(name, [])
@@ -0,0 +1,73 @@
+"""
+Conditional GET (ETag / Last-Modified) for read endpoints.
+
+Each view declares the queryset its response is built from. Before the view
+runs, a single aggregate query computes `max(updated_at)` and `count(*)` over
+it; those two values are the resource version. If the client's
+If-None-Match / If-Modified-Since matches, Django's `condition` decorator
+answers 304 and the view (and its serializer) never runs.
+
+`aconditional` does the same for async views.
+"""
+import functools
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+
+def _version(request, queryset_func, field, args, kwargs):
+    # etag_func and last_modified_func both need it; compute once per request.
+    cached = getattr(request, '_resource_version', None)
+    if cached is None:
+        queryset = queryset_func(request, *args, **kwargs)
+        cached = queryset.order_by().aggregate(last_modified=Max(field), count=Count('pk'))
+        request._resource_version = cached
+    return cached
+
+
+def conditional(queryset_func, field='updated_at', vary_on=None):
+    """
+    Add ETag/Last-Modified support to a DRF function view.
+
+    `queryset_func(request, *args, **kwargs)` returns the rows the response is
+    built from. Place below @api_view/@permission_classes so `request.user`
+    is already authenticated. When the body also depends on who is asking,
+    `vary_on(request)` returns a string that is folded into the ETag.
+    """
+    def etag_func(request, *args, **kwargs):
+        version = _version(request, queryset_func, field, args, kwargs)
+        last_modified = version['last_modified']
+        token = f"{request.get_full_path()}:{version['count']}:{last_modified.isoformat() if last_modified else ''}"
+        if vary_on is not None:
+            token += f":{vary_on(request)}"
+        return hashlib.md5(token.encode()).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        if vary_on is not None:
+            # A date alone can't tell two users' responses apart.
+            return None
+        return _version(request, queryset_func, field, args, kwargs)['last_modified']
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+
+def aconditional(queryset_func, field='updated_at', vary_on=None):
+    """
+    `conditional` for async views. The version query runs on the async ORM
+    and `vary_on`, which may block, runs in a thread; `condition` then reads
+    both from the request. `queryset_func` must not query by itself.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            queryset = queryset_func(request, *args, **kwargs)
+            request._resource_version = await queryset.order_by().aaggregate(last_modified=Max(field), count=Count('pk'))
+            vary = None
+            if vary_on is not None:
+                token = await sync_to_async(vary_on)(request)
+                vary = lambda request: token
+            return await conditional(queryset_func, field, vary)(view)(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,206 @@
+"""
+Read replica routing.
+
+Only views decorated with @replica_reads read from a replica (catalog
+reads, reports, seller and admin listings). Everything else, and any read
+inside a transaction, goes to `default`. While such a view runs the
+router sends its reads to one healthy replica, picked at random.
+
+Read-your-writes: ReplicaPinMiddleware notes any write routed during a
+request. If there was one, the response carries a signed, timestamped pin
+in the `replica_pin` cookie and the X-Replica-Pin header (for clients that
+don't send cookies cross-origin). Requests that bring back a pin younger
+than REPLICA_PIN_SECONDS read from the primary, so the client's next page
+load sees its own change whichever worker serves it.
+
+Health: each replica is checked at most every REPLICA_HEALTH_CHECK_INTERVAL
+seconds per process. A connection error or replication lag above
+REPLICA_MAX_LAG takes it out of rotation until the next check. A view
+whose replica fails mid-request is re-run on the primary.
+"""
+import contextvars
+import functools
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, InterfaceError, OperationalError, connections
+
+
+logger = logging.getLogger(__name__)
+
+_read_alias = contextvars.ContextVar('replica_read_alias', default=None)
+_request_writes = contextvars.ContextVar('replica_request_writes', default=None)
+
+_health = {}  # alias -> (healthy, checked_at)
+
+POSTGRES_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def _check(alias):
+    try:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(POSTGRES_LAG_SQL)
+                lag = float(cursor.fetchone()[0] or 0)
+                if lag > settings.REPLICA_MAX_LAG:
+                    logger.warning("Replica %s is %.1fs behind; reading from the primary", alias, lag)
+                    return False
+            else:
+                cursor.execute("SELECT 1")
+    except DatabaseError as exc:
+        logger.warning("Replica %s is unreachable (%s); reading from the primary", alias, exc)
+        return False
+    return True
+
+
+def is_healthy(alias):
+    healthy, checked_at = _health.get(alias, (None, 0))
+    if time.monotonic() - checked_at >= settings.REPLICA_HEALTH_CHECK_INTERVAL:
+        healthy = _check(alias)
+        _health[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+def mark_unhealthy(alias):
+    _health[alias] = (False, time.monotonic())
+
+
+PIN_SALT = 'api.db_router.pin'
+PIN_COOKIE = 'replica_pin'
+PIN_HEADER = 'X-Replica-Pin'
+
+
+def is_pinned(request):
+    token = request.headers.get(PIN_HEADER) or request.COOKIES.get(PIN_COOKIE)
+    if not token:
+        return False
+    try:
+        signing.loads(token, salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def pin_to_primary(response):
+    """Send the client a pin that keeps its reads on the primary for REPLICA_PIN_SECONDS."""
+    token = signing.dumps(1, salt=PIN_SALT)
+    response.set_cookie(
+        PIN_COOKIE, token, max_age=settings.REPLICA_PIN_SECONDS,
+        httponly=True, samesite='Lax', secure=not settings.DEBUG,
+    )
+    response[PIN_HEADER] = token
+    return response
+
+
+def choose_replica(request):
+    """Replica alias for this request's reads, or None for the primary."""
+    aliases = replica_aliases()
+    if not aliases or is_pinned(request):
+        return None
+    healthy = [alias for alias in aliases if is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+def replica_reads(view):
+    """
+    Let a read-only view read from a replica. Place below @api_view and
+    @permission_classes so the user is authenticated on the primary first.
+    Works on async views too.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            alias = await sync_to_async(choose_replica)(request)
+            if alias is None:
+                return await view(request, *args, **kwargs)
+            token = _read_alias.set(alias)
+            try:
+                return await view(request, *args, **kwargs)
+            except (OperationalError, InterfaceError):
+                logger.warning("Read from %s failed; retrying on the primary", alias, exc_info=True)
+                mark_unhealthy(alias)
+            finally:
+                _read_alias.reset(token)
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = choose_replica(request)
+        if alias is None:
+            return view(request, *args, **kwargs)
+        token = _read_alias.set(alias)
+        try:
+            return view(request, *args, **kwargs)
+        except (OperationalError, InterfaceError):
+            logger.warning("Read from %s failed; retrying on the primary", alias, exc_info=True)
+            mark_unhealthy(alias)
+        finally:
+            _read_alias.reset(token)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        writes = _request_writes.get()
+        if writes is not None:
+            writes.append(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+
+class ReplicaPinMiddleware:
+    """Pin clients that wrote during a request to the primary for REPLICA_PIN_SECONDS."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        writes = []
+        token = _request_writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_writes.reset(token)
+        if writes and replica_aliases():
+            pin_to_primary(response)
+        return response
+
+    async def _acall(self, request):
+        writes = []
+        token = _request_writes.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_writes.reset(token)
+        if writes and replica_aliases():
+            pin_to_primary(response)
+        return response
@@ -0,0 +1,86 @@
+"""
+Carts for shoppers who haven't logged in, kept on the client.
+
+A guest cart is a signed, compressed list of [product_id, quantity] pairs.
+It travels in the `guest_cart` cookie, or in the X-Guest-Cart header for
+clients that don't send cookies cross-origin. Every guest cart response
+returns the updated value in both. The server stores nothing, so anonymous
+browsing and cart building don't write to the database.
+
+Products and totals come from the per-product cache in cart_store.py that
+logged-in carts use too.
+
+At login or registration `merge_guest_cart` adds the guest lines to the
+user's cart, each capped at the stock still available, and clears the
+cookie. If the user's cart is busy, the cookie is kept for the next login. The merge goes through cart_store, so the CartItem rows are
+written in its next flush, as one bulk upsert.
+"""
+from django.conf import settings
+from django.core import signing
+
+from . import cart_store
+from .cart_store import cart_data
+from .models import Product
+from .reservations import reserved_quantities
+
+
+SALT = 'api.guest_cart'
+COOKIE = 'guest_cart'
+HEADER = 'X-Guest-Cart'
+
+
+def load_guest_cart(request):
+    """{product_id: quantity} from the request; empty if missing, tampered with or expired."""
+    token = request.headers.get(HEADER) or request.COOKIES.get(COOKIE)
+    if not token:
+        return {}
+    try:
+        pairs = signing.loads(token, salt=SALT, max_age=settings.GUEST_CART_MAX_AGE)
+        return {int(product_id): int(quantity) for product_id, quantity in pairs if int(quantity) > 0}
+    except (signing.BadSignature, TypeError, ValueError):
+        return {}
+
+
+def attach_guest_cart(response, lines):
+    """Send the updated guest cart back in the cookie and the X-Guest-Cart header."""
+    if not lines:
+        response.delete_cookie(COOKIE)
+        response[HEADER] = ''
+        return response
+    token = signing.dumps(sorted(lines.items()), salt=SALT, compress=True)
+    response.set_cookie(
+        COOKIE, token, max_age=int(settings.GUEST_CART_MAX_AGE.total_seconds()),
+        httponly=True, samesite='Lax', secure=not settings.DEBUG,
+    )
+    response[HEADER] = token
+    return response
+
+
+def guest_cart_data(lines, context=None, coupon=None):
+    """The guest cart in the shape CartSerializer gives a user's cart."""
+    entry = {'id': None, 'user': None, 'created_at': None,
+             'lines': [[product_id, quantity, None] for product_id, quantity in lines.items()]}
+    return cart_data(entry, context, coupon)
+
+
+def merge_guest_cart(request, user, response):
+    """Add the request's guest cart to the user's cart and clear the cookie. Returns the lines merged."""
+    lines = load_guest_cart(request)
+    if not lines:
+        return 0
+    stock = dict(Product.objects.filter(pk__in=lines).values_list('id', 'stock'))
+    held = reserved_quantities(list(stock), exclude_user=user)
+    in_cart = cart_store.quantities(user)
+    lines = {
+        product_id: min(quantity, stock[product_id] - held.get(product_id, 0) - in_cart.get(product_id, 0))
+        for product_id, quantity in lines.items() if product_id in stock
+    }
+    lines = {product_id: quantity for product_id, quantity in lines.items() if quantity > 0}
+    if lines:
+        try:
+            cart_store.add(user, lines)
+        except cart_store.CartBusy:
+            # Keep the cookie; the next login or cart request can merge it
+            return 0
+    attach_guest_cart(response, {})
+    return len(lines)
@@ -0,0 +1,139 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that may retry a request sends the same `Idempotency-Key` header on
+every attempt. The first attempt claims the key by inserting an
+IdempotencyKey row (the unique (user, key) constraint is the lock), runs the
+view and stores the response. Later attempts replay the stored response
+without touching the view; attempts that arrive while the first one is still
+running wait for it to finish. Server errors and responses with a Retry-After
+header aren't stored, so their retries run the view again.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+DEFAULT_TTL = timedelta(hours=24)
+DEFAULT_WAIT_TIMEOUT = 10  # seconds
+POLL_INTERVAL = 0.1
+RETRY = object()
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method} {request.path} {body}".encode()).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """Return (record, created). Expired records are discarded and re-claimed."""
+    ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', DEFAULT_TTL)
+    while True:
+        try:
+            # Savepoint, so a lost race doesn't break an enclosing transaction
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    request_fingerprint=fingerprint,
+                    expires_at=timezone.now() + ttl,
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is None:
+                continue  # the holder gave up between our insert and read
+            if record.expires_at <= timezone.now():
+                record.delete()
+                continue
+            return record, False
+
+
+def _wait_for_completion(record):
+    """
+    Poll until the in-flight request stores its response. Returns the
+    finished record, RETRY if the first request failed and released the key,
+    or None on timeout.
+    """
+    timeout = getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', DEFAULT_WAIT_TIMEOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+        if record is None:
+            return RETRY
+        if record.status_code is not None:
+            return record
+    return None
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.status_code)
+    response[f'{HEADER}-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Honour the Idempotency-Key header on a DRF function view.
+
+    Goes below @api_view/@permission_classes so the request is already
+    authenticated. Requests without the header run normally.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        fingerprint = _fingerprint(request)
+        record, created = _claim(request.user, key[:255], fingerprint)
+
+        if not created:
+            if record.request_fingerprint != fingerprint:
+                return Response(
+                    {'error': f'{HEADER} was already used with a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.status_code is None:
+                record = _wait_for_completion(record)
+                if record is RETRY:
+                    return wrapper(request, *args, **kwargs)
+                if record is None:
+                    return Response(
+                        {'error': 'A request with this Idempotency-Key is still in progress'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+            return _replay(record)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500 or response.has_header('Retry-After'):
+            # Let the client retry server errors, and "try again" answers, for real.
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['status_code', 'response_body'])
+        return response
+
+    return wrapper
+
+
+def purge_expired():
+    return IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()[0]
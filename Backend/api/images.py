@@ -0,0 +1,91 @@
+"""
+Responsive variants of product images.
+
+Every uploaded Product.image gets resized WebP and JPEG copies stored next to
+the original (product_images/<name>_<variant>.<ext>). The paths are kept in
+Product.image_variants together with the source image they were built from,
+so regenerating is a no-op unless the image changed or `force` is given.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Product
+
+
+VARIANT_SIZES = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variants_are_current(product):
+    variants = product.image_variants or {}
+    return bool(product.image) and variants.get('source') == product.image.name
+
+
+def _variant_path(source_name, variant, ext):
+    stem, _ = os.path.splitext(source_name)
+    return f"{stem}_{variant}.{ext}"
+
+
+def generate_variants(product, force=False):
+    """
+    Build all variants for `product.image`. Returns True if anything was written.
+    """
+    if not product.image:
+        if product.image_variants:
+            Product.objects.filter(pk=product.pk).update(image_variants={})
+        return False
+    if not force and variants_are_current(product):
+        return False
+
+    storage = product.image.storage
+    with product.image.open('rb') as fh:
+        original = ImageOps.exif_transpose(Image.open(fh))
+        original.load()
+    if original.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', original.size, (255, 255, 255))
+        background.paste(original, mask=original.convert('RGBA').split()[-1])
+        original = background
+
+    variants = {'source': product.image.name}
+    for variant, size in VARIANT_SIZES.items():
+        resized = original.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        variants[variant] = {}
+        for ext, (pil_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.convert('RGB').save(buffer, pil_format, **options)
+            path = _variant_path(product.image.name, variant, ext)
+            if storage.exists(path):
+                storage.delete(path)
+            variants[variant][ext] = storage.save(path, ContentFile(buffer.getvalue()))
+
+    # update() rather than save() so the post_save hook doesn't fire again.
+    Product.objects.filter(pk=product.pk).update(image_variants=variants, updated_at=timezone.now())
+    product.image_variants = variants
+    return True
+
+
+def variant_urls(product, request=None):
+    """Return {variant: {format: url}} for the serializers, or None."""
+    if not variants_are_current(product):
+        return None
+    storage = product.image.storage
+    urls = {}
+    for variant in VARIANT_SIZES:
+        urls[variant] = {}
+        for ext, path in product.image_variants.get(variant, {}).items():
+            url = storage.url(path)
+            urls[variant][ext] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,29 @@
+"""
+Load-testing harness for the storefront, seller, delivery and admin APIs.
+
+Run it with `python manage.py loadtest` against a local database, e.g.
+
+    DATABASE_URL=sqlite:///loadtest.sqlite3 DATABASE_SSL_REQUIRE=False \
+        python manage.py loadtest --seed --clients 32 --duration 60 --output results.json
+
+`--seed` migrates and runs seed_marketplace when there are no load test
+products yet. The scenarios only use the load test's own accounts and the
+seeded products. Like seed_marketplace, the command refuses to run unless
+the database is SQLite or a test database, or --i-know-this-is-not-production
+is passed.
+The command boots the app in-process on a threaded WSGI server, drives a
+weighted mix of scenarios (see scenarios.py) from many concurrent clients and
+reports latency percentiles, throughput and queries per request for every
+endpoint. `--output` writes the same numbers as JSON so two commits can be
+compared with `python manage.py loadtest --compare old.json new.json`.
+
+`--server wsgi` and `--server asgi` instead serve the app from `--workers`
+gunicorn or uvicorn processes, the latter with ASYNC_VIEWS on, to compare
+the sync and async views at the same worker count:
+
+    python manage.py loadtest --server wsgi --workers 4 --output wsgi.json
+    python manage.py loadtest --server asgi --workers 4 --output asgi.json
+    python manage.py loadtest --compare wsgi.json asgi.json
+
+Those servers don't report queries per request.
+"""
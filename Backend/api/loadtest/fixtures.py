@@ -0,0 +1,62 @@
+"""
+Accounts and ids the load test scenarios use.
+
+`prepare_actors` creates the shopper, seller, delivery agent and admin
+accounts the scenarios log in as. JWTs are minted directly so password
+hashing doesn't dominate the measurements, and the accounts get random
+passwords nobody knows.
+
+Everything the scenarios touch was created by the load test: its own
+accounts, and the products of sellers whose usernames start with
+"loadtest-" (the ones `loadtest --seed` generates). Other rows are left
+alone, so checkouts never buy or restock real products.
+"""
+import secrets
+
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import Category, DeliveryAgent, Product, Seller, SubCategory
+
+
+PREFIX = 'loadtest-'
+
+
+def _account(username, **extra):
+    user, created = User.objects.get_or_create(username=username, defaults=extra)
+    if created:
+        user.set_password(secrets.token_urlsafe(24))
+        user.save()
+    return user
+
+
+def _token(user):
+    return str(RefreshToken.for_user(user).access_token)
+
+
+def prepare_actors(shoppers):
+    """Return the accounts and tokens the scenarios use."""
+    seller_user = Seller.objects.filter(is_verified=True, user__username__startswith=PREFIX).select_related('user').first()
+    if seller_user is None:
+        user = _account(f'{PREFIX}seller')
+        seller_user = Seller.objects.create(user=user, store_name='Load Test Seller', is_verified=True)
+    agent_user = _account(f'{PREFIX}agent')
+    DeliveryAgent.objects.get_or_create(user=agent_user)
+    # Staff is enough for the admin endpoints the scenarios call
+    admin_user = _account(f'{PREFIX}admin', is_staff=True)
+
+    shopper_users = [_account(f'{PREFIX}shopper-{i}') for i in range(shoppers)]
+
+    products = Product.objects.filter(seller__user__username__startswith=PREFIX)
+    # Plenty of stock so checkout scenarios don't fail by exhausting the catalog
+    products.filter(stock__lt=1000).update(stock=1_000_000)
+
+    return {
+        'shoppers': [_token(user) for user in shopper_users],
+        'seller': _token(seller_user.user),
+        'agent': _token(agent_user),
+        'admin': _token(admin_user),
+        'product_ids': list(products.values_list('id', flat=True)[:5000]),
+        'category_ids': list(Category.objects.values_list('id', flat=True)),
+        'subcategory_slugs': list(SubCategory.objects.values_list('category__slug', 'slug')[:1000]),
+    }
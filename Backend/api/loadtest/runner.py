@@ -0,0 +1,211 @@
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.urls import Resolver404, resolve
+
+from .scenarios import SCENARIOS
+
+
+QUERY_COUNT_HEADER = 'X-Loadtest-Queries'
+
+
+class QueryCountingApp:
+    """Wraps the Django WSGI app and reports each request's SQL query count in a header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        count = [0]
+
+        def counter(execute, sql, params, many, context):
+            count[0] += 1
+            return execute(sql, params, many, context)
+
+        def counting_start_response(status, headers, exc_info=None):
+            return start_response(status, headers + [(QUERY_COUNT_HEADER, str(count[0]))], exc_info)
+
+        with connection.execute_wrapper(counter):
+            return self.app(environ, counting_start_response)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_server(host='127.0.0.1', port=0):
+    """Serve the project in a background thread; returns (server, base_url)."""
+    server = ThreadedWSGIServer((host, port), QuietHandler, allow_reuse_address=True)
+    server.set_app(QueryCountingApp(WSGIHandler()))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def _free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_server_process(kind, workers, threads=1, host='127.0.0.1', timeout=30):
+    """
+    Serve the project from `workers` processes: gunicorn for 'wsgi', uvicorn
+    with ASYNC_VIEWS on for 'asgi'. Returns (process, base_url).
+    """
+    port = _free_port(host)
+    env = {**os.environ, 'ASYNC_VIEWS': str(kind == 'asgi')}
+    if kind == 'wsgi':
+        command = [sys.executable, '-m', 'gunicorn', 'backend.wsgi:application', '--bind', f'{host}:{port}',
+                   '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'backend.asgi:application', '--host', host, '--port', str(port),
+                   '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+    process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{command[2]} exited with status {process.returncode}")
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return process, f"http://{host}:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{command[2]} didn't start listening within {timeout}s")
+
+
+def _endpoint_name(path):
+    try:
+        match = resolve(path.split('?', 1)[0])
+    except Resolver404:
+        return path
+    return match.url_name or match.route
+
+
+class Client:
+    """One virtual user. Records a sample for every request it makes."""
+
+    def __init__(self, base_url, recorder, timeout=30):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.recorder = recorder
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            size = len(response.read())
+            status = response.status
+            queries = response.getheader(QUERY_COUNT_HEADER)
+        except (OSError, http.client.HTTPException):
+            status, size, queries = 0, 0, None
+        finally:
+            conn.close()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.recorder.record(_endpoint_name(path), method, elapsed_ms, status, size,
+                             int(queries) if queries is not None else None)
+        return status
+
+    def get(self, path, token=None):
+        return self.request('GET', path, token=token)
+
+    def post(self, path, body=None, token=None):
+        return self.request('POST', path, body=body if body is not None else {}, token=token)
+
+    def delete(self, path, token=None):
+        return self.request('DELETE', path, token=token)
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def record(self, endpoint, method, elapsed_ms, status, size, queries):
+        with self.lock:
+            self.samples[f"{method} {endpoint}"].append((elapsed_ms, status, size, queries))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, elapsed_s):
+    endpoints = {}
+    for name, samples in sorted(recorder.samples.items()):
+        latencies = sorted(s[0] for s in samples)
+        queries = [s[3] for s in samples if s[3] is not None]
+        errors = sum(1 for s in samples if s[1] == 0 or s[1] >= 500)
+        endpoints[name] = {
+            'requests': len(samples),
+            'errors': errors,
+            'status_4xx': sum(1 for s in samples if 400 <= s[1] < 500),
+            'throughput_rps': round(len(samples) / elapsed_s, 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+            'mean_response_bytes': round(sum(s[2] for s in samples) / len(samples)),
+        }
+    total = sum(e['requests'] for e in endpoints.values())
+    return {
+        'endpoints': endpoints,
+        'totals': {
+            'requests': total,
+            'errors': sum(e['errors'] for e in endpoints.values()),
+            'throughput_rps': round(total / elapsed_s, 2) if elapsed_s else 0,
+        },
+    }
+
+
+def run(base_url, actors, mix, clients, duration, seed=0):
+    """Drive `clients` virtual users for `duration` seconds and return the summary."""
+    recorder = Recorder()
+    names = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in names]
+    deadline = time.monotonic() + duration
+
+    def virtual_user(index):
+        rng = random.Random(seed * 10_000 + index)
+        client = Client(base_url, recorder)
+        while time.monotonic() < deadline:
+            scenario = SCENARIOS[rng.choices(names, weights)[0]]
+            scenario(client, actors, rng)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=virtual_user, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(recorder, time.monotonic() - started)
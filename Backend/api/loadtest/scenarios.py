@@ -0,0 +1,71 @@
+"""
+Traffic scenarios. Each one is a short user journey; a virtual client picks a
+scenario by weight, runs it, and repeats until the test ends.
+"""
+
+
+def browse_catalog(client, actors, rng):
+    client.get('/api/categories/')
+    client.get('/api/products/?fields=id,name,price,image,discounted_price')
+    client.get(f"/api/subcategories/{rng.choice(actors['category_ids'])}/")
+    if actors['subcategory_slugs']:
+        category_slug, subcategory_slug = rng.choice(actors['subcategory_slugs'])
+        client.get(f'/api/catalog/{category_slug}/{subcategory_slug}/products/')
+    for _ in range(rng.randint(1, 3)):
+        client.get(f"/api/product/{rng.choice(actors['product_ids'])}/")
+
+
+def cart_churn(client, actors, rng):
+    token = rng.choice(actors['shoppers'])
+    product_id = rng.choice(actors['product_ids'])
+    client.post('/api/cart/add/', {'product_id': product_id, 'quantity': 1}, token=token)
+    client.get('/api/cart/', token=token)
+    client.post('/api/wishlist/add/', {'product_id': rng.choice(actors['product_ids'])}, token=token)
+    client.get('/api/wishlist/', token=token)
+    client.delete(f'/api/cart/remove/{product_id}/', token=token)
+
+
+def checkout(client, actors, rng):
+    token = rng.choice(actors['shoppers'])
+    for product_id in rng.sample(actors['product_ids'], k=min(3, len(actors['product_ids']))):
+        client.post('/api/cart/add/', {'product_id': product_id, 'quantity': 1}, token=token)
+    client.post('/api/order/checkout/', token=token)
+    client.post('/api/order/place/', token=token)
+    client.get('/api/orders/?page=1', token=token)
+
+
+def seller_dashboard(client, actors, rng):
+    token = actors['seller']
+    client.get('/api/seller/dashboard/', token=token)
+    client.get('/api/seller/products/', token=token)
+    client.get('/api/seller/orders/', token=token)
+
+
+def agent_polling(client, actors, rng):
+    client.get('/api/delivery/orders/', token=actors['agent'])
+
+
+def admin_listings(client, actors, rng):
+    token = actors['admin']
+    client.get('/api/admin/users/', token=token)
+    client.get('/api/admin/products/', token=token)
+    client.get('/api/ordersall/?summary=1&page=1', token=token)
+
+
+SCENARIOS = {
+    'browse': browse_catalog,
+    'cart': cart_churn,
+    'checkout': checkout,
+    'seller': seller_dashboard,
+    'agent': agent_polling,
+    'admin': admin_listings,
+}
+
+DEFAULT_MIX = {
+    'browse': 50,
+    'cart': 20,
+    'checkout': 5,
+    'seller': 10,
+    'agent': 10,
+    'admin': 5,
+}
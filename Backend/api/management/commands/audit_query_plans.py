@@ -0,0 +1,119 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+
+from api import cart_store
+from api.models import (
+    Cart, Category, DeliveryAgent, DeliveryAssignment, Order, OrderItem,
+    Product, Seller, SubCategory, Wishlist, WishlistItem,
+)
+from api.serializers import OrderSerializer, ProductSerializer
+from api.stock_alerts import low_stock_products
+from api.views import _seller_dashboard_orders, _seller_orders_query
+
+
+# Plan lines that mean a whole table is read. SQLite reports "SCAN <table>"
+# (index scans read "SCAN <table> USING [COVERING] INDEX ..."), Postgres
+# reports "Seq Scan on <table>".
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)(?:\s|$)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+def _sample(model, **filters):
+    return model.objects.filter(**filters).order_by('pk').first()
+
+
+def hot_queries():
+    """
+    The main query of every hot view in api/views.py, built with sample keys
+    from the current database. Where a view builds its query in a helper, the
+    helper is called here, so the audit checks exactly what the view runs.
+    """
+    product = _sample(Product)
+    subcategory = _sample(SubCategory)
+    category = _sample(Category)
+    order = _sample(Order)
+    seller = _sample(Seller)
+    agent = _sample(DeliveryAgent)
+    cart = _sample(Cart)
+    wishlist = _sample(Wishlist)
+
+    product_id = product.pk if product else 0
+    user_id = order.user_id if order else 0
+    seller_id = seller.pk if seller else 0
+    category_id = category.pk if category else 0
+    cart_query, cart_items_query = cart_store.db_queries(cart.user_id if cart else 0, cart.pk if cart else 0)
+    dashboard_orders = _seller_dashboard_orders(seller or seller_id)
+
+    return {
+        'get_products': ProductSerializer.setup_queryset(Product.objects.all(), {}).order_by('-created_at')[:50],
+        'get_product_detail': Product.objects.filter(id=product_id),
+        'get_products_by_subcategory_slug (lookup)': SubCategory.objects.filter(
+            category__slug=subcategory.category.slug if subcategory else '', slug=subcategory.slug if subcategory else ''
+        ),
+        'get_products_by_subcategory (products)': Product.objects.filter(subcategory_id__in=[subcategory.pk if subcategory else 0]),
+        'get_products_grouped_by_subcategory': SubCategory.objects.filter(category_id=category_id),
+        'get_subcategories_by_slug': Category.objects.filter(slug=category.slug if category else ''),
+        'get_subcategories': SubCategory.objects.filter(category_id=category_id),
+        'get_cart (cart, on a cache miss)': cart_query,
+        'get_cart (items, on a cache miss)': cart_items_query,
+        'get_orders': OrderSerializer.setup_queryset(Order.objects.filter(user_id=user_id), {}).order_by('-created_at')[:20],
+        'get_order_details (items)': OrderItem.objects.filter(order_id=order.pk if order else 0),
+        'get_wishlist': WishlistItem.objects.filter(wishlist_id=wishlist.pk if wishlist else 0).values_list('product_id'),
+        'seller_products': Product.objects.filter(seller_id=seller_id),
+        'seller_low_stock_products': low_stock_products(seller).order_by('stock') if seller else Product.objects.none(),
+        'scan_low_stock (crossings)': low_stock_products().filter(low_stock_alerted=False, seller__isnull=False),
+        'scan_low_stock (recovered)': Product.objects.filter(low_stock_alerted=True, stock__gt=F('low_stock_threshold')),
+        'seller_dashboard (pending)': dashboard_orders['pending_orders'],
+        'seller_dashboard (completed)': dashboard_orders['completed_orders'],
+        'seller_dashboard (recent)': dashboard_orders['recent_orders'],
+        'seller_orders': _seller_orders_query(seller or seller_id),
+        'get_assigned_orders': DeliveryAssignment.objects.filter(
+            delivery_agent_id=agent.pk if agent else 0
+        ).order_by('-assigned_at')[:20],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the main query of every hot view and fail if any of them "
+        "falls back to a full table scan. Run it against a seeded database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not just failures.")
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        pattern = FULL_SCAN_PATTERNS.get(vendor)
+        if pattern is None:
+            raise CommandError(f"Query plan audit is not supported on {vendor}")
+        if not Product.objects.exists():
+            self.stderr.write("Warning: the database has no products; seed it first for meaningful plans.")
+
+        failures = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # On small tables Postgres prefers sequential scans even when an
+                # index exists; turning them off reveals queries with no usable index.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for name, queryset in hot_queries().items():
+                plan = queryset.explain()
+                scanned = sorted(set(pattern.findall(plan)))
+                if scanned:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"FULL SCAN  {name}: {', '.join(scanned)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"ok         {name}"))
+                if scanned or options['verbose_plans']:
+                    self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot quer{'y' if len(failures) == 1 else 'ies'} use a full table scan")
+        self.stdout.write(self.style.SUCCESS("All hot queries use indexes"))
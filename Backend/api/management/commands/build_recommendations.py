@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.recommendations import update_recommendations
+
+
+class Command(BaseCommand):
+    help = "Fold new orders into the co-purchase matrix and refresh \"frequently bought together\" recommendations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild from every order instead of only new ones.")
+        parser.add_argument('--batch-orders', type=int, default=None, help="Order ids per transaction.")
+
+    def handle(self, *args, **options):
+        position, rescored = update_recommendations(full=options['full'], batch_orders=options['batch_orders'])
+        self.stdout.write(f"Processed orders up to #{position}; rescored {rescored} product(s)")
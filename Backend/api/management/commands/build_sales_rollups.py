@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollups for days with orders changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every day instead of only changed ones.")
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running and refresh every N seconds (default: refresh once and exit)."
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            days = refresh_rollups(full=full)
+            self.stdout.write(f"Rebuilt {days} day(s) of sales rollups")
+            if not options['interval']:
+                return
+            full = False
+            time.sleep(options['interval'])
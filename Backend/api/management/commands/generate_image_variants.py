@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.images import generate_variants
+from api.models import Product
+from api.tasks import generate_product_image_variants
+
+
+class Command(BaseCommand):
+    help = "Backfill resized image variants for every product that has an image."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild variants that are already current.")
+        parser.add_argument('--enqueue', action='store_true', help="Queue the work for task workers instead of running it here.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variants')
+        generated = 0
+        for product in products.iterator():
+            if options['enqueue']:
+                generate_product_image_variants.enqueue(product.pk, force=options['force'])
+                generated += 1
+                continue
+            try:
+                if generate_variants(product, force=options['force']):
+                    generated += 1
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"Product {product.pk}: {e}")
+
+        action = "Queued" if options['enqueue'] else "Generated"
+        self.stdout.write(f"{action} variants for {generated} product(s)")
@@ -0,0 +1,142 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.loadtest.fixtures import prepare_actors
+from api.loadtest.runner import run, start_server, start_server_process
+from api.loadtest.scenarios import DEFAULT_MIX, SCENARIOS
+from api.management.guards import add_override_argument, require_disposable_database
+from api.models import Product
+
+
+def _parse_mix(value):
+    mix = dict.fromkeys(SCENARIOS, 0)
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in SCENARIOS:
+            raise CommandError(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Boot the API in-process and load test it with a mix of realistic traffic."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16, help="Concurrent virtual users.")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run.")
+        parser.add_argument('--mix', type=_parse_mix, default=None,
+                            help="Scenario weights, e.g. browse=5,checkout=1 (default: %s)." %
+                                 ','.join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+        parser.add_argument('--shoppers', type=int, default=50, help="Distinct shopper accounts.")
+        parser.add_argument('--seed', action='store_true', help="Migrate and run seed_marketplace if there are no load test products yet.")
+        parser.add_argument('--seed-scale', type=float, default=0.05, help="--scale passed to seed_marketplace.")
+        parser.add_argument('--server', choices=('inprocess', 'wsgi', 'asgi'), default='inprocess',
+                            help="inprocess: threaded WSGI server in this process (counts queries); "
+                                 "wsgi: gunicorn; asgi: uvicorn with the async views.")
+        parser.add_argument('--workers', type=int, default=2, help="Server processes for --server wsgi/asgi.")
+        parser.add_argument('--threads', type=int, default=1, help="Threads per gunicorn worker for --server wsgi.")
+        parser.add_argument('--rng-seed', type=int, default=0)
+        parser.add_argument('--output', help="Write results as JSON to this file.")
+        parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                            help="Compare two result files instead of running a test.")
+        add_override_argument(parser)
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'])
+        require_disposable_database(options, "create load test accounts and place orders")
+
+        if options['seed']:
+            call_command('migrate', verbosity=0)
+            if not Product.objects.filter(seller__user__username__startswith='loadtest-seed-').exists():
+                call_command('seed_marketplace', scale=options['seed_scale'], prefix='loadtest-seed',
+                             not_production=options['not_production'], stdout=self.stdout)
+
+        actors = prepare_actors(options['shoppers'])
+        if not actors['product_ids']:
+            raise CommandError("The database has no load test products; run with --seed.")
+        mix = options['mix'] or DEFAULT_MIX
+
+        if options['server'] == 'inprocess':
+            server, base_url = start_server()
+            stop = server.shutdown
+        else:
+            try:
+                process, base_url = start_server_process(options['server'], options['workers'], options['threads'])
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+
+            def stop():
+                process.terminate()
+                process.wait(timeout=30)
+
+        self.stdout.write(
+            f"Running {options['clients']} clients for {options['duration']}s against {base_url} "
+            f"({options['server']}, {connection.vendor})"
+        )
+        try:
+            results = run(base_url, actors, mix, options['clients'], options['duration'], seed=options['rng_seed'])
+        finally:
+            stop()
+
+        results['meta'] = {
+            'git_commit': _git_commit(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'server': options['server'],
+            'workers': options['workers'] if options['server'] != 'inprocess' else None,
+            'clients': options['clients'],
+            'duration_s': options['duration'],
+            'mix': mix,
+        }
+        self.print_report(results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def print_report(self, results):
+        header = f"{'endpoint':<45} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, e in results['endpoints'].items():
+            queries = '-' if e['queries_per_request'] is None else f"{e['queries_per_request']:.1f}"
+            self.stdout.write(
+                f"{name:<45} {e['requests']:>7} {e['errors']:>5} {e['throughput_rps']:>8.1f} "
+                f"{e['p50_ms']:>8.1f} {e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f} {queries:>8}"
+            )
+        totals = results['totals']
+        self.stdout.write(f"Total: {totals['requests']} requests, {totals['errors']} errors, {totals['throughput_rps']} req/s")
+
+    def compare(self, before_path, after_path):
+        with open(before_path) as fh:
+            before = json.load(fh)
+        with open(after_path) as fh:
+            after = json.load(fh)
+
+        self.stdout.write(f"{'endpoint':<45} {'p95 before':>11} {'p95 after':>10} {'change':>8} {'queries':>12}")
+        for name in sorted(set(before['endpoints']) | set(after['endpoints'])):
+            b, a = before['endpoints'].get(name), after['endpoints'].get(name)
+            if not b or not a:
+                self.stdout.write(f"{name:<45} {'only in ' + ('after' if a else 'before'):>31}")
+                continue
+            change = (a['p95_ms'] - b['p95_ms']) / b['p95_ms'] * 100 if b['p95_ms'] else 0
+            self.stdout.write(
+                f"{name:<45} {b['p95_ms']:>11.1f} {a['p95_ms']:>10.1f} {change:>+7.1f}% "
+                f"{b['queries_per_request']!s:>5} -> {a['queries_per_request']!s:<5}"
+            )
+        self.stdout.write(
+            f"Throughput: {before['totals']['throughput_rps']} -> {after['totals']['throughput_rps']} req/s"
+        )
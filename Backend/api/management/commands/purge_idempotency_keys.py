@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses that are past their TTL."
+
+    def handle(self, *args, **options):
+        purged = purge_expired()
+        self.stdout.write(f"Purged {purged} expired idempotency key(s)")
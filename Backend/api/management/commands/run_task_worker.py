@@ -0,0 +1,72 @@
+import multiprocessing
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def run_worker(**kwargs):
+    # Under the spawn start method (macOS, Windows) the child starts with a
+    # fresh interpreter that imports this module to find its target, so
+    # nothing here may touch models before Django is set up again. After a
+    # fork setup() is a no-op.
+    django.setup()
+    from api.taskqueue import work
+
+    work(**kwargs)
+
+
+class Command(BaseCommand):
+    help = "Run background task worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues', metavar='NAME[:CONCURRENCY]',
+            help="Queue to consume, optionally with a process count, e.g. --queue images:2. "
+                 "Can be repeated. Defaults to one process on the default queue."
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--burst', action='store_true',
+            help="Exit once the queues have no due tasks instead of polling forever."
+        )
+
+    def handle(self, *args, **options):
+        from api.taskqueue import DEFAULT_QUEUE, requeue_stale
+        from api.tasks import refresh_sales_rollups, schedule_sales_rollups
+
+        plan = []
+        for spec in options['queues'] or [DEFAULT_QUEUE]:
+            name, _, concurrency = spec.partition(':')
+            try:
+                plan.append((name, int(concurrency or 1)))
+            except ValueError:
+                raise CommandError(f"Invalid concurrency in '{spec}'")
+
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale task(s)")
+        # Periodic tasks reschedule themselves; start them on a fresh deploy
+        if refresh_sales_rollups.queue in dict(plan) and schedule_sales_rollups():
+            self.stdout.write("Scheduled the sales rollup refresh")
+
+        # Children must open their own DB connections.
+        connections.close_all()
+        processes = []
+        for name, concurrency in plan:
+            for _ in range(concurrency):
+                process = multiprocessing.Process(
+                    target=run_worker,
+                    kwargs={'queue': name, 'poll_interval': options['poll_interval'], 'burst': options['burst']},
+                    daemon=True,
+                )
+                process.start()
+                processes.append(process)
+            self.stdout.write(f"Started {concurrency} worker(s) on '{name}'")
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.stock_alerts import scan_low_stock
+
+
+class Command(BaseCommand):
+    help = "Alert sellers about products that just dropped to their low stock threshold."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help="Keep running and scan every N seconds (default: scan once and exit)."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            alerted, recovered = scan_low_stock()
+            self.stdout.write(f"Raised {alerted} low stock alert(s); {recovered} product(s) restocked")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,335 @@
+import random
+import time
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from api.management.guards import add_override_argument, require_disposable_database
+from api.models import (
+    Cart, CartItem, Category, DeliveryAgent, DeliveryAssignment, Order, OrderItem, Product,
+    Seller, SubCategory, UserAddress, Wishlist, WishlistItem,
+)
+
+
+CATEGORY_NAMES = [
+    'Fruits', 'Vegetables', 'Dairy', 'Bakery', 'Beverages', 'Snacks', 'Staples', 'Spices',
+    'Personal Care', 'Household', 'Baby Care', 'Frozen', 'Meat', 'Seafood', 'Electronics',
+    'Toys', 'Stationery', 'Pet Care', 'Health', 'Home Decor',
+]
+SUBCATEGORY_NAMES = [
+    'Fresh', 'Organic', 'Imported', 'Value Packs', 'Premium', 'Daily Essentials', 'Combos',
+    'Seasonal', 'Local Favourites', 'New Arrivals', 'Best Sellers', 'Gift Packs',
+]
+PRODUCT_WORDS = [
+    'Classic', 'Golden', 'Crunchy', 'Fresh', 'Royal', 'Pure', 'Spicy', 'Sweet', 'Family',
+    'Mini', 'Jumbo', 'Natural', 'Masala', 'Lite', 'Extra', 'Farm', 'Honey', 'Roasted',
+]
+CITIES = [
+    ('Hyderabad', 'Telangana'), ('Bengaluru', 'Karnataka'), ('Chennai', 'Tamil Nadu'),
+    ('Mumbai', 'Maharashtra'), ('Pune', 'Maharashtra'), ('Kadapa', 'Andhra Pradesh'),
+    ('Vijayawada', 'Andhra Pradesh'), ('Delhi', 'Delhi'), ('Kolkata', 'West Bengal'),
+]
+ASSIGNMENT_STATUSES = ['Delivered'] * 7 + ['Out for Delivery'] * 2 + ['Pending']
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep generated dates instead of auto_now/auto_now_add overwriting them."""
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f, _, _ in saved:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _field(model, name):
+    return model._meta.get_field(name)
+
+
+class WeightedPicker:
+    """O(log n) weighted choice over a fixed population (rng.choices re-sums every call)."""
+
+    def __init__(self, population, weights):
+        self.population = population
+        self.cumulative = list(accumulate(weights))
+        self.total = self.cumulative[-1]
+
+    def pick(self, rng):
+        return self.population[bisect(self.cumulative, rng.random() * self.total)]
+
+
+def zipf_weights(n, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large synthetic marketplace (catalog, users, carts, wishlists, orders, "
+        "deliveries) with realistic distributions, using batched bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help="Multiply every volume below.")
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--subcategories', type=int, default=8, help="Per category.")
+        parser.add_argument('--sellers', type=int, default=200)
+        parser.add_argument('--products', type=int, default=20_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--orders', type=int, default=50_000)
+        parser.add_argument('--items-per-order', type=float, default=3.0, help="Mean order lines.")
+        parser.add_argument('--agents', type=int, default=50)
+        parser.add_argument('--days', type=int, default=365, help="Spread order dates over this many days.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42, help="RNG seed; same seed, same data.")
+        parser.add_argument('--prefix', default='seed', help="Prefix for generated usernames.")
+        add_override_argument(parser)
+
+    def handle(self, *args, **options):
+        require_disposable_database(options, "generate a synthetic marketplace")
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.now = timezone.now()
+        scale = options['scale']
+
+        def volume(name, minimum=1):
+            return max(minimum, int(options[name] * scale))
+
+        if User.objects.filter(username__startswith=f"{self.prefix}-").exists():
+            raise CommandError(f"Users prefixed '{self.prefix}-' already exist; pass a different --prefix.")
+
+        # One hash for every generated account keeps user creation cheap.
+        self.password = make_password('password123')
+        started = time.monotonic()
+
+        subcategories = self.step('subcategories', self.seed_catalog_tree,
+                                  min(options['categories'], len(CATEGORY_NAMES)), options['subcategories'])
+        sellers = self.step('sellers', self.seed_sellers, volume('sellers'))
+        products = self.step('products', self.seed_products, volume('products'), subcategories, sellers)
+        users = self.step('users', self.seed_users, volume('users'))
+        self.step('addresses', self.seed_addresses, users)
+        product_picker = WeightedPicker(products, zipf_weights(len(products)))
+        self.step('carts', self.seed_carts, users, product_picker)
+        self.step('wishlists', self.seed_wishlists, users, product_picker)
+        agents = self.step('delivery agents', self.seed_agents, volume('agents'))
+        self.step('orders', self.seed_orders, volume('orders'), users, product_picker,
+                  options['items_per_order'], options['days'], agents)
+
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.monotonic() - started:.1f}s"))
+
+    def step(self, label, func, *args):
+        started = time.monotonic()
+        result = func(*args)
+        count = len(result) if isinstance(result, list) else result
+        self.stdout.write(f"  {label:<16} {count:>10,}  ({time.monotonic() - started:.1f}s)")
+        return result
+
+    def bulk(self, model, objects):
+        """bulk_create in batches inside one transaction per batch; returns the created objects."""
+        created = []
+        for start in range(0, len(objects), self.batch_size):
+            with transaction.atomic():
+                created.extend(model.objects.bulk_create(objects[start:start + self.batch_size]))
+        return created
+
+    # ------------------- Generators -------------------
+
+    def seed_catalog_tree(self, category_count, per_category):
+        rng = self.rng
+        taken = set(Category.objects.values_list('slug', flat=True))
+        categories = []
+        for name in CATEGORY_NAMES[:category_count]:
+            slug, n = slugify(name), 2
+            while slug in taken:
+                slug, n = f"{slugify(name)}-{n}", n + 1
+            taken.add(slug)
+            categories.append(Category(name=name, slug=slug))
+        categories = self.bulk(Category, categories)
+
+        subcategories = []
+        for category in categories:
+            for name in rng.sample(SUBCATEGORY_NAMES, k=min(per_category, len(SUBCATEGORY_NAMES))):
+                subcategories.append(SubCategory(category=category, name=name, slug=slugify(name)))
+        return self.bulk(SubCategory, subcategories)
+
+    def _users(self, count, kind, **extra):
+        joined_field = _field(User, 'date_joined')
+        users = [
+            User(
+                username=f"{self.prefix}-{kind}-{i}",
+                email=f"{self.prefix}-{kind}-{i}@example.com",
+                password=self.password,
+                date_joined=self.now - timedelta(days=self.rng.randint(0, 900)),
+                **extra,
+            )
+            for i in range(count)
+        ]
+        with explicit_timestamps(joined_field):
+            return self.bulk(User, users)
+
+    def seed_sellers(self, count):
+        users = self._users(count, 'seller')
+        sellers = [
+            Seller(
+                user=user,
+                store_name=f"{self.rng.choice(PRODUCT_WORDS)} Mart {i}",
+                contact_number=f"9{self.rng.randint(100000000, 999999999)}",
+                address=f"{self.rng.randint(1, 999)} Market Road, {self.rng.choice(CITIES)[0]}",
+                is_verified=self.rng.random() < 0.9,
+            )
+            for i, user in enumerate(users)
+        ]
+        return self.bulk(Seller, sellers)
+
+    def seed_products(self, count, subcategories, sellers):
+        rng = self.rng
+        # A few big sellers own most of the catalog
+        seller_picker = WeightedPicker(sellers, zipf_weights(len(sellers), 0.8))
+        created_field = _field(Product, 'created_at')
+        products = []
+        for i in range(count):
+            subcategory = rng.choice(subcategories)
+            price = min(Decimal('99999.99'), Decimal(str(round(rng.lognormvariate(4.5, 1.0), 2))) + 1)
+            created_at = self.now - timedelta(days=rng.expovariate(1 / 200))
+            stock = 0 if rng.random() < 0.05 else int(rng.paretovariate(1.5) * 20)
+            products.append(Product(
+                seller=seller_picker.pick(rng),
+                name=f"{rng.choice(PRODUCT_WORDS)} {subcategory.name} {i}",
+                category_id=subcategory.category_id,
+                subcategory=subcategory,
+                price=price,
+                stock=min(stock, 100_000),
+                discount_percentage=0 if rng.random() < 0.7 else rng.choice([5, 10, 15, 20, 25, 40, 50]),
+                description=f"Synthetic product {i}",
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        with explicit_timestamps(created_field, _field(Product, 'updated_at')):
+            return self.bulk(Product, products)
+
+    def seed_users(self, count):
+        return self._users(count, 'shopper')
+
+    def seed_addresses(self, users):
+        rng = self.rng
+        addresses = []
+        for user in users:
+            for n in range(1 if rng.random() < 0.7 else 2):
+                city, state = rng.choice(CITIES)
+                addresses.append(UserAddress(
+                    user=user,
+                    full_name=user.username,
+                    phone_number=f"9{rng.randint(100000000, 999999999)}",
+                    address_line=f"{rng.randint(1, 999)}, Street {rng.randint(1, 80)}",
+                    city=city,
+                    state=state,
+                    postal_code=str(rng.randint(500001, 599999)),
+                    is_default=n == 0,
+                ))
+        return self.bulk(UserAddress, addresses)
+
+    def seed_carts(self, users, product_picker):
+        rng = self.rng
+        carts = self.bulk(Cart, [Cart(user=user) for user in users if rng.random() < 0.3])
+        items = []
+        for cart in carts:
+            for product in {product_picker.pick(rng) for _ in range(rng.randint(1, 5))}:
+                items.append(CartItem(cart=cart, product=product, quantity=rng.randint(1, 4)))
+        self.bulk(CartItem, items)
+        return len(carts) + len(items)
+
+    def seed_wishlists(self, users, product_picker):
+        rng = self.rng
+        wishlists = self.bulk(Wishlist, [Wishlist(user=user) for user in users if rng.random() < 0.4])
+        items = []
+        for wishlist in wishlists:
+            for product in {product_picker.pick(rng) for _ in range(rng.randint(1, 10))}:
+                items.append(WishlistItem(
+                    wishlist=wishlist, product=product,
+                    added_at=self.now - timedelta(days=rng.expovariate(1 / 60)),
+                ))
+        with explicit_timestamps(_field(WishlistItem, 'added_at')):
+            self.bulk(WishlistItem, items)
+        return len(wishlists) + len(items)
+
+    def seed_agents(self, count):
+        users = self._users(count, 'agent')
+        agents = [
+            DeliveryAgent(
+                user=user,
+                phone=f"9{self.rng.randint(100000000, 999999999)}",
+                vehicle_number=f"AP{self.rng.randint(10, 39)}X{self.rng.randint(1000, 9999)}",
+                is_active=self.rng.random() < 0.9,
+            )
+            for user in users
+        ]
+        return self.bulk(DeliveryAgent, agents)
+
+    def seed_orders(self, count, users, product_picker, items_per_order, days, agents):
+        rng = self.rng
+        # Heavy-tailed: a minority of shoppers place most orders
+        user_picker = WeightedPicker(users, [rng.paretovariate(1.2) for _ in users])
+        address_ids = dict(UserAddress.objects.filter(user__in=users, is_default=True).values_list('user_id', 'id'))
+        unit_prices = {}
+
+        def unit_price(product):
+            if product.id not in unit_prices:
+                unit_prices[product.id] = Decimal(str(round(product.discounted_price(), 2)))
+            return unit_prices[product.id]
+        timestamp_fields = [
+            _field(Order, 'created_at'), _field(Order, 'updated_at'),
+            _field(DeliveryAssignment, 'assigned_at'), _field(DeliveryAssignment, 'last_updated'),
+        ]
+
+        created = 0
+        with explicit_timestamps(*timestamp_fields):
+            for start in range(0, count, self.batch_size):
+                batch = min(self.batch_size, count - start)
+                orders, lines = [], []
+                for _ in range(batch):
+                    user = user_picker.pick(rng)
+                    # Recent days are busier than old ones
+                    created_at = self.now - timedelta(days=days * (rng.random() ** 1.5), seconds=rng.randint(0, 86399))
+                    order_lines = {}
+                    for _ in range(max(1, int(rng.expovariate(1 / items_per_order) + 0.5))):
+                        product = product_picker.pick(rng)
+                        order_lines[product.id] = (product, rng.randint(1, 3))
+                    total = sum(unit_price(p) * q for p, q in order_lines.values())
+                    orders.append(Order(
+                        user=user, address_id=address_ids.get(user.id), created_at=created_at,
+                        updated_at=created_at, is_paid=rng.random() < 0.85, total_price=total,
+                    ))
+                    lines.append(order_lines.values())
+
+                with transaction.atomic():
+                    orders = Order.objects.bulk_create(orders)
+                    OrderItem.objects.bulk_create([
+                        OrderItem(order=order, product=product, quantity=quantity,
+                                  price=unit_price(product))
+                        for order, order_lines in zip(orders, lines)
+                        for product, quantity in order_lines
+                    ], batch_size=self.batch_size)
+                    if agents:
+                        DeliveryAssignment.objects.bulk_create([
+                            DeliveryAssignment(
+                                order=order, delivery_agent=rng.choice(agents),
+                                assigned_at=order.created_at + timedelta(hours=rng.randint(1, 12)),
+                                last_updated=order.created_at + timedelta(hours=rng.randint(12, 72)),
+                                status=rng.choice(ASSIGNMENT_STATUSES),
+                            )
+                            for order in orders if order.is_paid and rng.random() < 0.8
+                        ], batch_size=self.batch_size)
+                created += len(orders)
+        return created
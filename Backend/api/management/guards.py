@@ -0,0 +1,37 @@
+"""
+Guard for the management commands that fill the database with fake data
+(`seed_marketplace`, `loadtest`).
+
+They only run against a database that is obviously disposable: SQLite, or
+a database whose name starts with "test". Anything else, e.g. the
+production Postgres the default settings point at, needs an explicit
+--i-know-this-is-not-production.
+"""
+from django.core.management.base import CommandError
+from django.db import connection
+
+
+OVERRIDE_FLAG = '--i-know-this-is-not-production'
+
+
+def add_override_argument(parser):
+    parser.add_argument(
+        OVERRIDE_FLAG, action='store_true', dest='not_production',
+        help="Run against a database that isn't SQLite or a test database.",
+    )
+
+
+def is_disposable_database():
+    name = str(connection.settings_dict.get('NAME') or '')
+    return connection.vendor == 'sqlite' or name.startswith('test')
+
+
+def require_disposable_database(options, action):
+    """Raise CommandError unless the database is disposable or the override flag was passed."""
+    if options.get('not_production') or is_disposable_database():
+        return
+    raise CommandError(
+        f"Refusing to {action} in the {connection.vendor} database "
+        f"'{connection.settings_dict.get('NAME')}'. Point DATABASE_URL at a SQLite or test "
+        f"database, or pass {OVERRIDE_FLAG} if this really isn't production."
+    )
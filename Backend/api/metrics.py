@@ -0,0 +1,329 @@
+"""
+Per-route request metrics in the Prometheus text format.
+
+MetricsMiddleware records, for every URL name in api/urls.py, request counts
+by status class, a latency histogram, SQL query count and time, and a
+response size histogram. Each thread records into its own shard, so the hot
+path takes no lock; a scrape sums the shards. When a thread goes away its
+shard is folded into a shared base, so thread-per-request servers don't
+pile up shards.
+
+Under gunicorn every worker has its own registry. Set METRICS_DIR to a
+directory the workers share: each process writes its totals to
+`<METRICS_DIR>/<pid>-<random>.json` at most every METRICS_FLUSH_INTERVAL
+seconds and the scrape endpoint adds up every file in it. The random part
+keeps a recycled pid from overwriting a dead worker's totals. A process
+that exits folds its file into `base.json`, and a scrape does the same for
+the files of processes that died without doing so, so the directory stays
+small and counters never go backwards. base.json records the files it has
+absorbed, so a fold interrupted between writing it and removing the file
+doesn't count twice.
+
+The middleware works under WSGI and ASGI alike. Query counts come from a
+wrapper installed on every connection (see signals.py) that adds to the
+current request's totals.
+"""
+import atexit
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+import weakref
+
+try:
+    import fcntl
+except ImportError:  # Windows: no folding, dead processes' files are kept
+    fcntl = None
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+METRICS = {
+    'api_requests_total': ('counter', "Requests handled, by route, method and status class."),
+    'api_request_duration_seconds': ('histogram', "Time spent producing the response."),
+    'api_db_queries_total': ('counter', "SQL queries run while handling requests."),
+    'api_db_query_duration_seconds_total': ('counter', "Time spent in SQL queries."),
+    'api_response_size_bytes': ('histogram', "Size of non-streaming response bodies."),
+}
+
+
+class Registry:
+    """Counters keyed by (sample name, labels); histograms are stored as counters too."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = {}  # id -> shard of a live thread
+        self._base = {}  # totals of threads that have finished
+        self._retired = []  # shards of finished threads, not yet in _base
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._pid = None
+        self._file_name = None
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._fold_retired()
+                self._shards[id(shard)] = shard
+            # Finalizers can run in any thread, even one holding the lock,
+            # so this one only queues the shard for _fold_retired().
+            weakref.finalize(threading.current_thread(), self._retired.append, shard)
+        return shard
+
+    def _fold_retired(self):
+        # Caller holds the lock. Retired shards' threads are gone, so nothing writes to them.
+        while self._retired:
+            shard = self._shards.pop(id(self._retired.pop()))
+            for key, value in shard.items():
+                self._base[key] = self._base.get(key, 0) + value
+
+    def inc(self, name, labels, value=1):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        # Only the first matching bucket is stored; render() makes them cumulative.
+        le = next((str(b) for b in buckets if value <= b), '+Inf')
+        self.inc(f'{name}_bucket', labels + (('le', le),))
+        self.inc(f'{name}_sum', labels, value)
+        self.inc(f'{name}_count', labels)
+
+    def snapshot(self):
+        with self._lock:
+            self._fold_retired()
+            shards = list(self._shards.values())
+            totals = dict(self._base)
+        for shard in shards:
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def maybe_flush(self):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory and time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush(directory)
+
+    def file_name(self):
+        """This process's file in METRICS_DIR; a forked child picks a new one."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._file_name = f'{self._pid}-{uuid.uuid4().hex[:12]}.json'
+            atexit.register(self.retire)
+        return self._file_name
+
+    def flush(self, directory):
+        self._last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.file_name())
+        _write_json(path, [[name, labels, value] for (name, labels), value in self.snapshot().items()])
+
+    def retire(self):
+        """atexit hook: fold this process's final totals into base.json."""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory and self._pid == os.getpid():
+            self.flush(directory)
+            _fold(directory, [self.file_name()])
+            self._pid = None  # a fork inherits the parent's hook too; run once
+
+    def collect(self):
+        """Totals for this process, or for every process sharing METRICS_DIR."""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return self.snapshot()
+        self.flush(directory)
+        _fold(directory, [
+            os.path.basename(path) for path in glob.glob(os.path.join(directory, '*-*.json'))
+            if not _is_alive(os.path.basename(path))
+        ])
+        base = _read_json(os.path.join(directory, BASE_FILE), {'samples': []})
+        totals = _add_samples({}, base['samples'])
+        absorbed = set(base.get('absorbed', []))
+        for path in glob.glob(os.path.join(directory, '*-*.json')):
+            if os.path.basename(path) not in absorbed:
+                _add_samples(totals, _read_json(path, []))
+        return totals
+
+
+BASE_FILE = 'base.json'
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+def _add_samples(totals, samples):
+    for name, labels, value in samples:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _is_alive(file_name):
+    # A live process with this pid may be a newer one that reused it; the
+    # file is folded once that one is gone too.
+    if fcntl is None:
+        return True
+    try:
+        os.kill(int(file_name.split('-', 1)[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+
+def _fold(directory, file_names):
+    """Add the given processes' files to base.json and delete them."""
+    if not file_names or fcntl is None:
+        return
+    with open(os.path.join(directory, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        base_path = os.path.join(directory, BASE_FILE)
+        base = _read_json(base_path, {'samples': []})
+        # Forget absorbed files that are gone, so the list stays short
+        absorbed = [name for name in base.get('absorbed', []) if os.path.exists(os.path.join(directory, name))]
+        totals = _add_samples({}, base['samples'])
+        for name in file_names:
+            path = os.path.join(directory, name)
+            if name in absorbed or not os.path.exists(path):
+                continue
+            _add_samples(totals, _read_json(path, []))
+            absorbed.append(name)
+        _write_json(base_path, {
+            'samples': [[name, labels, value] for (name, labels), value in totals.items()],
+            'absorbed': absorbed,
+        })
+        for name in absorbed:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(name, labels, value):
+    if labels:
+        name += '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+    return f'{name} {value}'
+
+
+def render(samples):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        if kind == 'counter':
+            for (name, labels), value in sorted(samples.items()):
+                if name == metric:
+                    lines.append(_format(name, labels, value))
+            continue
+
+        buckets = LATENCY_BUCKETS if metric == 'api_request_duration_seconds' else SIZE_BUCKETS
+        series = sorted({labels for (name, labels) in samples if name == f'{metric}_count'})
+        for labels in series:
+            cumulative = 0
+            for le in [str(b) for b in buckets] + ['+Inf']:
+                cumulative += samples.get((f'{metric}_bucket', labels + (('le', le),)), 0)
+                lines.append(_format(f'{metric}_bucket', labels + (('le', le),), cumulative))
+            lines.append(_format(f'{metric}_sum', labels, samples[(f'{metric}_sum', labels)]))
+            lines.append(_format(f'{metric}_count', labels, samples[(f'{metric}_count', labels)]))
+    return '\n'.join(lines) + '\n'
+
+
+_request_db = contextvars.ContextVar('metrics_request_db', default=None)
+
+
+def time_queries(execute, sql, params, many, context):
+    totals = _request_db.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver. Async views query from worker threads, so
+    queries are attributed to the request through a context variable rather
+    than a wrapper on the request thread's connection.
+    """
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+class MetricsMiddleware:
+    """Record metrics for every request, labelled with the URL name it resolved to."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_db.reset(token)
+        self.record(request, response, time.perf_counter() - started, db)
+        return response
+
+    async def _acall(self, request):
+        db = [0, 0.0]
+        token = _request_db.set(db)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_db.reset(token)
+        self.record(request, response, time.perf_counter() - started, db)
+        return response
+
+    def record(self, request, response, elapsed, db):
+        match = request.resolver_match
+        route = (match.url_name or match.route) if match else 'unmatched'
+        labels = (('route', route),)
+        registry.inc('api_requests_total', labels + (('method', request.method), ('status', f'{response.status_code // 100}xx')))
+        registry.observe('api_request_duration_seconds', labels + (('method', request.method),), elapsed, LATENCY_BUCKETS)
+        registry.inc('api_db_queries_total', labels, db[0])
+        registry.inc('api_db_query_duration_seconds_total', labels, db[1])
+        if not response.streaming:
+            registry.observe('api_response_size_bytes', labels, len(response.content), SIZE_BUCKETS)
+        registry.maybe_flush()
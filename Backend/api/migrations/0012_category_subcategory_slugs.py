@@ -0,0 +1,63 @@
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def _unique(taken, value, fallback):
+    base = slugify(value)[:90] or fallback
+    slug, n = base, 2
+    while slug in taken:
+        slug = f"{base}-{n}"
+        n += 1
+    taken.add(slug)
+    return slug
+
+
+def populate_slugs(apps, schema_editor):
+    Category = apps.get_model('api', 'Category')
+    SubCategory = apps.get_model('api', 'SubCategory')
+
+    taken = set()
+    for category in Category.objects.order_by('pk'):
+        category.slug = _unique(taken, category.name, 'category')
+        category.save(update_fields=['slug'])
+
+    taken_per_category = {}
+    for subcategory in SubCategory.objects.order_by('pk'):
+        taken = taken_per_category.setdefault(subcategory.category_id, set())
+        subcategory.slug = _unique(taken, subcategory.name, 'subcategory')
+        subcategory.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='subcategory',
+            name='slug',
+            field=models.SlugField(max_length=100, null=True),
+        ),
+        migrations.RunPython(populate_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='subcategory',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='subcategory',
+            constraint=models.UniqueConstraint(fields=('category', 'slug'), name='unique_subcategory_slug_per_category'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    WishlistItem = apps.get_model('api', 'WishlistItem')
+    duplicates = (
+        WishlistItem.objects.values('wishlist_id', 'product_id')
+        .annotate(first_id=Min('id'), n=Count('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates:
+        WishlistItem.objects.filter(
+            wishlist_id=row['wishlist_id'], product_id=row['product_id']
+        ).exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_requestprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='wishlistitem',
+            constraint=models.UniqueConstraint(fields=('wishlist', 'product'), name='unique_wishlist_product'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('product', 'Product'), ('seller', 'Seller'), ('category', 'Category')], max_length=10)),
+                ('key', models.BigIntegerField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_orders', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'day'], name='sales_rollup_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key', 'day'), name='unique_sales_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_salesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_alerted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_override',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(default=5, editable=False),
+        ),
+        migrations.AddField(
+            model_name='seller',
+            name='low_stock_threshold',
+            field=models.PositiveIntegerField(default=5),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('price_drop', 'Price drop'), ('back_in_stock', 'Back in stock'), ('low_stock', 'Low stock')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('stock__lte', models.F('low_stock_threshold'))), fields=['seller', 'stock'], name='product_low_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('low_stock_alerted', True)), fields=['id'], name='product_low_stock_alerted_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    CartItem = apps.get_model('api', 'CartItem')
+    duplicates = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(first_id=Min('id'), total=Sum('quantity'), n=Count('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates:
+        CartItem.objects.filter(pk=row['first_id']).update(quantity=row['total'])
+        CartItem.objects.filter(
+            cart_id=row['cart_id'], product_id=row['product_id']
+        ).exclude(id=row['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_low_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_promotions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='category',
+            name='category_name_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='subcategory',
+            name='subcategory_name_idx',
+        ),
+    ]
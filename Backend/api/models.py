@@ -1,19 +1,55 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.text import slugify
+
+
+def unique_slug(queryset, value, fallback):
+    """slugify(value), suffixed with -2, -3... until it is unused in `queryset`."""
+    base = slugify(value)[:90] or fallback
+    slug, n = base, 2
+    while queryset.filter(slug=slug).exists():
+        slug = f"{base}-{n}"
+        n += 1
+    return slug
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True, blank=True)  # filled from name on save
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = unique_slug(Category.objects.exclude(pk=self.pk), self.name, 'category')
+        super().save(*args, **kwargs)
+
 
 class SubCategory(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='subcategories')
     name = models.CharField(max_length=100)
+    # Unique within the parent category, so "fruits/fresh" and "vegetables/fresh" can coexist
+    slug = models.SlugField(max_length=100, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'slug'], name='unique_subcategory_slug_per_category'),
+        ]
 
     def __str__(self):
         return f"{self.category.name} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            siblings = SubCategory.objects.filter(category_id=self.category_id).exclude(pk=self.pk)
+            self.slug = unique_slug(siblings, self.name, 'subcategory')
+        super().save(*args, **kwargs)
+
 
 # ------------------- Seller Models -------------------
 
@@ -23,6 +59,8 @@ class Seller(models.Model):
     contact_number = models.CharField(max_length=15, blank=True, null=True)
     address = models.TextField(blank=True, null=True)  # Keep this as nullable
     is_verified = models.BooleanField(default=False)
+    # Default for products without their own low_stock_override
+    low_stock_threshold = models.PositiveIntegerField(default=5)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -43,7 +81,49 @@ class Product(models.Model):
     )
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='product_images/', null=True, blank=True)
+    # Resized copies of `image`, e.g. {"thumb": {"webp": "...", "jpeg": "..."}}; see api/images.py
+    image_variants = models.JSONField(default=dict, blank=True)
+    # Low stock alerts (see api/stock_alerts.py). low_stock_threshold is the
+    # effective value: the override if set, else the seller's default.
+    low_stock_override = models.PositiveIntegerField(null=True, blank=True)
+    low_stock_threshold = models.PositiveIntegerField(default=5, editable=False)
+    low_stock_alerted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Catalog listings, newest first
+            models.Index(fields=['-created_at'], name='product_created_idx'),
+            # Only products at or below their threshold, so the low stock scan
+            # and seller/products/low-stock/ cost the size of that set
+            models.Index(
+                fields=['seller', 'stock'], condition=models.Q(stock__lte=models.F('low_stock_threshold')),
+                name='product_low_stock_idx',
+            ),
+            # Alerted products, checked for recovery
+            models.Index(fields=['id'], condition=models.Q(low_stock_alerted=True), name='product_low_stock_alerted_idx'),
+        ]
+
+    # Values as loaded from the database, for change detection in signals.py
+    TRACKED_FIELDS = ('price', 'discount_percentage', 'stock')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_tracked_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.low_stock_override is not None:
+            self.low_stock_threshold = self.low_stock_override
+        elif self.seller_id:
+            self.low_stock_threshold = self.seller.low_stock_threshold
+        super().save(*args, **kwargs)
+
+    def snapshot_tracked_fields(self):
+        # Deferred fields aren't in __dict__ and are left out
+        self._loaded_values = {name: self.__dict__[name] for name in self.TRACKED_FIELDS if name in self.__dict__}
 
     def __str__(self):
         return self.name
@@ -73,6 +153,12 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # Guest carts are merged in at login with an upsert on this
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
     def __str__(self):
         return f"{self.product.name} ({self.quantity})"
 
@@ -89,6 +175,18 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_paid = models.BooleanField(default=False)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Order history: one user's orders, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Paid/unpaid order counts and recent paid orders (seller_dashboard).
+            # Partial indexes, because boolean filters compile to "WHERE [NOT] is_paid"
+            # which SQLite can't match against a plain (is_paid, ...) index.
+            models.Index(fields=['-created_at'], condition=models.Q(is_paid=True), name='order_paid_created_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_paid=False), name='order_unpaid_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
@@ -98,12 +196,16 @@ class OrderItem(models.Model):
     product = models.ForeignKey("Product", on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=8, decimal_places=2)  # price at the time of order
+    # Promotion discount on the whole line, and the promotions that made it up:
+    # [{id, name, code, discount}] (see api/promotions.py)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    promotions = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
 
     def __str__(self):
         return f"{self.product.name} ({self.quantity})"
 
     def total_price(self):
-        return self.price * self.quantity
+        return self.price * self.quantity - self.discount
     
 
 
@@ -123,6 +225,12 @@ class WishlistItem(models.Model):
     product = models.ForeignKey("Product", on_delete=models.CASCADE)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # add_to_wishlist inserts with ignore_conflicts and relies on this
+            models.UniqueConstraint(fields=['wishlist', 'product'], name='unique_wishlist_product'),
+        ]
+
     def __str__(self):
         return f"{self.product.name} in {self.wishlist.user.username}'s wishlist"
     
@@ -159,6 +267,12 @@ class DeliveryAssignment(models.Model):
     status = models.CharField(max_length=30, choices=STATUS_CHOICES, default='Pending')
     last_updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # An agent's assignment feed, newest first
+            models.Index(fields=['delivery_agent', '-assigned_at'], name='assignment_agent_assigned_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.order.id} - {self.status}"
 
@@ -189,3 +303,259 @@ class UserAddress(models.Model):
 
     class Meta:
         verbose_name_plural = "User Addresses"
+
+
+# ------------------- Promotion Models -------------------
+
+class Promotion(models.Model):
+    """
+    A discount rule, limited to one product, subcategory, category or seller,
+    or storewide when none is set. A promotion with a code is a coupon and
+    only applies when the shopper enters it. See api/promotions.py.
+    """
+    KIND_CHOICES = [
+        ('percent', 'Percent off'),
+        ('amount', 'Amount off each unit'),
+        ('buy_x_get_y', 'Buy X get Y free'),
+    ]
+
+    name = models.CharField(max_length=100)
+    code = models.CharField(max_length=50, unique=True, null=True, blank=True)  # stored upper case
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    value = models.DecimalField(max_digits=8, decimal_places=2, default=0)  # percent or amount
+    buy_quantity = models.PositiveIntegerField(default=0)
+    get_quantity = models.PositiveIntegerField(default=0)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name='promotions')
+    subcategory = models.ForeignKey(SubCategory, on_delete=models.CASCADE, null=True, blank=True, related_name='promotions')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='promotions')
+    seller = models.ForeignKey(Seller, on_delete=models.CASCADE, null=True, blank=True, related_name='promotions')
+    starts_at = models.DateTimeField(null=True, blank=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    SCOPES = ('product', 'subcategory', 'category', 'seller')
+
+    def clean(self):
+        if sum(getattr(self, f'{scope}_id') is not None for scope in self.SCOPES) > 1:
+            raise ValidationError("A promotion applies to at most one of product, subcategory, category or seller.")
+        if self.kind == 'buy_x_get_y' and not (self.buy_quantity and self.get_quantity):
+            raise ValidationError("Buy X get Y needs both quantities.")
+        if self.kind == 'percent' and not 0 < self.value <= 100:
+            raise ValidationError("A percentage must be between 0 and 100.")
+
+    def save(self, *args, **kwargs):
+        self.code = (self.code or '').strip().upper() or None
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} ({self.code})" if self.code else self.name
+
+
+# ------------------- Stock Reservation Models -------------------
+
+class StockReservation(models.Model):
+    """Temporary hold on product stock between checkout and order placement."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_user_product_reservation'),
+        ]
+        indexes = [
+            # Covers the "active holds for these products" sum used by available stock.
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_exp_idx'),
+            # Lets the sweeper find expired holds without scanning the table.
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} held for {self.user_id} until {self.expires_at}"
+
+
+
+# ------------------- Idempotency Models -------------------
+
+class IdempotencyKey(models.Model):
+    """Stored response for a client-supplied Idempotency-Key, replayed on retries."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # null while in flight
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_user_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
+# ------------------- Background Task Models -------------------
+
+class Task(models.Model):
+    """A unit of background work picked up by `run_task_worker` processes."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    queue = models.CharField(max_length=50, default='default')
+    args = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll "queued tasks of this queue that are due" in run_at order.
+            models.Index(fields=['queue', 'status', 'run_at'], name='task_poll_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.queue}] {self.status}"
+
+
+# ------------------- Recommendation Models -------------------
+
+class CoPurchaseCount(models.Model):
+    """
+    How many orders contained both products; one row per direction. The
+    diagonal (product == other) is the product's own order count.
+    Maintained by api/recommendations.py.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_copurchase_pair'),
+        ]
+
+
+class ProductRecommendation(models.Model):
+    """Top-K "frequently bought together" neighbours of a product, precomputed."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Also the index product detail reads through
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_recommendation_rank'),
+        ]
+
+
+class JobCheckpoint(models.Model):
+    """How far an incremental offline job has got, e.g. the last order id it processed."""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+# ------------------- Reporting Models -------------------
+
+class SalesRollup(models.Model):
+    """
+    One day of sales for one product, seller or category, or for the whole
+    store (dimension 'total', key 0). Rebuilt by api/rollups.py.
+    """
+    DIMENSION_CHOICES = [
+        ('total', 'Total'),
+        ('product', 'Product'),
+        ('seller', 'Seller'),
+        ('category', 'Category'),
+    ]
+
+    day = models.DateField()
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key = models.BigIntegerField()  # product / seller / category id
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # One key's date range, e.g. a seller's daily series
+            models.UniqueConstraint(fields=['dimension', 'key', 'day'], name='unique_sales_rollup'),
+        ]
+        indexes = [
+            # Every key of a dimension over a date range, e.g. top products
+            models.Index(fields=['dimension', 'day'], name='sales_rollup_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}:{self.key}"
+
+# ------------------- Notification Models -------------------
+
+class Notification(models.Model):
+    """In-app message to a shopper, e.g. a wishlisted product got cheaper (see api/notifications.py)."""
+    KIND_CHOICES = [
+        ('price_drop', 'Price drop'),
+        ('back_in_stock', 'Back in stock'),
+        ('low_stock', 'Low stock'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    message = models.CharField(max_length=255)
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The notification list, and the dedupe / rate limit lookups in the fan-out
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user_id}: {self.message}"
+
+
+# ------------------- Monitoring Models -------------------
+
+class RequestProfile(models.Model):
+    """cProfile output and SQL trace of one request, captured on demand (see api/profiling.py)."""
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    route = models.CharField(max_length=100, blank=True, default='')
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    query_time_ms = models.FloatField(default=0)
+    queries = models.JSONField(default=list)  # [{sql, params, duration_ms, stack}]
+    stats = models.TextField(blank=True, default='')  # pstats report, sorted by cumulative time
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,117 @@
+"""
+Price-drop and back-in-stock notifications for wishlisted products.
+
+A Product save that lowers the effective price or restocks a sold-out
+product enqueues `notify_wishlisters` (see signals.py), so the seller's
+request never waits on the fan-out. The task streams the users who
+wishlisted the product in chunks of NOTIFICATION_BATCH_SIZE. For each chunk
+it drops users already told about this product within
+NOTIFICATION_DEDUPE_WINDOW, and users who hit NOTIFICATION_RATE_LIMIT within
+NOTIFICATION_RATE_WINDOW. It then writes the rest with one bulk_create.
+Retries are safe because of the dedupe window.
+
+Each user's unread count is cached and dropped whenever it changes. The
+fan-out runs in a task worker, which can only drop its own entries from a
+per-process cache, so without SHARED_CACHE the count is read from the
+table every time.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Notification, Product, WishlistItem
+
+
+MESSAGES = {
+    'price_drop': "{name} is now {new_price:.2f} (was {old_price:.2f})",
+    'back_in_stock': "{name} is back in stock",
+}
+
+
+def _effective_price(price, discount):
+    return float(price) * (1 - float(discount or 0) / 100)
+
+
+def product_changes(product):
+    """[(kind, data)] for notification-worthy changes since the product was loaded."""
+    previous = getattr(product, '_loaded_values', None)
+    if not previous:
+        return []
+    changes = []
+    if 'price' in previous and 'discount_percentage' in previous:
+        old_price = _effective_price(previous['price'], previous['discount_percentage'])
+        new_price = _effective_price(product.price, product.discount_percentage)
+        if round(new_price, 2) < round(old_price, 2):
+            changes.append(('price_drop', {'old_price': round(old_price, 2), 'new_price': round(new_price, 2)}))
+    if previous.get('stock') == 0 and product.stock > 0:
+        changes.append(('back_in_stock', {}))
+    return changes
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def fan_out(product_id, kind, data):
+    """Notify everyone who wishlisted the product. Returns how many notifications were written."""
+    product = Product.objects.filter(pk=product_id).only('id', 'name').first()
+    if product is None:
+        return 0
+    message = MESSAGES[kind].format(name=product.name, **data)[:255]
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    user_ids = (
+        WishlistItem.objects.filter(product_id=product_id)
+        .order_by('wishlist__user_id')
+        .values_list('wishlist__user_id', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    written = 0
+    for chunk in _chunks(user_ids, batch_size):
+        written += _notify(set(chunk), product_id, kind, message, data)
+    return written
+
+
+def _notify(user_ids, product_id, kind, message, data):
+    now = timezone.now()
+    already_told = Notification.objects.filter(
+        user_id__in=user_ids, product_id=product_id, kind=kind,
+        created_at__gte=now - settings.NOTIFICATION_DEDUPE_WINDOW,
+    ).values_list('user_id', flat=True)
+    rate_limited = (
+        Notification.objects.filter(user_id__in=user_ids, created_at__gte=now - settings.NOTIFICATION_RATE_WINDOW)
+        .values('user_id')
+        .annotate(n=Count('id'))
+        .filter(n__gte=settings.NOTIFICATION_RATE_LIMIT)
+        .values_list('user_id', flat=True)
+    )
+    recipients = sorted(user_ids - set(already_told) - set(rate_limited))
+    Notification.objects.bulk_create([
+        Notification(user_id=user_id, kind=kind, product_id=product_id, message=message, data=data)
+        for user_id in recipients
+    ])
+    invalidate_unread_counts(recipients)
+    return len(recipients)
+
+
+def _unread_key(user_id):
+    return f'notifications:{user_id}:unread'
+
+
+def unread_count(user):
+    if not settings.SHARED_CACHE:
+        return Notification.objects.filter(user=user, is_read=False).count()
+    key = _unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user=user, is_read=False).count()
+        cache.set(key, count, settings.NOTIFICATION_UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_unread_counts(user_ids):
+    cache.delete_many([_unread_key(user_id) for user_id in user_ids])
@@ -0,0 +1,79 @@
+"""
+Everything a product page shows, for product/<id>/page/.
+
+The page replaces the product detail, subcategory, wishlist and "more like
+this" requests a client made before. Its user-independent part is cached:
+the product with its "frequently bought together" list, its category and
+subcategory, and up to PRODUCT_PAGE_RELATED_LIMIT newest products from the
+same subcategory. The cache key includes the product's updated_at, which a
+single primary key lookup reads. Changes to the product, stock decrements
+at checkout included, therefore show up at once. Sibling and category
+changes show up within PRODUCT_PAGE_CACHE_TIMEOUT.
+
+The wishlist flags and the cart quantity are added per request from the
+cached wishlist ids and cart (see wishlist.py, cart_store.py and
+guest_cart.py).
+
+A hit costs that one lookup. A miss adds three queries: the product with
+its category, subcategory and seller, its recommendations, and its siblings.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import Product
+from .recommendations import recommendations_for
+from .serializers import CategorySerializer, ProductSerializer, RecommendedProductSerializer, SubCategorySerializer
+
+
+# What "more like this" shows of each sibling
+RELATED_CONTEXT = {'fields': dict.fromkeys(
+    ['id', 'name', 'price', 'discount_percentage', 'discounted_price', 'stock', 'image', 'image_variants'], {}
+)}
+
+
+def _build(product_id):
+    product = Product.objects.select_related('category', 'subcategory__category', 'seller__user').filter(pk=product_id).first()
+    if product is None:
+        return None
+    data = dict(ProductSerializer(product).data)
+    data['frequently_bought_together'] = RecommendedProductSerializer(recommendations_for(product.id), many=True).data
+    siblings = Product.objects.filter(subcategory_id=product.subcategory_id) if product.subcategory_id \
+        else Product.objects.filter(category_id=product.category_id)
+    siblings = ProductSerializer.setup_queryset(siblings.exclude(pk=product.pk), RELATED_CONTEXT).order_by('-created_at')
+    return {
+        'product': data,
+        'category': CategorySerializer(product.category).data,
+        'subcategory': SubCategorySerializer(product.subcategory).data if product.subcategory else None,
+        'related': [dict(row) for row in ProductSerializer(
+            siblings[:settings.PRODUCT_PAGE_RELATED_LIMIT], many=True, context=RELATED_CONTEXT
+        ).data],
+    }
+
+
+def shared_page(product_id):
+    """The cached, user-independent part of the page. Http404 if there's no such product."""
+    updated_at = Product.objects.filter(pk=product_id).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        raise Http404("No Product matches the given query.")
+    key = f'product_page:{product_id}:{updated_at.timestamp()}'
+    page = cache.get(key)
+    if page is None:
+        page = _build(product_id)
+        if page is None:
+            raise Http404("No Product matches the given query.")
+        cache.set(key, page, settings.PRODUCT_PAGE_CACHE_TIMEOUT)
+    return page
+
+
+def product_page(product_id, wishlisted_ids, cart_quantities):
+    """The full page: the shared part with the user's wishlist flags and cart quantity filled in."""
+    page = shared_page(product_id)
+    product = dict(page['product'], is_wishlisted=product_id in wishlisted_ids)
+    return {
+        **page,
+        'product': product,
+        'related': [dict(row, is_wishlisted=row['id'] in wishlisted_ids) for row in page['related']],
+        'is_wishlisted': product['is_wishlisted'],
+        'cart_quantity': cart_quantities.get(product_id, 0),
+    }
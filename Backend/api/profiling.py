@@ -0,0 +1,215 @@
+"""
+On-demand request profiling and slow-query logging.
+
+ProfilingMiddleware profiles a single request when it carries a valid
+X-Profile-Token header (minted by POST /api/admin/profiles/token/) or, for
+staff users, `?profile=1`. The request runs under cProfile, every SQL
+statement is recorded with its time and the project frames that issued it,
+and the result is stored as a RequestProfile. The response carries its id in
+X-Profile-Id; admins read it back from /api/admin/profiles/<id>/.
+
+Independently, `log_slow_queries` is installed on every database connection
+and logs any query slower than SLOW_QUERY_THRESHOLD_MS together with its
+EXPLAIN plan to the `api.slow_queries` logger.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+import traceback
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import DatabaseError, connections, transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import RequestProfile
+
+
+logger = logging.getLogger('api.slow_queries')
+
+TOKEN_SALT = 'api.profiling'
+PROJECT_DIR = str(settings.BASE_DIR)
+
+
+def make_profile_token(user):
+    return signing.dumps({'user': user.pk}, salt=TOKEN_SALT)
+
+
+def _token_is_valid(token):
+    try:
+        signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _staff_user(request):
+    # Middleware runs before DRF authenticates, so check the JWT ourselves.
+    if request.user.is_authenticated:
+        return request.user if request.user.is_staff else None
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    if result and result[0].is_staff:
+        return result[0]
+    return None
+
+
+def _call_site():
+    """The project frames (outside site-packages) that led to a query, innermost last."""
+    frames = [
+        f"{os.path.relpath(frame.filename, PROJECT_DIR)}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(PROJECT_DIR)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return frames[-settings.PROFILE_STACK_DEPTH:]
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        token = request.headers.get('X-Profile-Token')
+        user = None
+        if token:
+            if not _token_is_valid(token):
+                return self.get_response(request)
+        elif request.GET.get('profile') == '1':
+            user = _staff_user(request)
+            if user is None:
+                return self.get_response(request)
+        else:
+            return self.get_response(request)
+        return self.profile(request, user, self.get_response)
+
+    async def _acall(self, request):
+        token = request.headers.get('X-Profile-Token')
+        user = None
+        if token:
+            if not _token_is_valid(token):
+                return await self.get_response(request)
+        elif request.GET.get('profile') == '1':
+            user = await sync_to_async(_staff_user)(request)
+            if user is None:
+                return await self.get_response(request)
+        else:
+            return await self.get_response(request)
+        # The profiler and the SQL recorder follow one thread. Run the request
+        # from it; the async ORM hands its queries back to that thread.
+        return await sync_to_async(self.profile)(request, user, async_to_sync(self.get_response))
+
+    def profile(self, request, user, get_response):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append({
+                    'sql': sql,
+                    'params': repr(params)[:1000],
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                    'stack': _call_site(),
+                })
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        report = io.StringIO()
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(settings.PROFILE_STATS_LIMIT)
+        match = request.resolver_match
+        if user is None and getattr(request, 'user', None) is not None and request.user.is_authenticated:
+            user = request.user
+        profile = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            route=(match.url_name or match.route or '')[:100] if match else '',
+            status_code=response.status_code,
+            duration_ms=round(duration_ms, 3),
+            query_count=len(queries),
+            query_time_ms=round(sum(q['duration_ms'] for q in queries), 3),
+            queries=queries,
+            stats=report.getvalue(),
+        )
+        # Keep only the newest PROFILE_MAX_STORED profiles
+        stale = RequestProfile.objects.order_by('-created_at').values_list('pk', flat=True)[settings.PROFILE_MAX_STORED:]
+        RequestProfile.objects.filter(pk__in=list(stale)).delete()
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+
+# ------------------- Slow query log -------------------
+
+_explaining = threading.local()
+
+EXPLAIN_PREFIX = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+    'mysql': 'EXPLAIN ',
+}
+
+
+def _explain(connection, sql, params):
+    prefix = EXPLAIN_PREFIX.get(connection.vendor)
+    keyword = (sql.split(None, 1) or [''])[0].upper()
+    if prefix is None or keyword not in ('SELECT', 'WITH'):
+        return None
+    _explaining.active = True
+    try:
+        # A savepoint keeps a failed EXPLAIN from aborting the caller's transaction on Postgres
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+    except DatabaseError as exc:
+        return f"(EXPLAIN failed: {exc})"
+    finally:
+        _explaining.active = False
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold or many or getattr(_explaining, 'active', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms >= threshold:
+        plan = _explain(context['connection'], sql, params)
+        logger.warning("Slow query (%.1f ms): %s\nparams: %r\nplan:\n%s", elapsed_ms, sql, params, plan or '(not available)')
+    return result
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    """connection_created receiver. Inserted first so it times only the database call."""
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow_queries)
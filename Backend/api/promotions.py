@@ -0,0 +1,139 @@
+"""
+Promotions and coupons, applied in one pass over a cart.
+
+Active Promotion rows are compiled into an index held in process memory.
+Automatic promotions are listed under their scope: ('product', id),
+('subcategory', id), ('category', id), ('seller', id) or ('all', None).
+Coupons are kept by code. Pricing a line is five dict lookups, with no
+queries.
+
+The index's version is max(updated_at) and count(*) over Promotion, as in
+conditional.py: one aggregate query per pricing call, which every process
+runs against the same database, so a save or delete anywhere is seen by all
+of them at once. The index is rebuilt when the version changes. Start and
+end times are checked at pricing time, so a promotion starting or ending
+needs no rebuild. Rules the model's clean() would reject (e.g. buy X get Y
+with a zero quantity) can still be saved outside the admin; they are
+skipped.
+
+Each line gets the best automatic promotion that covers it. A coupon the
+shopper entered is applied on top, when it covers the line; a percentage
+coupon takes its percentage of what's left. The discount never takes a line
+below zero. Prices are Product.discounted_price(), so the product's own
+discount_percentage applies first.
+"""
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import Promotion
+
+
+_index = {'version': None, 'rules': {}, 'coupons': {}}
+
+
+def _scope(promotion):
+    for scope in Promotion.SCOPES:
+        key = getattr(promotion, f'{scope}_id')
+        if key is not None:
+            return (scope, key)
+    return ('all', None)
+
+
+def _is_valid(promotion):
+    if promotion.kind == 'buy_x_get_y':
+        return promotion.buy_quantity > 0 and promotion.get_quantity > 0
+    if promotion.kind == 'percent':
+        return 0 < promotion.value <= 100
+    return promotion.value > 0
+
+
+def _compile(promotion):
+    return {
+        'id': promotion.id,
+        'name': promotion.name,
+        'code': promotion.code,
+        'kind': promotion.kind,
+        'value': float(promotion.value),
+        'buy': promotion.buy_quantity,
+        'get': promotion.get_quantity,
+        'scope': _scope(promotion),
+        'starts_at': promotion.starts_at,
+        'ends_at': promotion.ends_at,
+    }
+
+
+def _build(version):
+    rules, coupons = {}, {}
+    promotions = Promotion.objects.filter(is_active=True).filter(Q(ends_at__isnull=True) | Q(ends_at__gt=timezone.now()))
+    for promotion in promotions:
+        if not _is_valid(promotion):
+            continue
+        rule = _compile(promotion)
+        if rule['code']:
+            coupons[rule['code']] = rule
+        else:
+            rules.setdefault(rule['scope'], []).append(rule)
+    return {'version': version, 'rules': rules, 'coupons': coupons}
+
+
+def _current_index():
+    global _index
+    version = Promotion.objects.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    if version != _index['version']:
+        _index = _build(version)
+    return _index
+
+
+def _is_live(rule, now):
+    return (rule['starts_at'] is None or rule['starts_at'] <= now) and (rule['ends_at'] is None or now < rule['ends_at'])
+
+
+def find_coupon(code):
+    """The live coupon with this code (any case), or None."""
+    rule = _current_index()['coupons'].get((code or '').strip().upper())
+    return rule if rule is not None and _is_live(rule, timezone.now()) else None
+
+
+def _discount(rule, unit_price, quantity, remaining):
+    if rule['kind'] == 'percent':
+        return remaining * rule['value'] / 100
+    if rule['kind'] == 'amount':
+        return min(rule['value'], unit_price) * quantity
+    free = quantity // (rule['buy'] + rule['get']) * rule['get']
+    return free * unit_price
+
+
+def price_lines(lines, coupon=None):
+    """
+    Apply promotions to cart lines. Each line is a dict with product_id,
+    subcategory_id, category_id, seller_id, unit_price and quantity. Returns
+    one {'discount', 'promotions': [{id, name, code, discount}]} per line,
+    in order. `coupon` is a rule from find_coupon().
+    """
+    index = _current_index()
+    now = timezone.now()
+    priced = []
+    for line in lines:
+        scopes = [
+            ('product', line['product_id']), ('subcategory', line['subcategory_id']),
+            ('category', line['category_id']), ('seller', line['seller_id']), ('all', None),
+        ]
+        remaining = line['unit_price'] * line['quantity']
+        applied = []
+        best, best_discount = None, 0
+        for scope in scopes:
+            for rule in index['rules'].get(scope, ()):
+                if _is_live(rule, now):
+                    discount = _discount(rule, line['unit_price'], line['quantity'], remaining)
+                    if discount > best_discount:
+                        best, best_discount = rule, discount
+        chosen = [best] if best else []
+        if coupon is not None and coupon['scope'] in scopes:
+            chosen.append(coupon)
+        for rule in chosen:
+            discount = round(min(_discount(rule, line['unit_price'], line['quantity'], remaining), remaining), 2)
+            if discount > 0:
+                remaining -= discount
+                applied.append({'id': rule['id'], 'name': rule['name'], 'code': rule['code'], 'discount': discount})
+        priced.append({'discount': round(sum(p['discount'] for p in applied), 2), 'promotions': applied})
+    return priced
@@ -0,0 +1,195 @@
+"""
+"Frequently bought together" recommendations, computed offline.
+
+`update_recommendations()` only reads orders it hasn't seen before; a
+JobCheckpoint records the last order id it processed. It streams their
+OrderItem rows grouped by order and adds each order's product pairs to
+CoPurchaseCount, a sparse item-item matrix whose diagonal is each product's
+order count. Then it rescores the products those orders touched, and
+their neighbours, whose scores against them moved with their order
+counts, and rewrites their top RECOMMENDATION_TOP_K rows in
+ProductRecommendation.
+
+The score is cosine similarity, count(a, b) / sqrt(count(a) * count(b)), so
+bestsellers don't show up next to everything. Product detail reads the
+precomputed rows with one indexed query.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations, groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import CoPurchaseCount, JobCheckpoint, Order, OrderItem, Product, ProductRecommendation
+
+
+CHECKPOINT = 'recommendations'
+# Products per query when reading or rewriting matrix rows
+PRODUCT_BATCH = 500
+
+
+def _batches(values, size=PRODUCT_BATCH):
+    iterator = iter(values)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _last_settled_order_id(after_id):
+    """Highest order id that is old enough that no checkout with a lower id can still be in flight."""
+    cutoff = timezone.now() - settings.RECOMMENDATION_ORDER_LAG
+    first_recent = (
+        Order.objects.filter(id__gt=after_id, created_at__gte=cutoff).order_by('id').values_list('id', flat=True).first()
+    )
+    if first_recent is not None:
+        return first_recent - 1
+    return Order.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def _pair_counts(first_order_id, last_order_id):
+    """Co-occurrence deltas for orders in (first_order_id, last_order_id]."""
+    rows = (
+        OrderItem.objects.filter(order_id__gt=first_order_id, order_id__lte=last_order_id)
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=2000)
+    )
+    deltas = Counter()
+    for _, items in groupby(rows, key=itemgetter(0)):
+        # Very large orders would add a quadratic number of weak pairs
+        products = sorted({product_id for _, product_id in items})[:settings.RECOMMENDATION_MAX_ORDER_ITEMS]
+        for product_id in products:
+            deltas[product_id, product_id] += 1
+        for a, b in combinations(products, 2):
+            deltas[a, b] += 1
+            deltas[b, a] += 1
+    return deltas
+
+
+def _add_counts(deltas):
+    by_product = defaultdict(dict)
+    for (a, b), delta in deltas.items():
+        by_product[a][b] = delta
+    for batch in _batches(by_product):
+        totals = {(a, b): delta for a in batch for b, delta in by_product[a].items()}
+        existing = CoPurchaseCount.objects.filter(product_id__in=batch).values_list('product_id', 'other_id', 'count')
+        for a, b, count in existing:
+            if (a, b) in totals:
+                totals[a, b] += count
+        CoPurchaseCount.objects.bulk_create(
+            [CoPurchaseCount(product_id=a, other_id=b, count=count) for (a, b), count in totals.items()],
+            update_conflicts=True, unique_fields=['product', 'other'], update_fields=['count'], batch_size=1000,
+        )
+
+
+def _rescore(product_ids):
+    """Rewrite the top-K rows of these products. Returns how many changed."""
+    top_k = settings.RECOMMENDATION_TOP_K
+    changed = 0
+    for batch in _batches(sorted(product_ids)):
+        neighbours = defaultdict(list)
+        rows = (
+            CoPurchaseCount.objects.filter(product_id__in=batch, count__gte=settings.RECOMMENDATION_MIN_COUNT)
+            .exclude(other_id=F('product_id'))
+            .values_list('product_id', 'other_id', 'count')
+        )
+        for a, b, count in rows:
+            neighbours[a].append((b, count))
+
+        involved = set(batch) | {b for pairs in neighbours.values() for b, _ in pairs}
+        order_counts = {}
+        for ids in _batches(involved):
+            order_counts.update(
+                CoPurchaseCount.objects.filter(product_id__in=ids, other_id=F('product_id')).values_list('product_id', 'count')
+            )
+
+        fresh = {}
+        for a in batch:
+            scored = (
+                (count / math.sqrt(order_counts[a] * order_counts[b]), b)
+                for b, count in neighbours.get(a, ())
+                if order_counts.get(a) and order_counts.get(b)
+            )
+            fresh[a] = [(b, round(score, 6)) for score, b in heapq.nlargest(top_k, scored)]
+
+        current = defaultdict(list)
+        for a, b, score in ProductRecommendation.objects.filter(product_id__in=batch).order_by('product_id', 'rank').values_list(
+            'product_id', 'recommended_id', 'score'
+        ):
+            current[a].append((b, score))
+        stale = [a for a in batch if fresh[a] != current.get(a, [])]
+        if not stale:
+            continue
+
+        with transaction.atomic():
+            ProductRecommendation.objects.filter(product_id__in=stale).delete()
+            ProductRecommendation.objects.bulk_create([
+                ProductRecommendation(product_id=a, recommended_id=b, rank=rank, score=score)
+                for a in stale
+                for rank, (b, score) in enumerate(fresh[a], start=1)
+            ])
+            # Moves the product detail ETag
+            Product.objects.filter(pk__in=stale).update(updated_at=timezone.now())
+        changed += len(stale)
+    return changed
+
+
+def update_recommendations(full=False, batch_orders=None):
+    """
+    Fold orders placed since the last run into the matrix and rescore the
+    products they touched. `full` rebuilds everything from scratch.
+    Returns (orders processed up to id, products rescored).
+    """
+    batch_orders = batch_orders or settings.RECOMMENDATION_BATCH_ORDERS
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    if full:
+        with transaction.atomic():
+            CoPurchaseCount.objects.all().delete()
+            checkpoint.position = 0
+            checkpoint.save(update_fields=['position', 'updated_at'])
+
+    end = _last_settled_order_id(checkpoint.position)
+    touched = set()
+    while checkpoint.position < end:
+        upper = min(checkpoint.position + batch_orders, end)
+        with transaction.atomic():
+            deltas = _pair_counts(checkpoint.position, upper)
+            _add_counts(deltas)
+            checkpoint.position = upper
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        touched.update(a for a, _ in deltas)
+
+    if full:
+        # Products with no orders at all keep no stale rows either
+        touched.update(ProductRecommendation.objects.values_list('product_id', flat=True).distinct())
+    else:
+        touched |= _neighbours(touched)
+    return checkpoint.position, _rescore(touched)
+
+
+def _neighbours(product_ids):
+    """Products scored against any of these, i.e. bought with one of them at least RECOMMENDATION_MIN_COUNT times."""
+    neighbours = set()
+    for batch in _batches(product_ids):
+        neighbours.update(
+            CoPurchaseCount.objects.filter(other_id__in=batch, count__gte=settings.RECOMMENDATION_MIN_COUNT)
+            .values_list('product_id', flat=True)
+        )
+    return neighbours
+
+
+def recommendations_for(product_id):
+    """The precomputed neighbours of a product, best first, with their products joined in."""
+    return (
+        ProductRecommendation.objects.filter(product_id=product_id)
+        .order_by('rank')
+        .select_related('recommended')
+        .only(
+            'product', 'rank', 'score', 'recommended__id', 'recommended__name', 'recommended__price',
+            'recommended__discount_percentage', 'recommended__image', 'recommended__image_variants',
+        )
+    )
@@ -0,0 +1,154 @@
+"""
+Stock reservations.
+
+Checkout places a short-lived hold (StockReservation) on every cart line so
+two shoppers cannot both buy the last unit. Placing the order turns the
+holds into permanent decrements of Product.stock; holds that are never
+converted expire and are removed by the `release_expired_reservations`
+management command.
+
+Available stock is always `Product.stock - sum(active holds)`, read from the
+(product, expires_at) index. Product rows are only locked for the few
+statements needed to check and write a single line, never for a whole cart.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+
+DEFAULT_RESERVATION_TTL = timedelta(minutes=10)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product, requested, available):
+        self.product = product
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Only {available} of '{product.name}' available, {requested} requested"
+        )
+
+
+def reservation_ttl():
+    return getattr(settings, 'STOCK_RESERVATION_TTL', DEFAULT_RESERVATION_TTL)
+
+
+def reserved_quantities(product_ids, exclude_user=None):
+    """Return {product_id: units held by active reservations}."""
+    holds = StockReservation.objects.filter(
+        product_id__in=product_ids,
+        expires_at__gt=timezone.now(),
+    )
+    if exclude_user is not None:
+        holds = holds.exclude(user=exclude_user)
+    rows = holds.values('product_id').annotate(total=Sum('quantity'))
+    return {row['product_id']: row['total'] for row in rows}
+
+
+def available_stock(product, exclude_user=None):
+    held = reserved_quantities([product.id], exclude_user=exclude_user).get(product.id, 0)
+    return max(product.stock - held, 0)
+
+
+def _reserve_line(user, product_id, quantity, expires_at):
+    # One short transaction per line: lock the product row, check what other
+    # shoppers hold, and upsert this user's hold.
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product_id)
+        available = available_stock(product, exclude_user=user)
+        if quantity > available:
+            raise InsufficientStock(product, quantity, available)
+        return StockReservation.objects.update_or_create(
+            user=user,
+            product=product,
+            defaults={'quantity': quantity, 'expires_at': expires_at},
+        )
+
+
+def reserve_cart(user, cart_items):
+    """
+    Hold stock for every cart line until the reservation TTL elapses.
+
+    Lines are reserved in product id order so concurrent checkouts always
+    take row locks in the same order. If any line cannot be satisfied,
+    InsufficientStock is raised and the user's holds are put back the way
+    they were: holds this call created are dropped, and holds it updated get
+    their earlier quantity and expiry back.
+    """
+    expires_at = timezone.now() + reservation_ttl()
+    previous = {
+        reservation.pk: reservation
+        for reservation in StockReservation.objects.filter(user=user).only('pk', 'quantity', 'expires_at')
+    }
+    reservations = []
+    try:
+        for item in sorted(cart_items, key=lambda i: i.product_id):
+            reservation, _ = _reserve_line(user, item.product_id, item.quantity, expires_at)
+            reservations.append(reservation)
+    except InsufficientStock:
+        StockReservation.objects.filter(pk__in=[r.pk for r in reservations if r.pk not in previous]).delete()
+        StockReservation.objects.bulk_update(
+            [previous[r.pk] for r in reservations if r.pk in previous], ['quantity', 'expires_at']
+        )
+        raise
+
+    # Lines no longer in the cart should not keep holding stock.
+    StockReservation.objects.filter(user=user).exclude(
+        product_id__in=[item.product_id for item in cart_items]
+    ).delete()
+    return reservations
+
+
+def commit_reservations(user, cart_items):
+    """
+    Permanently decrement stock for an order and drop the user's holds.
+
+    Must be called inside the transaction that creates the order. Lines
+    covered by an active hold only need a guarded UPDATE; lines without one
+    (checkout skipped or hold expired) fall back to the locked availability
+    check used by reserve_cart.
+    """
+    now = timezone.now()
+    held = dict(
+        StockReservation.objects.filter(user=user, expires_at__gt=now)
+        .values_list('product_id', 'quantity')
+    )
+
+    for item in sorted(cart_items, key=lambda i: i.product_id):
+        if held.get(item.product_id, 0) < item.quantity:
+            product = Product.objects.select_for_update().get(pk=item.product_id)
+            available = available_stock(product, exclude_user=user)
+            if item.quantity > available:
+                raise InsufficientStock(product, item.quantity, available)
+
+        updated = Product.objects.filter(
+            pk=item.product_id, stock__gte=item.quantity
+        ).update(stock=F('stock') - item.quantity, updated_at=now)
+        if not updated:
+            product = Product.objects.get(pk=item.product_id)
+            raise InsufficientStock(product, item.quantity, product.stock)
+
+    StockReservation.objects.filter(user=user).delete()
+
+
+def release_reservations(user):
+    return StockReservation.objects.filter(user=user).delete()[0]
+
+
+def release_expired(batch_size=1000):
+    """Delete expired holds in batches. Returns the number removed."""
+    released = 0
+    now = timezone.now()
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return released
+        released += StockReservation.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,149 @@
+"""
+Daily sales rollups for reporting.
+
+`refresh_rollups()` keeps SalesRollup up to date. A JobCheckpoint holds a
+watermark on Order.updated_at. Each run finds the days that have orders
+changed since the watermark (new orders, or orders marked paid). It
+rebuilds those days from OrderItem for the whole store and per product,
+seller and category, then advances the watermark. Rebuilding whole days
+keeps the job idempotent; a retried or overlapping run rewrites the same
+rows.
+
+A full refresh rebuilds every day with orders the same way, one
+transaction per day, then drops rollups for days that no longer have any,
+so reports never see an empty table mid-rebuild.
+
+Task workers serving the default queue keep the `refresh_sales_rollups`
+task scheduled every SALES_ROLLUP_INTERVAL (see tasks.py); `manage.py
+build_sales_rollups` runs a refresh by hand.
+
+Revenue is OrderItem.price * quantity less the line's promotion discount,
+so a seller is only credited for their own items. The reporting views only read this table.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from .models import Category, JobCheckpoint, Order, OrderItem, Product, SalesRollup, Seller
+
+
+CHECKPOINT = 'sales_rollups'
+
+DIMENSIONS = {
+    'product': 'product_id',
+    'seller': 'product__seller_id',
+    'category': 'product__category_id',
+}
+
+METRICS = {
+    'units': Sum('quantity'),
+    'revenue': Sum(F('price') * F('quantity') - F('discount'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    'orders': Count('order_id', distinct=True),
+    'paid_revenue': Sum(
+        F('price') * F('quantity') - F('discount'), filter=Q(order__is_paid=True),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    ),
+    'paid_orders': Count('order_id', distinct=True, filter=Q(order__is_paid=True)),
+}
+
+
+def _to_position(moment):
+    return int(moment.timestamp() * 1_000_000)
+
+
+def _from_position(position):
+    return datetime.fromtimestamp(position / 1_000_000, tz=dt_timezone.utc)
+
+
+def _rollup(day, dimension, key, row):
+    return SalesRollup(
+        day=day, dimension=dimension, key=key,
+        units=row['units'] or 0, revenue=row['revenue'] or 0, orders=row['orders'],
+        paid_revenue=row['paid_revenue'] or 0, paid_orders=row['paid_orders'],
+    )
+
+
+def rebuild_day(day):
+    """Recompute every rollup row for one day from the raw order items."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    items = OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=start + timedelta(days=1))
+
+    rollups = []
+    total = items.aggregate(**METRICS)
+    if total['orders']:
+        rollups.append(_rollup(day, 'total', 0, total))
+    for dimension, column in DIMENSIONS.items():
+        for row in items.values(column).annotate(**METRICS).order_by():
+            if row[column] is not None:  # products without a seller
+                rollups.append(_rollup(day, dimension, row[column], row))
+
+    with transaction.atomic():
+        SalesRollup.objects.filter(day=day).delete()
+        SalesRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def refresh_rollups(full=False):
+    """
+    Rebuild the days touched by orders changed since the last run, or every
+    day with `full`. Orders changed within SALES_ROLLUP_LAG wait for the next
+    run so a slow transaction can't commit behind the watermark.
+    Returns the number of days rebuilt.
+    """
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=CHECKPOINT)
+    upper = timezone.now() - settings.SALES_ROLLUP_LAG
+    changed = Order.objects.filter(updated_at__lte=upper)
+    if not full and checkpoint.position:
+        changed = changed.filter(updated_at__gt=_from_position(checkpoint.position))
+
+    days = list(changed.dates('created_at', 'day'))
+    for day in days:
+        rebuild_day(day)
+    if full:
+        SalesRollup.objects.exclude(day__in=list(Order.objects.dates('created_at', 'day'))).delete()
+
+    checkpoint.position = _to_position(upper)
+    checkpoint.save(update_fields=['position', 'updated_at'])
+    return len(days)
+
+
+REPORT_METRICS = ('units', 'revenue', 'orders', 'paid_revenue', 'paid_orders')
+
+NAME_SOURCES = {
+    'product': (Product, 'name'),
+    'seller': (Seller, 'store_name'),
+    'category': (Category, 'name'),
+}
+
+
+def sales_report(dimension, date_from, date_to, keys=None, per_day=False, limit=None):
+    """
+    Rollups of one dimension summed over [date_from, date_to]: one row per
+    key, best selling first, or one row per day with `per_day`. `keys`
+    restricts the report to those ids, e.g. one seller's products.
+    """
+    rollups = SalesRollup.objects.filter(dimension=dimension, day__gte=date_from, day__lte=date_to)
+    if keys is not None:
+        rollups = rollups.filter(key__in=keys)
+    # Annotations can't reuse the column names, so sum into total_* and rename
+    sums = {f'total_{name}': Sum(name) for name in REPORT_METRICS}
+    if per_day:
+        rows = list(rollups.values('day').annotate(**sums).order_by('day'))
+    else:
+        rows = rollups.values('key').annotate(**sums).order_by('-total_revenue', 'key')
+        rows = list(rows[:limit] if limit else rows)
+    for row in rows:
+        for name in REPORT_METRICS:
+            row[name] = row.pop(f'total_{name}')
+    if per_day:
+        return rows
+
+    if dimension in NAME_SOURCES:
+        model, field = NAME_SOURCES[dimension]
+        names = dict(model.objects.filter(pk__in=[row['key'] for row in rows]).values_list('pk', field))
+        for row in rows:
+            row['name'] = names.get(row['key'])
+    return rows
@@ -1,5 +1,85 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Product, Category, SubCategory, Cart, CartItem, Order, OrderItem, WishlistItem, Wishlist, Seller, DeliveryAgent, DeliveryAssignment, UserAddress, User
+from .images import variant_urls
+from .models import Product, Category, SubCategory, Cart, CartItem, Order, OrderItem, WishlistItem, Wishlist, Seller, DeliveryAgent, DeliveryAssignment, UserAddress, User, RequestProfile, Notification, ProductRecommendation
+
+
+def parse_field_selection(request):
+    """
+    Read ?fields= and ?expand= into the context used by DynamicFieldsMixin.
+
+    `fields` is a comma separated list; dotted names select inside nested
+    serializers, e.g. ?fields=id,items.quantity,items.product.name
+    """
+    context = {}
+    for param in ('fields', 'expand'):
+        value = request.query_params.get(param)
+        if value is None:
+            continue
+        tree = {}
+        for path in filter(None, (p.strip() for p in value.split(','))):
+            node = tree
+            for part in path.split('.'):
+                node = node.setdefault(part, {})
+        context[param] = tree
+    return context
+
+
+def check_selection(available, selection, expand, extras=()):
+    """Raise ValidationError (a 400) for selected or expanded names that aren't in `available`."""
+    unknown = (set(selection) | set(expand)) - set(available) - set(extras)
+    if unknown:
+        raise serializers.ValidationError({'fields': [f"Unknown field '{name}'" for name in sorted(unknown)]})
+
+
+class DynamicFieldsMixin:
+    """
+    Lets the top level serializer drop fields the client didn't ask for.
+
+    With no ?fields= the output is unchanged. With ?fields=, only the listed
+    fields are kept; ?expand= adds nested relations on top of that, e.g.
+    ?fields=id,name,price&expand=seller_details. Unknown names are a 400.
+    Each serializer's `setup_queryset` uses the same selection to trim
+    select_related/only(). `SELECTABLE_EXTRAS` names keys a view adds to the
+    rendered data itself.
+    """
+    SELECTABLE_EXTRAS = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selection = self.context.get('fields')
+        if selection is not None:
+            self._prune(self, selection, self.context.get('expand') or {})
+
+    @staticmethod
+    def _prune(serializer, selection, expand):
+        check_selection(serializer.fields, selection, expand, getattr(serializer, 'SELECTABLE_EXTRAS', ()))
+        for name in list(serializer.fields):
+            if name not in selection and name not in expand:
+                serializer.fields.pop(name)
+                continue
+            nested = serializer.fields[name]
+            nested = getattr(nested, 'child', nested)
+            if selection.get(name) and isinstance(nested, serializers.Serializer):
+                DynamicFieldsMixin._prune(nested, selection[name], expand.get(name) or {})
+
+    @classmethod
+    def selected_fields(cls, context):
+        """Names of this serializer's fields that will be rendered."""
+        declared = list(cls.Meta.fields)
+        selection = context.get('fields')
+        if selection is None:
+            return declared
+        expand = context.get('expand') or {}
+        return [name for name in declared if name in selection or name in expand]
+
+    @staticmethod
+    def nested_context(context, name):
+        """Selection context for the nested serializer rendered under `name`."""
+        selection = context.get('fields')
+        if selection is None or not selection.get(name):
+            return {}
+        return {'fields': selection[name], 'expand': (context.get('expand') or {}).get(name) or {}}
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -13,7 +93,7 @@ class SubCategorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = SubCategory
-        fields = ['id', 'name', 'category']
+        fields = ['id', 'name', 'slug', 'category']
 
 
 class SellerSerializer(serializers.ModelSerializer):
@@ -25,19 +105,59 @@ class SellerSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'store_name', 'contact_number', 'address', 'is_verified', 'created_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     discounted_price = serializers.SerializerMethodField()
     seller_details = SellerSerializer(source='seller', read_only=True)
     seller_name = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+    is_wishlisted = serializers.SerializerMethodField()
+
+    # Added by the product detail views
+    SELECTABLE_EXTRAS = ('frequently_bought_together',)
 
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'category', 'subcategory', 'price', 'discount_percentage',
-            'stock', 'description', 'image', 'discounted_price', 'seller', 
-            'seller_details', 'seller_name'
+            'stock', 'description', 'image', 'image_variants', 'discounted_price', 'seller', 
+            'seller_details', 'seller_name', 'is_wishlisted'
         ]
 
+    # Model columns each output field reads, for only()
+    COLUMNS = {
+        'category': ['category_id'],
+        'subcategory': ['subcategory_id'],
+        'image_variants': ['image', 'image_variants'],
+        'discounted_price': ['price', 'discount_percentage'],
+        'seller': ['seller_id'],
+        'seller_details': [
+            'seller__id', 'seller__store_name', 'seller__contact_number', 'seller__address',
+            'seller__is_verified', 'seller__created_at', 'seller__user__username', 'seller__user__email',
+        ],
+        'seller_name': ['seller__store_name'],
+        'is_wishlisted': [],
+    }
+    RELATIONS = {
+        'seller_details': ['seller__user'],
+        'seller_name': ['seller'],
+    }
+
+    @classmethod
+    def setup_queryset(cls, queryset, context=None, prefix=''):
+        """Load only what the selected fields need, joining the seller only when shown."""
+        context = context or {}
+        if context.get('fields') is None:
+            return queryset.select_related(f'{prefix}seller__user')
+        columns, relations = {'id'}, set()
+        for name in cls.selected_fields(context):
+            columns.update(cls.COLUMNS.get(name, [name]))
+            relations.update(cls.RELATIONS.get(name, []))
+        if relations:
+            queryset = queryset.select_related(*(prefix + r for r in relations))
+        if not prefix:
+            queryset = queryset.only(*columns)
+        return queryset
+
     def get_discounted_price(self, obj):
         return obj.discounted_price()
     
@@ -46,6 +166,14 @@ class ProductSerializer(serializers.ModelSerializer):
             return obj.seller.store_name
         return None
     
+    def get_image_variants(self, obj):
+        return variant_urls(obj, self.context.get('request'))
+
+    def get_is_wishlisted(self, obj):
+        # The view puts the user's cached wishlist ids in the context; None where it doesn't
+        wishlisted = self.context.get('wishlisted_ids')
+        return None if wishlisted is None else obj.id in wishlisted
+
     def get_product_image(self, obj):
         request = self.context.get('request')
         if obj.product_image:
@@ -53,6 +181,31 @@ class ProductSerializer(serializers.ModelSerializer):
         return None
 
 
+class RecommendedProductSerializer(serializers.ModelSerializer):
+    """A "frequently bought together" entry; reads the product joined by recommendations_for()."""
+    id = serializers.IntegerField(source='recommended.id')
+    name = serializers.CharField(source='recommended.name')
+    price = serializers.DecimalField(source='recommended.price', max_digits=8, decimal_places=2)
+    discounted_price = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductRecommendation
+        fields = ['id', 'name', 'price', 'discounted_price', 'image_variants', 'score']
+
+    def get_discounted_price(self, obj):
+        return obj.recommended.discounted_price()
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.recommended, self.context.get('request'))
+
+
+class LowStockProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'stock', 'low_stock_threshold', 'low_stock_override', 'low_stock_alerted']
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     discounted_price = serializers.SerializerMethodField()
@@ -65,7 +218,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         return obj.product.discounted_price()
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.SerializerMethodField()
 
@@ -76,6 +229,18 @@ class CartSerializer(serializers.ModelSerializer):
     def get_total_price(self, obj):
         return obj.total_price()
 
+    @classmethod
+    def setup_queryset(cls, queryset, context=None):
+        context = context or {}
+        selected = cls.selected_fields(context)
+        if 'items' not in selected and 'total_price' not in selected:
+            return queryset
+        product_context = cls.nested_context(cls.nested_context(context, 'items'), 'product')
+        items = ProductSerializer.setup_queryset(
+            CartItem.objects.select_related('product'), product_context, prefix='product__'
+        )
+        return queryset.prefetch_related(Prefetch('items', queryset=items))
+
 
 # Order
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -84,19 +249,40 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'product_name', 'price', 'quantity', 'total_price']
+        fields = ['id', 'product', 'product_name', 'price', 'quantity', 'discount', 'promotions', 'total_price']
 
     def get_total_price(self, obj):
         return obj.total_price()
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
         fields = ['id', 'user', 'items', 'total_price', 'created_at', 'is_paid']
 
+    @classmethod
+    def setup_queryset(cls, queryset, context=None):
+        context = context or {}
+        selected = cls.selected_fields(context)
+        if context.get('fields') is not None:
+            queryset = queryset.only(*(f if f != 'user' else 'user_id' for f in selected if f != 'items'), 'id')
+        if 'items' not in selected:
+            return queryset
+        return queryset.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        )
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Order history row without item bodies; expects `item_count` annotated."""
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'user', 'item_count', 'total_price', 'created_at', 'is_paid']
+
 
 class WishlistItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -151,4 +337,22 @@ class UserListSerializer(serializers.ModelSerializer):
         return hasattr(obj, 'seller_profile')
 
     def get_is_delivery_agent(self, obj):
-        return hasattr(obj, 'delivery_agent_profile')
\ No newline at end of file
+        return hasattr(obj, 'delivery_agent_profile')
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'kind', 'product', 'message', 'data', 'is_read', 'created_at']
+
+
+class RequestProfileSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RequestProfile
+        fields = ['id', 'user', 'method', 'path', 'route', 'status_code', 'duration_ms', 'query_count', 'query_time_ms', 'created_at']
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RequestProfile
+        fields = '__all__'
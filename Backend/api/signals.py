@@ -0,0 +1,51 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cart_store import invalidate_products
+from .catalog import invalidate_name_map
+from .images import variants_are_current
+from .models import Category, Product, SubCategory, Wishlist, WishlistItem
+from .metrics import install_query_timer
+from .profiling import install_slow_query_log
+from .notifications import product_changes
+from .tasks import generate_product_image_variants, notify_wishlisters
+from .wishlist import invalidate_wishlist
+
+
+@receiver(post_save, sender=Product)
+def queue_image_variants(sender, instance, **kwargs):
+    # Covers uploads from the seller endpoint and the Django admin alike
+    if instance.image and not variants_are_current(instance):
+        generate_product_image_variants.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def queue_wishlist_notifications(sender, instance, created, **kwargs):
+    if not created:
+        for kind, data in product_changes(instance):
+            notify_wishlisters.enqueue(instance.pk, kind, data)
+    # Compare the next save against what was just written
+    instance.snapshot_tracked_fields()
+
+
+@receiver([post_save, post_delete], sender=Product)
+def refresh_cart_products(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=SubCategory)
+def refresh_catalog_name_map(sender, **kwargs):
+    invalidate_name_map()
+
+
+@receiver([post_save, post_delete], sender=WishlistItem)
+def refresh_wishlist_ids(sender, instance, **kwargs):
+    user_id = Wishlist.objects.filter(pk=instance.wishlist_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_wishlist(user_id)
+
+
+connection_created.connect(install_slow_query_log, dispatch_uid='api.slow_query_log')
+connection_created.connect(install_query_timer, dispatch_uid='api.metrics_query_timer')
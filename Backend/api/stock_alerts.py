@@ -0,0 +1,67 @@
+"""
+Low stock alerts for sellers.
+
+Each product has an effective `low_stock_threshold`: its own override, or
+the seller's default. `scan_low_stock()` runs periodically
+(`manage.py scan_low_stock`). It only raises an alert when a product
+crosses its threshold. Products at or below the threshold that haven't been
+alerted get a 'low_stock' Notification for their seller and are flagged
+`low_stock_alerted`. Flagged products that have been restocked are
+unflagged, so the next drop alerts again.
+
+Both queries read partial indexes (product_low_stock_idx and
+product_low_stock_alerted_idx). A scan therefore costs the size of the
+low-stock set, not the catalog.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .models import Notification, Product, Seller
+from .notifications import invalidate_unread_counts
+
+
+def low_stock_products(seller=None):
+    products = Product.objects.filter(stock__lte=F('low_stock_threshold'))
+    if seller is not None:
+        products = products.filter(seller=seller)
+    return products
+
+
+def scan_low_stock():
+    """Alert on new threshold crossings and reset recovered products. Returns (alerted, recovered)."""
+    with transaction.atomic():
+        crossed = list(
+            low_stock_products().filter(low_stock_alerted=False, seller__isnull=False)
+            .select_related('seller')
+            .only('id', 'name', 'stock', 'low_stock_threshold', 'seller__user_id')
+            .select_for_update(of=('self',))
+        )
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=product.seller.user_id, kind='low_stock', product_id=product.id,
+                message=f"{product.name} is low on stock ({product.stock} left)"[:255],
+                data={'stock': product.stock, 'threshold': product.low_stock_threshold},
+            )
+            for product in crossed
+        ])
+        Product.objects.filter(pk__in=[product.id for product in crossed]).update(low_stock_alerted=True)
+
+    recovered = Product.objects.filter(low_stock_alerted=True, stock__gt=F('low_stock_threshold')).update(
+        low_stock_alerted=False
+    )
+    invalidate_unread_counts({product.seller.user_id for product in crossed})
+    return len(crossed), recovered
+
+
+def set_seller_threshold(seller, threshold):
+    """Change a seller's default and apply it to their products without an override."""
+    with transaction.atomic():
+        Seller.objects.filter(pk=seller.pk).update(low_stock_threshold=threshold)
+        Product.objects.filter(seller=seller, low_stock_override__isnull=True).update(low_stock_threshold=threshold)
+    seller.low_stock_threshold = threshold
+
+
+def set_product_threshold(product, override):
+    """Set or clear (None) a product's own threshold."""
+    product.low_stock_override = override
+    product.save(update_fields=['low_stock_override', 'low_stock_threshold', 'updated_at'])
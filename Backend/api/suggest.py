@@ -0,0 +1,185 @@
+"""
+Search box suggestions from an in-memory prefix index.
+
+Each process keeps a sorted list of (key, ref) pairs over category,
+subcategory and product names. A name is indexed once per word it
+contains, from that word to the end: "Amul Taaza Milk" under "amul taaza
+milk", "taaza milk" and "milk". A query is normalized the same way, and
+its matches are the contiguous run found with bisect. Matches are ranked
+by popularity: units sold over SUGGEST_POPULARITY_WINDOW, from the sales
+rollups. One- and two-letter prefixes match a large part of the list, so
+their ranked results are memoized until the index changes under them.
+
+The index is built on the first lookup and versioned from the database,
+so every process sees every change however it was made. Before each lookup
+two aggregate queries read max(updated_at) and the row count of products,
+and of categories and subcategories. Products saved since the index's
+newest one are reloaded in one query and re-indexed; if the product count
+still differs afterwards (a delete), or a category or subcategory changed,
+or the index is older than SUGGEST_REBUILD_INTERVAL, it is rebuilt, which
+also refreshes popularity.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Category, Product, SalesRollup, SubCategory
+
+
+MEMO_PREFIX_LENGTH = 2
+
+_lock = threading.Lock()
+_index = None
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'\w+', text.casefold()))
+
+
+def _keys(name):
+    words = normalize(name).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class PrefixIndex:
+    def __init__(self, version):
+        self.version = version  # see _version()
+        self.built_at = time.monotonic()
+        self.pairs = []  # sorted (key, ref)
+        self.entries = {}  # ref -> {'type', 'id', 'name', ..., 'popularity'}
+        self.product_popularity = {}
+        self.memo = {}
+
+    def load(self, entries):
+        self.entries = entries
+        self.pairs = sorted((key, ref) for ref, entry in entries.items() for key in _keys(entry['name']))
+        self.memo = {}
+
+    def add(self, ref, entry):
+        self.entries[ref] = entry
+        for key in _keys(entry['name']):
+            bisect.insort(self.pairs, (key, ref))
+            self._forget(key)
+
+    def remove(self, ref):
+        entry = self.entries.pop(ref, None)
+        if entry is None:
+            return
+        for key in _keys(entry['name']):
+            position = bisect.bisect_left(self.pairs, (key, ref))
+            if position < len(self.pairs) and self.pairs[position] == (key, ref):
+                del self.pairs[position]
+            self._forget(key)
+
+    def _forget(self, key):
+        for length in range(1, MEMO_PREFIX_LENGTH + 1):
+            self.memo.pop(key[:length], None)
+
+    def search(self, prefix, limit):
+        if len(prefix) <= MEMO_PREFIX_LENGTH:
+            if prefix not in self.memo:
+                self.memo[prefix] = self._rank(prefix, settings.SUGGEST_MAX_LIMIT)
+            return self.memo[prefix][:limit]
+        return self._rank(prefix, limit)
+
+    def _rank(self, prefix, limit):
+        refs = set()
+        position = bisect.bisect_left(self.pairs, (prefix,))
+        while position < len(self.pairs) and self.pairs[position][0].startswith(prefix):
+            refs.add(self.pairs[position][1])
+            position += 1
+        best = heapq.nsmallest(limit, refs, key=lambda ref: (-self.entries[ref]['popularity'], self.entries[ref]['name']))
+        return [self.entries[ref] for ref in best]
+
+
+def _product_entry(index, product_id, name):
+    return {'type': 'product', 'id': product_id, 'name': name,
+            'popularity': index.product_popularity.get(product_id, 0)}
+
+
+def _version():
+    """(products max updated_at, products count, categories and subcategories version)."""
+    products = Product.objects.aggregate(updated=Max('updated_at'), count=Count('pk'))
+    catalog = Category.objects.aggregate(
+        updated=Max('updated_at'), count=Count('pk', distinct=True),
+        subcategories_updated=Max('subcategories__updated_at'), subcategories_count=Count('subcategories', distinct=True),
+    )
+    return products['updated'], products['count'], tuple(sorted(catalog.items()))
+
+
+def _build(version):
+    index = PrefixIndex(version)
+    since = timezone.now().date() - settings.SUGGEST_POPULARITY_WINDOW
+    popularity = {
+        (dimension, key): units
+        for dimension, key, units in SalesRollup.objects.filter(dimension__in=['product', 'category'], day__gte=since)
+        .values('dimension', 'key').annotate(units=Sum('units')).values_list('dimension', 'key', 'units')
+    }
+    index.product_popularity = {key: units for (dimension, key), units in popularity.items() if dimension == 'product'}
+    entries, subcategory_popularity = {}, {}
+    for product_id, name, subcategory_id in Product.objects.values_list('id', 'name', 'subcategory_id'):
+        entries[('product', product_id)] = _product_entry(index, product_id, name)
+        if subcategory_id is not None:
+            subcategory_popularity[subcategory_id] = (
+                subcategory_popularity.get(subcategory_id, 0) + index.product_popularity.get(product_id, 0)
+            )
+    for category_id, name, slug in Category.objects.values_list('id', 'name', 'slug'):
+        entries[('category', category_id)] = {
+            'type': 'category', 'id': category_id, 'name': name, 'slug': slug,
+            'popularity': popularity.get(('category', category_id), 0),
+        }
+    for sub_id, name, slug, category_slug in SubCategory.objects.values_list('id', 'name', 'slug', 'category__slug'):
+        entries[('subcategory', sub_id)] = {
+            'type': 'subcategory', 'id': sub_id, 'name': name, 'slug': slug, 'category_slug': category_slug,
+            'popularity': subcategory_popularity.get(sub_id, 0),
+        }
+    index.load(entries)
+    return index
+
+
+def _product_count(index):
+    return sum(1 for kind, _ in index.entries if kind == 'product')
+
+
+def _catch_up(index, version):
+    """Re-index products saved since the index was built; False if it has to be rebuilt instead."""
+    indexed_updated, _, indexed_catalog = index.version
+    _, count, catalog = version
+    if catalog != indexed_catalog or indexed_updated is None:
+        return False
+    # >= so that a save with the same timestamp as the newest indexed one isn't missed
+    for product_id, name in Product.objects.filter(updated_at__gte=indexed_updated).values_list('id', 'name'):
+        index.remove(('product', product_id))
+        index.add(('product', product_id), _product_entry(index, product_id, name))
+    if _product_count(index) != count:
+        return False
+    index.version = version
+    return True
+
+
+def _current_index():
+    global _index
+    version = _version()
+    with _lock:
+        index = _index
+        expired = index is None or time.monotonic() - index.built_at > settings.SUGGEST_REBUILD_INTERVAL.total_seconds()
+        if expired or not (index.version == version or _catch_up(index, version)):
+            index = _index = _build(version)
+        return index
+
+
+def suggestions(query, limit):
+    """Up to `limit` categories, subcategories and products whose names have a word starting with `query`."""
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    index = _current_index()
+    with _lock:
+        results = index.search(prefix, limit)
+    return [{name: value for name, value in entry.items() if name != 'popularity'} for entry in results]
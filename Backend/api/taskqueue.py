@@ -0,0 +1,175 @@
+"""
+Database-backed background task queue.
+
+Tasks are plain functions decorated with @task. Views enqueue them with
+`func.enqueue(*args, **kwargs)`, which inserts a Task row once the current
+transaction commits, so a worker never sees work for data that was rolled
+back. Workers (`python manage.py run_task_worker`) poll the Task table,
+claim rows with a conditional UPDATE, run them and retry failures with
+exponential backoff. No broker is needed; SQLite works for single-node
+setups and tests.
+
+Set TASKS_ALWAYS_EAGER = True to run tasks inline on commit instead of
+queueing them.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = 'default'
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 10  # seconds, doubled after every failed attempt
+DEFAULT_LOCK_TIMEOUT = timedelta(minutes=15)
+DEFAULT_REQUEUE_INTERVAL = timedelta(minutes=1)
+
+_registry = {}
+
+
+class TaskFunction:
+    """Wraps a task function with enqueue helpers; calling it runs it inline."""
+
+    def __init__(self, func, queue, max_attempts):
+        self.func = func
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.name = f"{func.__module__}.{func.__name__}"
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, **kwargs):
+        """Queue the task to run as soon as a worker is free."""
+        return self.enqueue_in(None, *args, **kwargs)
+
+    def enqueue_in(self, delay, *args, **kwargs):
+        """Queue the task to run after `delay` (a timedelta or seconds)."""
+        if delay is not None and not isinstance(delay, timedelta):
+            delay = timedelta(seconds=delay)
+
+        def create():
+            if getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+                self.func(*args, **kwargs)
+                return
+            Task.objects.create(
+                name=self.name,
+                queue=self.queue,
+                args=list(args),
+                kwargs=kwargs,
+                max_attempts=self.max_attempts,
+                run_at=timezone.now() + (delay or timedelta()),
+            )
+
+        transaction.on_commit(create)
+
+
+def task(func=None, *, queue=DEFAULT_QUEUE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Register a function as a background task."""
+    def decorate(f):
+        wrapped = TaskFunction(f, queue, max_attempts)
+        _registry[wrapped.name] = wrapped
+        return wrapped
+
+    if func is not None:
+        return decorate(func)
+    return decorate
+
+
+def get_task(name):
+    if name not in _registry:
+        # Importing the defining module registers it.
+        import_string(name)
+    return _registry[name]
+
+
+# ------------------- Worker -------------------
+
+def _claim_next(queue, worker_id):
+    now = timezone.now()
+    candidates = (
+        Task.objects.filter(queue=queue, status='queued', run_at__lte=now)
+        .order_by('run_at')
+        .values_list('id', flat=True)[:10]
+    )
+    for task_id in candidates:
+        # The conditional UPDATE is the claim: only one worker can flip the row.
+        claimed = Task.objects.filter(id=task_id, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now,
+        )
+        if claimed:
+            return Task.objects.get(id=task_id)
+    return None
+
+
+def _backoff(attempts):
+    base = getattr(settings, 'TASK_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def run_task(job):
+    job.attempts += 1
+    try:
+        get_task(job.name).func(*job.args, **job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_at = timezone.now() + _backoff(job.attempts)
+            logger.warning("Task %s #%s failed, retrying at %s", job.name, job.id, job.run_at)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error("Task %s #%s failed permanently", job.name, job.id)
+    else:
+        job.status = 'done'
+        job.finished_at = timezone.now()
+    job.locked_by = ''
+    job.locked_at = None
+    job.save()
+
+
+def requeue_stale(lock_timeout=None):
+    """Put back tasks whose worker died while running them."""
+    lock_timeout = lock_timeout or getattr(settings, 'TASK_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+    return Task.objects.filter(
+        status='running', locked_at__lt=timezone.now() - lock_timeout
+    ).update(status='queued', locked_by='', locked_at=None)
+
+
+def work(queue=DEFAULT_QUEUE, poll_interval=1.0, burst=False):
+    """
+    Process tasks from `queue` until stopped. With burst=True, return as soon
+    as the queue has no due tasks. Every TASK_REQUEUE_INTERVAL the worker
+    also puts back tasks whose worker died, so they don't wait for a restart.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    requeue_interval = getattr(settings, 'TASK_REQUEUE_INTERVAL', DEFAULT_REQUEUE_INTERVAL).total_seconds()
+    next_requeue = time.monotonic() + requeue_interval
+    while True:
+        close_old_connections()
+        if time.monotonic() >= next_requeue:
+            requeued = requeue_stale()
+            if requeued:
+                logger.warning("Requeued %s stale task(s) on '%s'", requeued, queue)
+            next_requeue = time.monotonic() + requeue_interval
+        job = _claim_next(queue, worker_id)
+        if job is None:
+            if burst:
+                return
+            time.sleep(poll_interval)
+            continue
+        run_task(job)
@@ -0,0 +1,60 @@
+"""Background tasks. Enqueue from views with `some_task.enqueue(...)`."""
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .taskqueue import task
+
+
+@task
+def delete_user(user_id):
+    """Delete a user and everything that cascades from it (orders, cart, profiles)."""
+    User.objects.filter(pk=user_id).delete()
+
+
+@task(queue='images')
+def generate_product_image_variants(product_id, force=False):
+    """Build thumb/card/detail variants for a product's uploaded image."""
+    from .images import generate_variants
+    from .models import Product
+
+    product = Product.objects.filter(pk=product_id).first()
+    if product is not None:
+        generate_variants(product, force=force)
+
+
+@task(queue='notifications')
+def notify_wishlisters(product_id, kind, data):
+    """Tell shoppers who wishlisted a product that it got cheaper or came back in stock."""
+    from .notifications import fan_out
+
+    fan_out(product_id, kind, data)
+
+
+@task(queue='carts')
+def flush_cart(user_id):
+    """Write a user's cached cart to the database (see api/cart_store.py)."""
+    from .cart_store import flush
+
+    if not flush(user_id):
+        # Busy with a change or a checkout; come back after it
+        flush_cart.enqueue_in(settings.CART_WRITE_BEHIND_DELAY, user_id)
+
+
+@task
+def refresh_sales_rollups():
+    """Bring the sales rollups up to date, then queue the next run (see api/rollups.py)."""
+    from .rollups import refresh_rollups
+
+    refresh_rollups()
+    # Only after a success: a failed run is retried by the queue instead
+    refresh_sales_rollups.enqueue_in(settings.SALES_ROLLUP_INTERVAL)
+
+
+def schedule_sales_rollups():
+    """Queue refresh_sales_rollups unless a run is already queued or running. Returns whether it queued one."""
+    from .models import Task
+
+    if Task.objects.filter(name=refresh_sales_rollups.name, status__in=['queued', 'running']).exists():
+        return False
+    refresh_sales_rollups.enqueue()
+    return True
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import CartItem, Category, Product, SubCategory
+
+
+class CatalogTestCase(TestCase):
+    """A shopper and a small catalog: Milk (in Dairy > Fresh) and Bread (Dairy, no subcategory)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', password='unused')
+        self.category = Category.objects.create(name='Dairy')
+        self.subcategory = SubCategory.objects.create(category=self.category, name='Fresh')
+        self.milk = Product.objects.create(
+            name='Milk', category=self.category, subcategory=self.subcategory, price='10.00', stock=20
+        )
+        self.bread = Product.objects.create(name='Bread', category=self.category, price='4.00', stock=20)
+
+    def cart_lines(self):
+        return dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity'))
@@ -0,0 +1,96 @@
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import include, path
+from rest_framework.decorators import permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .. import async_views
+from ..async_views import async_api_view
+from ..models import Category, Order, OrderItem, Product, SubCategory
+
+
+@async_api_view(['GET'])
+@permission_classes([IsAdminUser])
+async def staff_only(request):
+    return Response({'ok': True})
+
+
+# The async views next to the sync ones, whatever ASYNC_VIEWS says
+urlpatterns = [
+    path('', include('backend.urls')),
+    path('async/categories/', async_views.get_categories),
+    path('async/catalog/<slug:category_slug>/<slug:subcategory_slug>/products/', async_views.get_products_by_subcategory_slug),
+    path('async/products/', async_views.get_products),
+    path('async/product/<int:product_id>/', async_views.get_product_detail),
+    path('async/auth/login/', async_views.login_user),
+    path('async/orders/', async_views.get_orders),
+    path('async/staff-only/', staff_only),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(TransactionTestCase):
+    # TransactionTestCase: login hashes passwords on its own thread pool,
+    # whose connections can't see a test transaction's rows
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='s3cret-pass')
+        category = Category.objects.create(name='Dairy')
+        subcategory = SubCategory.objects.create(category=category, name='Fresh')
+        self.milk = Product.objects.create(name='Milk', category=category, subcategory=subcategory, price='10.00', stock=20)
+        order = Order.objects.create(user=self.user, total_price='20.00')
+        OrderItem.objects.create(order=order, product=self.milk, quantity=2, price='10.00')
+        self.client = AsyncClient()
+
+    async def login(self):
+        response = await self.client.post(
+            '/async/auth/login/', {'username': 'shopper', 'password': 's3cret-pass'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return {'Authorization': f"Bearer {response.json()['access']}"}
+
+    async def assertSameAsSync(self, async_path, sync_path, headers=None):
+        async_response = await self.client.get(async_path, headers=headers)
+        sync_response = await self.client.get(sync_path, headers=headers)
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), sync_response.json())
+        # ETags cover the path, so they only match the sync view's when mounted at the same URL
+        self.assertIn('ETag', async_response)
+        return async_response
+
+    async def test_catalog_matches_the_sync_views(self):
+        await self.assertSameAsSync('/async/categories/', '/api/categories/')
+        await self.assertSameAsSync('/async/products/', '/api/products/')
+        await self.assertSameAsSync(f'/async/product/{self.milk.id}/', f'/api/product/{self.milk.id}/')
+        response = await self.assertSameAsSync('/async/catalog/dairy/fresh/products/', '/api/catalog/dairy/fresh/products/')
+        again = await self.client.get('/async/catalog/dairy/fresh/products/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual((await self.client.get('/async/product/999999/')).status_code, 404)
+
+    async def test_jwt_authenticated_orders(self):
+        auth = await self.login()
+        response = await self.assertSameAsSync('/async/orders/', '/api/orders/', headers=auth)
+        self.assertEqual(len(response.json()), 1)
+        page = await self.assertSameAsSync('/async/orders/?page_size=1', '/api/orders/?page_size=1', headers=auth)
+        self.assertEqual(page.json()['count'], 1)
+
+    async def test_unauthenticated_and_bad_tokens_get_401(self):
+        for headers in ({}, {'Authorization': 'Bearer not-a-token'}):
+            response = await self.client.get('/async/orders/', headers=headers)
+            self.assertEqual(response.status_code, 401)
+            self.assertIn('Bearer', response['WWW-Authenticate'])
+            self.assertEqual(response.json(), (await self.client.get('/api/orders/', headers=headers)).json())
+
+    async def test_forbidden_and_wrong_method(self):
+        auth = await self.login()
+        self.assertEqual((await self.client.get('/async/staff-only/', headers=auth)).status_code, 403)
+        response = await self.client.post('/async/categories/')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET')
+
+    async def test_bad_login(self):
+        response = await self.client.post(
+            '/async/auth/login/', {'username': 'shopper', 'password': 'wrong'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
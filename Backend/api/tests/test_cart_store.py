@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from .. import cart_store
+from ..cart_store import CartBusy
+from ..models import CartItem, Order, Product, Task
+from .base import CatalogTestCase
+
+
+class CartStoreTests(CatalogTestCase):
+    def test_add_and_remove_without_shared_cache_write_cartitem(self):
+        cart_store.add(self.user, {self.milk.id: 2})
+        cart_store.add(self.user, {self.milk.id: 1, self.bread.id: 1})
+        self.assertEqual(self.cart_lines(), {self.milk.id: 3, self.bread.id: 1})
+
+        self.assertIsNotNone(cart_store.remove(self.user, self.milk.id))
+        self.assertIsNone(cart_store.remove(self.user, self.milk.id))
+        self.assertEqual(self.cart_lines(), {self.bread.id: 1})
+
+    def test_without_shared_cache_cartitem_is_the_only_copy(self):
+        # Another worker placing an order clears CartItem; nothing stale comes back
+        cart_store.add(self.user, {self.milk.id: 2})
+        CartItem.objects.filter(cart__user=self.user).delete()
+        cart_store.add(self.user, {self.bread.id: 1})
+        self.assertEqual(self.cart_lines(), {self.bread.id: 1})
+        self.assertEqual(cart_store.quantities(self.user), {self.bread.id: 1})
+
+    def test_add_rejects_quantities_below_one(self):
+        with self.assertRaises(ValueError):
+            cart_store.add(self.user, {self.milk.id: 0})
+        self.assertEqual(self.cart_lines(), {})
+
+    @override_settings(CART_CACHE=True, CART_WRITE_BEHIND_DELAY=5)
+    def test_write_behind_flushes_every_change_at_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cart_store.add(self.user, {self.milk.id: 2})
+            cart_store.add(self.user, {self.bread.id: 1})
+            cart_store.remove(self.user, self.bread.id)
+        self.assertEqual(self.cart_lines(), {})
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(cart_store.quantities(self.user), {self.milk.id: 2})
+
+        self.assertTrue(cart_store.flush(self.user.pk))
+        self.assertEqual(self.cart_lines(), {self.milk.id: 2})
+        self.assertFalse(cart_store.load(self.user)['dirty'])
+
+    @override_settings(CART_CACHE=True, CART_WRITE_BEHIND_DELAY=5)
+    def test_checkout_flushes_before_reading_cartitem(self):
+        cart_store.add(self.user, {self.milk.id: 2})
+        with cart_store.checkout(self.user):
+            self.assertEqual(self.cart_lines(), {self.milk.id: 2})
+
+    @override_settings(CART_CACHE=True, CART_WRITE_BEHIND_DELAY=5)
+    def test_busy_cart_is_not_changed_unlocked(self):
+        cart_store.add(self.user, {self.milk.id: 1})
+        with mock.patch.object(cart_store, 'LOCK_WAIT', 0), cart_store._locked(self.user.pk):
+            with self.assertRaises(CartBusy):
+                cart_store.add(self.user, {self.bread.id: 1})
+            with self.assertRaises(CartBusy):
+                cart_store.remove(self.user, self.milk.id)
+            self.assertFalse(cart_store.flush(self.user.pk))
+        self.assertEqual(cart_store.quantities(self.user), {self.milk.id: 1})
+
+
+class CartViewTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, product, quantity, **extra):
+        return self.client.post('/api/cart/add/', {'product_id': product.id, 'quantity': quantity}, format='json', **extra)
+
+    @override_settings(CART_CACHE=True, CART_WRITE_BEHIND_DELAY=0)
+    def test_negative_quantity_is_rejected_and_leaves_the_cart_usable(self):
+        self.assertEqual(self.add(self.milk, -5).status_code, 400)
+        self.assertEqual(self.add(self.milk, 'two').status_code, 400)
+        self.assertEqual(self.add(self.milk, 1).status_code, 200)
+        self.assertEqual(self.cart_lines(), {self.milk.id: 1})
+
+    def test_ordered_lines_do_not_come_back(self):
+        self.add(self.milk, 2)
+        self.assertEqual(self.client.post('/api/order/place/').status_code, 200)
+        self.add(self.bread, 1)
+        self.assertEqual(self.cart_lines(), {self.bread.id: 1})
+        self.assertEqual(Order.objects.get(user=self.user).items.get().quantity, 2)
+
+    @override_settings(CART_CACHE=True, CART_WRITE_BEHIND_DELAY=5)
+    def test_busy_cart_answers_409_and_is_not_replayed(self):
+        with mock.patch.object(cart_store, 'LOCK_WAIT', 0), cart_store._locked(self.user.pk):
+            response = self.add(self.milk, 1, HTTP_IDEMPOTENCY_KEY='k')
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.add(self.milk, 1, HTTP_IDEMPOTENCY_KEY='k').status_code, 200)
+        self.assertEqual(cart_store.quantities(self.user), {self.milk.id: 1})
+
+    def test_prices_and_stock_are_current_without_shared_cache(self):
+        self.add(self.milk, 1)
+        Product.objects.filter(pk=self.milk.pk).update(price='12.00', stock=7)  # e.g. from another worker
+        product = self.client.get('/api/cart/').data['items'][0]['product']
+        self.assertEqual((product['price'], product['stock']), ('12.00', 7))
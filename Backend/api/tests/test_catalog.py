@@ -0,0 +1,50 @@
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from ..models import Category, SubCategory
+from .base import CatalogTestCase
+
+
+class CatalogRouteTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        # A second "Fresh" in another category, so names are ambiguous
+        self.bakery = Category.objects.create(name='Bakery')
+        self.bakery_fresh = SubCategory.objects.create(category=self.bakery, name='Fresh')
+        self.bread.subcategory = self.bakery_fresh
+        self.bread.save()
+
+    def product_names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sorted(product['name'] for product in response.data['products'])
+
+    def test_slug_routes(self):
+        subcategories = self.client.get(f'/api/catalog/{self.category.slug}/subcategories/').data
+        self.assertEqual([sub['name'] for sub in subcategories], ['Fresh'])
+        self.assertEqual(self.product_names(f'/api/catalog/dairy/{self.subcategory.slug}/products/'), ['Milk'])
+        self.assertEqual(self.product_names(f'/api/catalog/bakery/{self.bakery_fresh.slug}/products/'), ['Bread'])
+        self.assertEqual(self.client.get('/api/catalog/frozen/subcategories/').status_code, 404)
+
+    def test_legacy_name_routes(self):
+        subcategories = self.client.get('/api/categories/dAIRY/subcategories/').data
+        self.assertEqual([sub['id'] for sub in subcategories], [self.subcategory.id])
+        # Every subcategory with the name, across categories
+        self.assertEqual(self.product_names('/api/products/subcategory/Fresh/'), ['Bread', 'Milk'])
+        self.assertEqual(self.client.get('/api/categories/Frozen/subcategories/').status_code, 404)
+
+    def test_renames_by_other_workers_resolve_without_shared_cache(self):
+        self.client.get('/api/categories/Dairy/subcategories/')
+        # A queryset update sends no signal, as if another process had made it
+        Category.objects.filter(pk=self.category.pk).update(name='Milk Products')
+        self.assertEqual(self.client.get('/api/categories/Milk Products/subcategories/').status_code, 200)
+        self.assertEqual(self.client.get('/api/categories/Dairy/subcategories/').status_code, 404)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_shared_map_is_rebuilt_after_a_change(self):
+        self.assertEqual(self.client.get('/api/categories/Frozen/subcategories/').status_code, 404)
+        frozen = Category.objects.create(name='Frozen')
+        SubCategory.objects.create(category=frozen, name='Ice Cream')
+        self.assertEqual(self.client.get('/api/categories/Frozen/subcategories/').status_code, 200)
+        self.assertEqual(self.client.get('/api/products/subcategory/Ice Cream/').status_code, 200)
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from ..models import Category, Product
+from .base import CatalogTestCase
+
+
+class ConditionalGetTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_if_none_match(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Category.objects.create(name='Bakery')
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/categories/')['Last-Modified']
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_etag_follows_the_rows_and_the_query_string(self):
+        etag = self.client.get('/api/products/')['ETag']
+        self.assertNotEqual(self.client.get('/api/products/?fields=id,name')['ETag'], etag)
+        self.milk.price = '9.00'
+        self.milk.save()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/api/products/')['ETag']
+        Product.objects.get(pk=self.bread.pk).delete()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_varies_with_the_wishlist(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/products/')
+        etag = response['ETag']
+        # Per-user responses get no Last-Modified, which couldn't tell users apart
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post('/api/wishlist/add/', {'product_id': self.milk.id}, format='json')
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', password='unused'))
+        self.assertEqual(other.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_not_modified_skips_the_view(self):
+        etag = self.client.get('/api/products/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
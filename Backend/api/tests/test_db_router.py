@@ -0,0 +1,109 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.db import OperationalError, connections, router
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import db_router
+from ..db_router import PIN_COOKIE, PIN_HEADER, ReplicaPinMiddleware, replica_reads
+from ..models import Product
+
+
+@replica_reads
+def read_alias_view(request):
+    return HttpResponse(router.db_for_read(Product))
+
+
+@mock.patch('api.db_router.replica_aliases', return_value=['replica_0', 'replica_1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        db_router._health.clear()
+
+    def alias_for(self, request=None):
+        return read_alias_view(request or self.factory.get('/')).content.decode()
+
+    def pinned_response(self):
+        def write(request):
+            router.db_for_write(Product)
+            return HttpResponse()
+        return ReplicaPinMiddleware(write)(self.factory.post('/'))
+
+    def test_reads_go_to_a_healthy_replica(self, _aliases):
+        with mock.patch('api.db_router.is_healthy', side_effect=lambda alias: alias == 'replica_1'):
+            self.assertEqual(self.alias_for(), 'replica_1')
+        with mock.patch('api.db_router.is_healthy', return_value=False):
+            self.assertEqual(self.alias_for(), 'default')
+        # Outside @replica_reads everything reads from the primary
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+    def test_writes_pin_the_client_to_the_primary(self, _aliases):
+        response = self.pinned_response()
+        token = response[PIN_HEADER]
+        self.assertEqual(response.cookies[PIN_COOKIE].value, token)
+        with mock.patch('api.db_router.is_healthy', return_value=True):
+            self.assertEqual(self.alias_for(self.factory.get('/', HTTP_X_REPLICA_PIN=token)), 'default')
+            self.factory.cookies[PIN_COOKIE] = token
+            self.assertEqual(self.alias_for(self.factory.get('/')), 'default')
+            self.factory.cookies[PIN_COOKIE] = token + 'x'
+            self.assertIn(self.alias_for(self.factory.get('/')), ['replica_0', 'replica_1'])
+
+    def test_pins_expire(self, _aliases):
+        token = self.pinned_response()[PIN_HEADER]
+        with mock.patch('api.db_router.is_healthy', return_value=True), override_settings(REPLICA_PIN_SECONDS=0):
+            self.assertNotEqual(self.alias_for(self.factory.get('/', HTTP_X_REPLICA_PIN=token)), 'default')
+
+    def test_reads_without_writes_are_not_pinned(self, _aliases):
+        response = ReplicaPinMiddleware(lambda request: HttpResponse())(self.factory.get('/'))
+        self.assertNotIn(PIN_HEADER, response)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_failed_replica_read_is_retried_on_the_primary(self, _aliases):
+        calls = []
+
+        @replica_reads
+        def view(request):
+            alias = router.db_for_read(Product)
+            calls.append(alias)
+            if alias != 'default':
+                raise OperationalError('replica went away')
+            return HttpResponse(alias)
+
+        with mock.patch('api.db_router.is_healthy', side_effect=lambda alias: alias == 'replica_0'), \
+                self.assertLogs('api.db_router', 'WARNING'):
+            self.assertEqual(view(self.factory.get('/')).content, b'default')
+        self.assertEqual(calls, ['replica_0', 'default'])
+        self.assertFalse(db_router._health['replica_0'][0])
+
+
+class ReplicaHealthTests(SimpleTestCase):
+    """Health checks against a second SQLite database standing in for a replica."""
+
+    def setUp(self):
+        db_router._health.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def add_replica(self, name):
+        replica = SQLiteDatabaseWrapper({**connections.settings['default'], 'NAME': name}, alias='replica_test')
+        self.addCleanup(replica.close)
+        patcher = mock.patch.dict('api.db_router.connections', {'replica_test': replica})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return 'replica_test'
+
+    def test_reachable_replica_is_healthy(self):
+        alias = self.add_replica(str(Path(self.tmp.name) / 'replica.sqlite3'))
+        self.assertTrue(db_router.is_healthy(alias))
+
+    @override_settings(REPLICA_HEALTH_CHECK_INTERVAL=60)
+    def test_unreachable_replica_is_skipped_until_rechecked(self):
+        alias = self.add_replica(str(Path(self.tmp.name) / 'missing' / 'replica.sqlite3'))
+        with self.assertLogs('api.db_router', 'WARNING'):
+            self.assertFalse(db_router.is_healthy(alias))
+        with mock.patch('api.db_router._check') as check:
+            self.assertFalse(db_router.is_healthy(alias))
+        check.assert_not_called()
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from ..models import Order, OrderItem, Product, Seller
+from .base import CatalogTestCase
+
+
+class FieldSelectionTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        seller = Seller.objects.create(user=User.objects.create_user('north', password='unused'), store_name='North')
+        Product.objects.filter(pk=self.milk.pk).update(seller=seller)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, status=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status, response.data)
+        return response.data
+
+    def test_fields_and_expand(self):
+        products = self.get('/api/products/?fields=id,name')
+        self.assertEqual(sorted(products, key=lambda p: p['id']), [
+            {'id': self.milk.id, 'name': 'Milk'}, {'id': self.bread.id, 'name': 'Bread'},
+        ])
+        milk = self.get(f'/api/product/{self.milk.id}/?fields=id,price&expand=seller_details')
+        self.assertEqual(set(milk), {'id', 'price', 'seller_details'})
+        self.assertEqual(milk['seller_details']['store_name'], 'North')
+
+    def test_without_fields_nothing_changes(self):
+        milk = self.get(f'/api/product/{self.milk.id}/')
+        self.assertTrue({'id', 'name', 'price', 'seller_details', 'is_wishlisted', 'frequently_bought_together'} <= set(milk))
+
+    def test_view_added_fields_can_be_selected(self):
+        milk = self.get(f'/api/product/{self.milk.id}/?fields=id,frequently_bought_together')
+        self.assertEqual(milk, {'id': self.milk.id, 'frequently_bought_together': []})
+        self.assertNotIn('frequently_bought_together', self.get(f'/api/product/{self.milk.id}/?fields=id'))
+
+    def test_nested_fields(self):
+        order = Order.objects.create(user=self.user, total_price='20.00')
+        OrderItem.objects.create(order=order, product=self.milk, quantity=2, price='10.00')
+        orders = self.get('/api/orders/?fields=id,items.quantity,items.product')
+        self.assertEqual(orders, [{'id': order.id, 'items': [{'product': self.milk.id, 'quantity': 2}]}])
+
+    def test_unknown_fields_are_rejected(self):
+        error = self.get('/api/products/?fields=id,nmae', status=400)
+        self.assertEqual(error['fields'], ["Unknown field 'nmae'"])
+        self.get('/api/products/?fields=id&expand=seller', status=200)
+        self.get('/api/products/?fields=id&expand=sellers', status=400)
+
+        order = Order.objects.create(user=self.user, total_price='20.00')
+        OrderItem.objects.create(order=order, product=self.milk, quantity=2, price='10.00')
+        self.get('/api/orders/?fields=id,items.qty', status=400)
+
+    def test_cart_selection(self):
+        self.client.post('/api/cart/add/', {'product_id': self.milk.id, 'quantity': 2}, format='json')
+        cart = self.get('/api/cart/?fields=total_price,items.quantity,items.product.name')
+        self.assertEqual(cart, {'total_price': 20.0, 'items': [{'quantity': 2, 'product': {'name': 'Milk'}}]})
+        self.get('/api/cart/?fields=totl_price', status=400)
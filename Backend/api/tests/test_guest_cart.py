@@ -0,0 +1,46 @@
+from django.http import HttpResponse
+from django.test import RequestFactory
+from rest_framework.test import APIClient
+
+from ..guest_cart import HEADER, merge_guest_cart
+from ..models import Cart, CartItem, Product
+from .base import CatalogTestCase
+
+
+class GuestCartTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def add(self, product, quantity, **extra):
+        return self.client.post('/api/cart/add/', {'product_id': product.id, 'quantity': quantity}, format='json', **extra)
+
+    def test_cart_travels_in_the_cookie_and_header(self):
+        self.add(self.milk, 2)
+        response = self.add(self.bread, 1)
+        self.assertEqual({(item['product']['id'], item['quantity']) for item in response.data['items']},
+                         {(self.milk.id, 2), (self.bread.id, 1)})
+
+        headers_only = APIClient()
+        items = headers_only.get('/api/cart/', HTTP_X_GUEST_CART=response[HEADER]).data['items']
+        self.assertEqual(len(items), 2)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_tampered_cart_is_empty(self):
+        token = self.add(self.milk, 2)[HEADER]
+        items = APIClient().get('/api/cart/', HTTP_X_GUEST_CART=token[:-2] + 'xx').data['items']
+        self.assertEqual(items, [])
+
+    def test_quantities_below_one_and_over_stock_are_rejected(self):
+        self.assertEqual(self.add(self.milk, -3).status_code, 400)
+        self.assertEqual(self.add(self.milk, 21).status_code, 409)
+
+    def test_merge_at_login_is_capped_at_available_stock(self):
+        token = self.add(self.milk, 15)[HEADER]
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.milk, quantity=3)
+        Product.objects.filter(pk=self.milk.pk).update(stock=10)
+
+        request = RequestFactory().post('/api/login/', HTTP_X_GUEST_CART=token)
+        self.assertEqual(merge_guest_cart(request, self.user, HttpResponse()), 1)
+        self.assertEqual(self.cart_lines(), {self.milk.id: 10})
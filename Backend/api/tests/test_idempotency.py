@@ -0,0 +1,113 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.decorators import api_view
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .. import idempotency
+from ..idempotency import idempotent
+from ..models import IdempotencyKey
+from .base import CatalogTestCase
+
+
+class IdempotencyTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.runs = 0
+        self.answer = (201, None)
+
+        @api_view(['POST'])
+        @idempotent
+        def create_thing(request):
+            self.runs += 1
+            status, retry_after = self.answer
+            response = Response({'run': self.runs, 'echo': request.data}, status=status)
+            if retry_after:
+                response['Retry-After'] = retry_after
+            return response
+
+        self.view = create_thing
+
+    def post(self, data=None, key='key-1', path='/things/'):
+        request = self.factory.post(path, data or {'n': 1}, format='json', **({'HTTP_IDEMPOTENCY_KEY': key} if key else {}))
+        force_authenticate(request, self.user)
+        return self.view(request)
+
+    def in_flight(self, data=None, path='/things/'):
+        """A claimed key whose first request hasn't finished yet."""
+        request = Request(self.factory.post(path, data or {'n': 1}, format='json'), parsers=[JSONParser()])
+        record, _ = idempotency._claim(self.user, 'key-1', idempotency._fingerprint(request))
+        return record
+
+    def test_retries_replay_the_stored_response(self):
+        first = self.post()
+        second = self.post()
+        self.assertEqual(self.runs, 1)
+        self.assertEqual((second.status_code, second.data), (201, first.data))
+        self.assertEqual(second['Idempotency-Key-Replayed'], 'true')
+        self.assertEqual(self.post(key='key-2').data['run'], 2)
+
+    def test_requests_without_a_key_always_run(self):
+        self.post(key=None)
+        self.post(key=None)
+        self.assertEqual(self.runs, 2)
+
+    def test_key_reused_for_a_different_request(self):
+        self.post()
+        self.assertEqual(self.post(data={'n': 2}).status_code, 422)
+        self.assertEqual(self.post(path='/other/').status_code, 422)
+        self.assertEqual(self.runs, 1)
+
+    def test_server_errors_and_retry_after_are_not_stored(self):
+        self.answer = (503, None)
+        self.assertEqual(self.post().status_code, 503)
+        self.answer = (409, '1')
+        self.assertEqual(self.post().status_code, 409)
+        self.answer = (201, None)
+        self.assertEqual(self.post().data['run'], 3)
+        self.assertEqual(self.post().data['run'], 3)
+
+    def test_exceptions_release_the_key(self):
+        @api_view(['POST'])
+        @idempotent
+        def broken(request):
+            raise RuntimeError('boom')
+
+        request = self.factory.post('/things/', {'n': 1}, format='json', HTTP_IDEMPOTENCY_KEY='key-1')
+        force_authenticate(request, self.user)
+        with self.assertRaises(RuntimeError):
+            broken(request)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_duplicate_waits_for_the_first_request(self):
+        record = self.in_flight()
+
+        def first_request_finishes(seconds):
+            IdempotencyKey.objects.filter(pk=record.pk).update(status_code=201, response_body={'run': 'first'})
+
+        with mock.patch('api.idempotency.time.sleep', side_effect=first_request_finishes):
+            response = self.post()
+        self.assertEqual((response.status_code, response.data), (201, {'run': 'first'}))
+        self.assertEqual(self.runs, 0)
+
+    def test_duplicate_runs_if_the_first_request_failed(self):
+        record = self.in_flight()
+        with mock.patch('api.idempotency.time.sleep', side_effect=lambda seconds: record.delete()):
+            self.assertEqual(self.post().data['run'], 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_duplicate_gives_up_after_the_wait_timeout(self):
+        self.in_flight()
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(self.runs, 0)
+
+    def test_expired_keys_are_reclaimed(self):
+        self.post()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.post().data['run'], 2)
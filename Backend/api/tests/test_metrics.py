@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..metrics import BASE_FILE, Registry
+
+DEAD_PID = 4194305  # above Linux's pid_max
+
+
+class MetricsFileTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        override = override_settings(METRICS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.registry = Registry()
+        self.registry.inc('api_requests_total', (('route', 'products'),), 2)
+
+    def write_dead_process(self, suffix, value):
+        path = os.path.join(self.directory, f'{DEAD_PID}-{suffix}.json')
+        with open(path, 'w') as fh:
+            json.dump([['api_requests_total', [['route', 'products']], value]], fh)
+        return path
+
+    def total(self):
+        return self.registry.collect()[('api_requests_total', (('route', 'products'),))]
+
+    def files(self):
+        return sorted(name for name in os.listdir(self.directory) if not name.startswith('.'))
+
+    def test_dead_processes_are_folded_into_the_base_file(self):
+        dead = self.write_dead_process('aaa', 5)
+        self.assertEqual(self.total(), 7)
+        self.assertFalse(os.path.exists(dead))
+        self.assertEqual(self.files(), sorted([BASE_FILE, self.registry.file_name()]))
+        # A recycled pid gets its own file, and nothing is counted twice
+        self.write_dead_process('bbb', 1)
+        self.assertEqual(self.total(), 8)
+        self.assertEqual(self.total(), 8)
+
+    def test_interrupted_fold_does_not_count_twice(self):
+        self.write_dead_process('aaa', 5)
+        with mock.patch('api.metrics.os.remove'):
+            self.assertEqual(self.total(), 7)
+        self.assertEqual(len(self.files()), 3)
+        self.assertEqual(self.total(), 7)
+        self.assertEqual(len(self.files()), 2)
+
+    def test_exiting_process_folds_its_own_file(self):
+        self.registry.flush(self.directory)
+        self.registry.retire()
+        self.registry.retire()
+        self.assertEqual(self.files(), [BASE_FILE])
+        with open(os.path.join(self.directory, BASE_FILE)) as fh:
+            self.assertEqual(json.load(fh)['samples'], [['api_requests_total', [['route', 'products']], 2]])
+
+    def test_forked_children_use_their_own_file(self):
+        name = self.registry.file_name()
+        with mock.patch('api.metrics.os.getpid', return_value=os.getpid() + 1):
+            self.assertNotEqual(self.registry.file_name(), name)
+
+
+class MetricsEndpointTests(TestCase):
+    def get(self, **extra):
+        return self.client.get('/api/metrics/', HTTP_HOST='localhost', **extra)
+
+    def bearer(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    def test_staff_only_without_a_token(self):
+        self.assertEqual(self.get().status_code, 403)
+        shopper = User.objects.create_user('shopper', password='unused')
+        self.assertEqual(self.get(**self.bearer(shopper)).status_code, 403)
+        staff = User.objects.create_user('ops', password='unused', is_staff=True)
+        response = self.get(**self.bearer(staff))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE api_requests_total counter', response.content.decode())
+        self.client.force_login(staff)
+        self.assertEqual(self.get().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_scrape_token(self):
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer scrape-me').status_code, 200)
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from .. import notifications
+from ..models import Notification, Product, Task, Wishlist, WishlistItem
+from ..notifications import fan_out, product_changes
+from .base import CatalogTestCase
+
+
+class ProductChangeTests(CatalogTestCase):
+    def reloaded(self):
+        return Product.objects.get(pk=self.milk.pk)
+
+    def test_price_drops(self):
+        product = self.reloaded()
+        product.price = '8.00'
+        self.assertEqual(product_changes(product), [('price_drop', {'old_price': 10.0, 'new_price': 8.0})])
+
+        product = self.reloaded()
+        product.discount_percentage = 25
+        self.assertEqual(product_changes(product), [('price_drop', {'old_price': 10.0, 'new_price': 7.5})])
+
+    def test_price_rises_and_unchanged_saves_are_ignored(self):
+        product = self.reloaded()
+        product.price = '12.00'
+        self.assertEqual(product_changes(product), [])
+        self.assertEqual(product_changes(self.reloaded()), [])
+
+    def test_restock_only_from_sold_out(self):
+        Product.objects.filter(pk=self.milk.pk).update(stock=0)
+        product = self.reloaded()
+        product.stock = 5
+        self.assertEqual(product_changes(product), [('back_in_stock', {})])
+        product.save()
+
+        product = self.reloaded()
+        product.stock = 9
+        self.assertEqual(product_changes(product), [])
+
+    def test_saves_queue_the_fan_out(self):
+        product = self.reloaded()
+        product.price = '8.00'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        task = Task.objects.get(name__endswith='notify_wishlisters')
+        self.assertEqual(task.args, [self.milk.pk, 'price_drop', {'old_price': 10.0, 'new_price': 8.0}])
+
+
+class FanOutTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.users = [self.user] + [User.objects.create_user(f'fan{n}', password='unused') for n in range(4)]
+        for user in self.users:
+            WishlistItem.objects.create(wishlist=Wishlist.objects.create(user=user), product=self.milk)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def unread(self):
+        return self.client.get('/api/notifications/unread-count/').data['unread_count']
+
+    @override_settings(NOTIFICATION_BATCH_SIZE=2)
+    def test_notifies_every_wishlister_in_batches(self):
+        with mock.patch('api.notifications._notify', wraps=notifications._notify) as notify:
+            self.assertEqual(fan_out(self.milk.pk, 'back_in_stock', {}), 5)
+        self.assertEqual([len(call.args[0]) for call in notify.call_args_list], [2, 2, 1])
+        self.assertEqual(
+            set(Notification.objects.values_list('user_id', flat=True)), {user.pk for user in self.users}
+        )
+        self.assertEqual(Notification.objects.first().message, 'Milk is back in stock')
+
+    def test_dedupe_and_rate_limit(self):
+        self.assertEqual(fan_out(self.milk.pk, 'back_in_stock', {}), 5)
+        self.assertEqual(fan_out(self.milk.pk, 'back_in_stock', {}), 0)
+        with override_settings(NOTIFICATION_RATE_LIMIT=2):
+            self.assertEqual(fan_out(self.milk.pk, 'price_drop', {'old_price': 10, 'new_price': 8}), 5)
+            WishlistItem.objects.create(wishlist=self.user.wishlist, product=self.bread)
+            self.assertEqual(fan_out(self.bread.pk, 'back_in_stock', {}), 0)
+
+    def test_unread_count_sees_fan_outs_from_the_worker(self):
+        self.assertEqual(self.unread(), 0)
+        fan_out(self.milk.pk, 'back_in_stock', {})
+        self.assertEqual(self.unread(), 1)
+        self.client.post('/api/notifications/read/', {}, format='json')
+        self.assertEqual(self.unread(), 0)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_shared_unread_count_is_dropped_by_the_fan_out(self):
+        self.assertEqual(self.unread(), 0)
+        fan_out(self.milk.pk, 'back_in_stock', {})
+        self.assertEqual(self.unread(), 1)
+        with self.assertNumQueries(0):
+            notifications.unread_count(self.user)
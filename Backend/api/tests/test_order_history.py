@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ..models import Order, OrderItem
+from .base import CatalogTestCase
+
+
+class OrderHistoryTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Five orders a day apart from March 1st; the second and fourth are paid
+        self.start = timezone.make_aware(datetime(2026, 3, 1, 12))
+        self.orders = []
+        for n in range(5):
+            order = Order.objects.create(user=self.user, is_paid=n % 2 == 1, total_price='10.00')
+            Order.objects.filter(pk=order.pk).update(created_at=self.start + timedelta(days=n))
+            OrderItem.objects.create(order=order, product=self.milk, quantity=1, price='10.00')
+            OrderItem.objects.create(order=order, product=self.bread, quantity=n + 1, price='4.00')
+            self.orders.append(order.pk)
+        someone_else = User.objects.create_user('other', password='unused')
+        Order.objects.create(user=someone_else, total_price='1.00')
+
+    def ids(self, query=''):
+        response = self.client.get(f'/api/orders/{query}')
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results'] if 'results' in response.data else response.data
+        return [row['id'] for row in rows]
+
+    def test_newest_first_and_only_the_users_orders(self):
+        self.assertEqual(self.ids(), self.orders[::-1])
+
+    def test_pagination(self):
+        page = self.client.get('/api/orders/?page_size=2').data
+        self.assertEqual((page['count'], len(page['results'])), (5, 2))
+        self.assertIsNone(page['previous'])
+        self.assertEqual(self.ids('?page_size=2&page=3'), [self.orders[0]])
+        self.assertEqual(self.client.get('/api/orders/?page_size=2&page=4').status_code, 404)
+        self.assertEqual(len(self.ids('?page=1')), 5)  # default page size 20
+
+    def test_filters(self):
+        self.assertEqual(self.ids('?from=2026-03-02&to=2026-03-03'), [self.orders[2], self.orders[1]])
+        self.assertEqual(self.ids('?is_paid=true'), [self.orders[3], self.orders[1]])
+        self.assertEqual(self.ids('?is_paid=false&from=2026-03-04'), [self.orders[4]])
+        self.assertEqual(self.client.get('/api/orders/?from=March').status_code, 400)
+
+    def test_summary(self):
+        rows = self.client.get('/api/orders/?summary=1&page_size=1').data['results']
+        self.assertEqual(rows[0]['item_count'], 2)
+        self.assertNotIn('items', rows[0])
+
+    def test_query_count_does_not_grow_with_orders(self):
+        # version, count, page of orders, prefetched items
+        with self.assertNumQueries(4):
+            self.client.get('/api/orders/?page_size=5')
+        with self.assertNumQueries(3):
+            self.client.get('/api/orders/?page_size=5&summary=1')
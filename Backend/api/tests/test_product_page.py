@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.http import Http404
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .. import cart_store
+from ..models import Product, Wishlist, WishlistItem
+from ..product_page import shared_page
+from .base import CatalogTestCase
+
+
+class SharedPageTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cheese = Product.objects.create(
+            name='Cheese', category=self.category, subcategory=self.subcategory, price='6.00', stock=5
+        )
+
+    def test_hit_costs_one_lookup(self):
+        page = shared_page(self.milk.pk)
+        self.assertEqual(page['product']['name'], 'Milk')
+        self.assertEqual(page['subcategory']['name'], 'Fresh')
+        self.assertEqual([row['id'] for row in page['related']], [self.cheese.pk])
+        with self.assertNumQueries(1):
+            self.assertEqual(shared_page(self.milk.pk), page)
+
+    def test_saving_the_product_changes_the_key(self):
+        shared_page(self.milk.pk)
+        self.milk.stock = 7
+        self.milk.save()
+        self.assertEqual(shared_page(self.milk.pk)['product']['stock'], 7)
+
+    def test_updates_that_bump_updated_at_show_at_once(self):
+        shared_page(self.milk.pk)
+        # A queryset update (e.g. a checkout's stock decrement) must set updated_at itself
+        Product.objects.filter(pk=self.milk.pk).update(price='12.00')
+        self.assertEqual(shared_page(self.milk.pk)['product']['price'], '10.00')
+
+        Product.objects.filter(pk=self.milk.pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(shared_page(self.milk.pk)['product']['price'], '12.00')
+
+    def test_sibling_changes_wait_for_the_timeout(self):
+        shared_page(self.milk.pk)
+        self.cheese.name = 'Brie'
+        self.cheese.save()
+        self.assertEqual(shared_page(self.milk.pk)['related'][0]['name'], 'Cheese')
+
+    def test_missing_product(self):
+        with self.assertRaises(Http404):
+            shared_page(0)
+        self.milk.delete()
+        with self.assertRaises(Http404):
+            shared_page(self.milk.pk)
+
+
+class ProductPageViewTests(CatalogTestCase):
+    def test_user_parts_are_added_per_request(self):
+        wishlist = Wishlist.objects.create(user=self.user)
+        WishlistItem.objects.create(wishlist=wishlist, product=self.milk)
+        cart_store.add(self.user, {self.milk.pk: 3})
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        page = client.get(f'/api/product/{self.milk.pk}/page/').json()
+        self.assertTrue(page['is_wishlisted'])
+        self.assertTrue(page['product']['is_wishlisted'])
+        self.assertEqual(page['cart_quantity'], 3)
+
+        page = APIClient().get(f'/api/product/{self.milk.pk}/page/').json()
+        self.assertFalse(page['is_wishlisted'])
+        self.assertEqual(page['cart_quantity'], 0)
+
+    def test_missing_product_is_404(self):
+        self.assertEqual(APIClient().get('/api/product/0/page/').status_code, 404)
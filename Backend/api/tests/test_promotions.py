@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .. import cart_store
+from ..models import OrderItem, Promotion
+from ..promotions import find_coupon, price_lines
+from .base import CatalogTestCase
+
+
+class PromotionPricingTests(CatalogTestCase):
+    def line(self, product, quantity, unit_price=10.0):
+        return {
+            'product_id': product.id, 'subcategory_id': product.subcategory_id, 'category_id': product.category_id,
+            'seller_id': product.seller_id, 'unit_price': unit_price, 'quantity': quantity,
+        }
+
+    def test_best_automatic_promotion_wins(self):
+        Promotion.objects.create(name='10% dairy', kind='percent', value=10, category=self.category)
+        Promotion.objects.create(name='3 off milk', kind='amount', value=3, product=self.milk)
+        [priced] = price_lines([self.line(self.milk, 2)])
+        self.assertEqual(priced['discount'], 6.0)
+        self.assertEqual([p['name'] for p in priced['promotions']], ['3 off milk'])
+
+    def test_buy_x_get_y(self):
+        Promotion.objects.create(name='2+1', kind='buy_x_get_y', buy_quantity=2, get_quantity=1, product=self.milk)
+        self.assertEqual(price_lines([self.line(self.milk, 7)])[0]['discount'], 20.0)
+
+    def test_percent_coupon_applies_to_what_is_left(self):
+        Promotion.objects.create(name='5 off', kind='amount', value=5, product=self.milk)
+        Promotion.objects.create(name='Half', kind='percent', value=50, code='half')
+        coupon = find_coupon(' HALF ')
+        milk, bread = price_lines([self.line(self.milk, 1), self.line(self.bread, 1, 4.0)], coupon)
+        self.assertEqual(milk['discount'], 7.5)
+        self.assertEqual(bread['discount'], 2.0)
+
+    def test_discount_never_exceeds_the_line(self):
+        Promotion.objects.create(name='Huge', kind='amount', value=50, product=self.milk)
+        self.assertEqual(price_lines([self.line(self.milk, 2)])[0]['discount'], 20.0)
+
+    def test_invalid_and_expired_rules_are_skipped(self):
+        Promotion.objects.create(name='Broken', kind='buy_x_get_y', buy_quantity=0, get_quantity=0)
+        Promotion.objects.create(name='Over', kind='percent', value=50, ends_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(price_lines([self.line(self.milk, 3)]), [{'discount': 0, 'promotions': []}])
+
+    def test_index_follows_the_database(self):
+        self.assertEqual(price_lines([self.line(self.milk, 1)])[0]['discount'], 0)
+        promotion = Promotion.objects.create(name='1 off', kind='amount', value=1, product=self.milk)
+        self.assertEqual(price_lines([self.line(self.milk, 1)])[0]['discount'], 1.0)
+        promotion.delete()
+        self.assertEqual(price_lines([self.line(self.milk, 1)])[0]['discount'], 0)
+
+    def test_place_order_records_discounts(self):
+        Promotion.objects.create(name='1 off', kind='amount', value=1, product=self.milk)
+        Promotion.objects.create(name='Tenner', kind='percent', value=10, code='TEN')
+        cart_store.add(self.user, {self.milk.id: 2})
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.post('/api/order/place/', {'coupon': 'ten'}, format='json').status_code, 200)
+        item = OrderItem.objects.get()
+        self.assertEqual(float(item.discount), 3.8)
+        self.assertEqual([p['name'] for p in item.promotions], ['1 off', 'Tenner'])
+        self.assertEqual(float(item.order.total_price), 16.2)
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from ..models import CoPurchaseCount, Order, OrderItem, Product, ProductRecommendation
+from ..recommendations import update_recommendations
+from .base import CatalogTestCase
+
+
+@override_settings(RECOMMENDATION_ORDER_LAG=timedelta(0), RECOMMENDATION_MIN_COUNT=2)
+class CoPurchaseTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.eggs = Product.objects.create(name='Eggs', category=self.category, price='6.00', stock=20)
+        self.butter = Product.objects.create(name='Butter', category=self.category, price='5.00', stock=20)
+
+    def order(self, *products):
+        order = Order.objects.create(user=self.user)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+        return order
+
+    def recommended(self, product):
+        return list(
+            ProductRecommendation.objects.filter(product=product).order_by('rank').values_list('recommended__name', 'score')
+        )
+
+    def place_orders(self):
+        for _ in range(2):
+            self.order(self.milk, self.bread)
+            self.order(self.milk, self.eggs)
+            self.order(self.eggs)
+        self.order(self.milk, self.butter)  # bought together once: under RECOMMENDATION_MIN_COUNT
+
+    def test_scores_are_cosine_similarity(self):
+        self.place_orders()
+        update_recommendations()
+        # milk 5 orders, bread 2, eggs 4: 2/sqrt(5*2) beats 2/sqrt(5*4)
+        self.assertEqual(self.recommended(self.milk), [('Bread', 0.632456), ('Eggs', 0.447214)])
+        self.assertEqual(self.recommended(self.bread), [('Milk', 0.632456)])
+        self.assertEqual(self.recommended(self.butter), [])
+
+    def test_only_new_orders_are_read(self):
+        self.place_orders()
+        position, _ = update_recommendations()
+        self.assertEqual(position, Order.objects.latest('id').id)
+        self.assertEqual(update_recommendations(), (position, 0))
+
+        self.order(self.milk, self.butter)
+        position, rescored = update_recommendations(batch_orders=1)
+        self.assertEqual(rescored, 4)  # milk and butter, and bread and eggs, whose scores against milk moved
+        self.assertEqual(self.recommended(self.butter), [('Milk', 0.57735)])  # 2 / sqrt(2 * 6)
+        counts = dict(CoPurchaseCount.objects.filter(product=self.milk).values_list('other__name', 'count'))
+        self.assertEqual(counts, {'Milk': 6, 'Bread': 2, 'Eggs': 2, 'Butter': 2})
+
+        incremental = {p.name: self.recommended(p) for p in Product.objects.all()}
+        update_recommendations(full=True)
+        self.assertEqual({p.name: self.recommended(p) for p in Product.objects.all()}, incremental)
+
+    def test_recent_orders_wait_for_the_lag(self):
+        self.place_orders()
+        with override_settings(RECOMMENDATION_ORDER_LAG=timedelta(hours=1)):
+            self.assertEqual(update_recommendations(), (0, 0))
+        self.assertFalse(ProductRecommendation.objects.exists())
+
+    @override_settings(RECOMMENDATION_MAX_ORDER_ITEMS=2)
+    def test_large_orders_are_capped(self):
+        self.order(self.milk, self.bread, self.eggs, self.butter)
+        update_recommendations()
+        self.assertEqual(CoPurchaseCount.objects.count(), 4)  # two products: two diagonals, one pair each way
+
+    def test_product_detail_shows_them(self):
+        self.place_orders()
+        update_recommendations()
+        data = APIClient().get(f'/api/product/{self.milk.id}/').data
+        self.assertEqual([row['id'] for row in data['frequently_bought_together']], [self.bread.id, self.eggs.id])
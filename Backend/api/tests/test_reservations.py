@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+from ..models import Product, StockReservation
+from ..reservations import InsufficientStock, available_stock, commit_reservations, reserve_cart
+from .base import CatalogTestCase
+
+
+def line(product, quantity):
+    return SimpleNamespace(product_id=product.id, quantity=quantity)
+
+
+class ReservationTests(CatalogTestCase):
+    def test_holds_reduce_what_others_can_buy(self):
+        reserve_cart(self.user, [line(self.milk, 15)])
+        self.assertEqual(available_stock(self.milk), 5)
+        self.assertEqual(available_stock(self.milk, exclude_user=self.user), 20)
+
+    def test_failed_reservation_keeps_earlier_holds(self):
+        reserve_cart(self.user, [line(self.milk, 2)])
+        before = list(StockReservation.objects.values_list('product_id', 'quantity', 'expires_at'))
+
+        with self.assertRaises(InsufficientStock):
+            reserve_cart(self.user, [line(self.milk, 5), line(self.bread, 50)])
+        self.assertEqual(list(StockReservation.objects.values_list('product_id', 'quantity', 'expires_at')), before)
+
+    def test_commit_turns_holds_into_stock_decrements(self):
+        reserve_cart(self.user, [line(self.milk, 3)])
+        commit_reservations(self.user, [line(self.milk, 3)])
+        self.assertEqual(Product.objects.get(pk=self.milk.pk).stock, 17)
+        self.assertFalse(StockReservation.objects.exists())
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+
+from ..models import Order, OrderItem, Product, SalesRollup, Seller, Task
+from ..rollups import refresh_rollups, sales_report
+from ..tasks import refresh_sales_rollups, schedule_sales_rollups
+from .base import CatalogTestCase
+
+
+@override_settings(SALES_ROLLUP_LAG=timedelta(0))
+class SalesRollupTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.now().date()
+        self.sellers = []
+        for name in ('north', 'south'):
+            user = User.objects.create_user(name, password='unused')
+            self.sellers.append(Seller.objects.create(user=user, store_name=name.title()))
+        Product.objects.filter(pk=self.milk.pk).update(seller=self.sellers[0])
+        Product.objects.filter(pk=self.bread.pk).update(seller=self.sellers[1])
+
+    def order(self, days_ago=0, paid=False, milk=1, bread=0, discount='0'):
+        order = Order.objects.create(user=self.user, is_paid=paid)
+        if milk:
+            OrderItem.objects.create(order=order, product=self.milk, quantity=milk, price='10.00', discount=discount)
+        if bread:
+            OrderItem.objects.create(order=order, product=self.bread, quantity=bread, price='4.00')
+        if days_ago:
+            moment = timezone.now() - timedelta(days=days_ago)
+            Order.objects.filter(pk=order.pk).update(created_at=moment, updated_at=moment)
+        return order
+
+    def rollup(self, dimension, key=0, day=None):
+        return SalesRollup.objects.get(dimension=dimension, key=key, day=day or self.today)
+
+    def test_sellers_are_credited_for_their_own_items(self):
+        self.order(milk=2, bread=3, discount='1.50')
+        refresh_rollups()
+        self.assertEqual(self.rollup('seller', self.sellers[0].pk).revenue, Decimal('18.50'))
+        self.assertEqual(self.rollup('seller', self.sellers[1].pk).revenue, Decimal('12.00'))
+        self.assertEqual(self.rollup('total').revenue, Decimal('30.50'))
+        self.assertEqual(self.rollup('product', self.bread.pk).units, 3)
+        self.assertEqual(self.rollup('category', self.category.pk).orders, 1)
+
+        report = sales_report('seller', self.today, self.today, keys=[self.sellers[1].pk])
+        self.assertEqual([(row['name'], row['revenue']) for row in report], [('South', Decimal('12.00'))])
+
+    def test_only_days_with_changed_orders_are_rebuilt(self):
+        old = self.order(days_ago=3)
+        self.order()
+        self.assertEqual(refresh_rollups(), 2)
+        self.assertEqual(refresh_rollups(), 0)
+
+        # Marking the old order paid rebuilds its day only
+        old.refresh_from_db()
+        old.is_paid = True
+        old.save()
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(self.rollup('total', day=self.today - timedelta(days=3)).paid_revenue, Decimal('10.00'))
+
+    def test_orders_inside_the_lag_wait_for_the_next_run(self):
+        refresh_rollups()
+        self.order()
+        with override_settings(SALES_ROLLUP_LAG=timedelta(hours=1)):
+            self.assertEqual(refresh_rollups(), 0)
+        self.assertFalse(SalesRollup.objects.exists())
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(self.rollup('total').orders, 1)
+
+    def test_full_refresh_rebuilds_in_place_and_drops_empty_days(self):
+        self.order(milk=1)
+        gone = self.order(days_ago=2)
+        refresh_rollups()
+        gone.delete()
+        SalesRollup.objects.filter(dimension='total', day=self.today).update(revenue=0)
+
+        self.assertEqual(refresh_rollups(full=True), 1)
+        self.assertEqual(self.rollup('total').revenue, Decimal('10.00'))
+        self.assertFalse(SalesRollup.objects.filter(day=self.today - timedelta(days=2)).exists())
+
+    def test_workers_keep_the_refresh_scheduled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(schedule_sales_rollups())
+        self.assertFalse(schedule_sales_rollups())
+        self.order()
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_sales_rollups()
+        self.assertEqual(self.rollup('total').orders, 1)
+        self.assertEqual(Task.objects.filter(name=refresh_sales_rollups.name, status='queued').count(), 2)
@@ -0,0 +1,135 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from ..models import Notification, Product, Seller
+from ..stock_alerts import scan_low_stock, set_product_threshold, set_seller_threshold
+from .base import CatalogTestCase
+
+
+class StockAlertTestCase(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('grocer', password='unused')
+        self.seller = Seller.objects.create(user=self.owner, store_name='Grocer', low_stock_threshold=5)
+        self.eggs = Product.objects.create(
+            name='Eggs', category=self.category, seller=self.seller, price='3.00', stock=10
+        )
+
+    def set_stock(self, stock):
+        Product.objects.filter(pk=self.eggs.pk).update(stock=stock)
+
+    def alerts(self):
+        return list(Notification.objects.filter(user=self.owner, kind='low_stock').values_list('product_id', 'data'))
+
+
+class ScanTests(StockAlertTestCase):
+    def test_alerts_once_per_crossing(self):
+        self.assertEqual(scan_low_stock(), (0, 0))
+
+        self.set_stock(5)  # at the threshold counts as low
+        self.assertEqual(scan_low_stock(), (1, 0))
+        self.assertEqual(self.alerts(), [(self.eggs.pk, {'stock': 5, 'threshold': 5})])
+
+        # Still low, or lower: no new alert
+        self.set_stock(2)
+        self.assertEqual(scan_low_stock(), (0, 0))
+        self.assertEqual(len(self.alerts()), 1)
+        self.assertTrue(Product.objects.get(pk=self.eggs.pk).low_stock_alerted)
+
+    def test_restock_rearms_the_alert(self):
+        self.set_stock(3)
+        scan_low_stock()
+
+        self.set_stock(6)
+        self.assertEqual(scan_low_stock(), (0, 1))
+        self.assertFalse(Product.objects.get(pk=self.eggs.pk).low_stock_alerted)
+
+        self.set_stock(1)
+        self.assertEqual(scan_low_stock(), (1, 0))
+        self.assertEqual(len(self.alerts()), 2)
+
+    def test_products_without_a_seller_are_skipped(self):
+        Product.objects.filter(pk=self.milk.pk).update(stock=0, low_stock_threshold=5)
+        self.assertEqual(scan_low_stock(), (0, 0))
+        self.assertFalse(Notification.objects.exists())
+
+    def test_command(self):
+        self.set_stock(0)
+        out = StringIO()
+        call_command('scan_low_stock', stdout=out)
+        self.assertEqual(out.getvalue().strip(), "Raised 1 low stock alert(s); 0 product(s) restocked")
+
+
+class ThresholdTests(StockAlertTestCase):
+    def threshold(self, product):
+        return Product.objects.values_list('low_stock_threshold', flat=True).get(pk=product.pk)
+
+    def test_seller_default_skips_overridden_products(self):
+        cheese = Product.objects.create(
+            name='Cheese', category=self.category, seller=self.seller, price='6.00', stock=10, low_stock_override=2
+        )
+        set_seller_threshold(self.seller, 12)
+        self.assertEqual(self.threshold(self.eggs), 12)
+        self.assertEqual(self.threshold(cheese), 2)
+
+        # The new default makes Eggs (10 left) low
+        self.assertEqual(scan_low_stock(), (1, 0))
+        self.assertEqual(self.alerts(), [(self.eggs.pk, {'stock': 10, 'threshold': 12})])
+
+    def test_clearing_an_override_falls_back_to_the_default(self):
+        set_product_threshold(self.eggs, 0)
+        self.assertEqual(self.threshold(self.eggs), 0)
+        set_product_threshold(self.eggs, None)
+        self.assertEqual(self.threshold(self.eggs), 5)
+
+
+class ThresholdViewTests(StockAlertTestCase):
+    url = '/api/seller/products/low-stock/threshold/'
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_rejects_invalid_thresholds(self):
+        for threshold in (-1, 'ten', '2.5', [3]):
+            response = self.client.post(self.url, {'threshold': threshold}, format='json')
+            self.assertEqual(response.status_code, 400, threshold)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Seller.objects.get(pk=self.seller.pk).low_stock_threshold, 5)
+
+    def test_sets_default_and_product_thresholds(self):
+        response = self.client.post(self.url, {'threshold': 8}, format='json')
+        self.assertEqual(response.json(), {'default_threshold': 8})
+
+        response = self.client.post(self.url, {'threshold': 15, 'product_id': self.eggs.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['low_stock_threshold'], 15)
+
+        response = self.client.get('/api/seller/products/low-stock/')
+        self.assertEqual(response.json()['default_threshold'], 8)
+        self.assertEqual([product['id'] for product in response.json()['products']], [self.eggs.pk])
+
+        response = self.client.post(self.url, {'threshold': None, 'product_id': self.eggs.pk}, format='json')
+        self.assertEqual(response.json()['low_stock_threshold'], 8)
+        self.assertIsNone(response.json()['low_stock_override'])
+
+    def test_other_sellers_products_are_not_found(self):
+        response = self.client.post(self.url, {'threshold': 1, 'product_id': self.milk.pk}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_a_seller_profile(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.post(self.url, {'threshold': 1}, format='json').status_code, 404)
+
+    def test_add_product_rejects_invalid_threshold(self):
+        response = self.client.post('/api/seller/add-product/', {
+            'name': 'Butter', 'category_id': self.category.pk, 'price': '5.00', 'stock': 4,
+            'low_stock_threshold': -3,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.filter(name='Butter').exists())
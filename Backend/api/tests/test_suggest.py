@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .. import suggest
+from ..models import Category, Product, SalesRollup
+from .base import CatalogTestCase
+
+
+class SuggestTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        suggest._index = None
+        self.addCleanup(setattr, suggest, '_index', None)
+        self.client = APIClient()
+        self.shake = Product.objects.create(name='Amul Kool Milkshake', category=self.category, price='3.00', stock=5)
+
+    def names(self, query, **params):
+        response = self.client.get('/api/products/suggest/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [entry['name'] for entry in response.data]
+
+    def test_matches_any_word_prefix(self):
+        self.assertEqual(self.names('kool'), ['Amul Kool Milkshake'])
+        self.assertEqual(self.names('KOOL milk'), ['Amul Kool Milkshake'])
+        self.assertEqual(self.names('dai'), ['Dairy'])
+        self.assertEqual(self.names('ool'), [])
+        self.assertEqual(self.names('  '), [])
+
+    def test_ranked_by_units_sold(self):
+        today = timezone.now().date()
+        SalesRollup.objects.create(day=today, dimension='product', key=self.milk.id, units=2)
+        SalesRollup.objects.create(day=today, dimension='product', key=self.shake.id, units=5)
+        self.assertEqual(self.names('mil'), ['Amul Kool Milkshake', 'Milk'])
+        self.assertEqual(self.names('m'), ['Amul Kool Milkshake', 'Milk'])
+        self.assertEqual(self.names('m', limit=1), ['Amul Kool Milkshake'])
+
+    def test_ties_are_alphabetical(self):
+        self.assertEqual(self.names('mil'), ['Amul Kool Milkshake', 'Milk'])
+
+    def test_product_changes_from_any_process_are_picked_up(self):
+        self.assertEqual(self.names('oat'), [])
+        index = suggest._index
+        self.milk.name = 'Oat Milk'
+        self.milk.save()
+        self.assertEqual(self.names('oat'), ['Oat Milk'])
+        self.assertIs(suggest._index, index)  # caught up, not rebuilt
+        self.assertEqual(self.names('mil'), ['Amul Kool Milkshake', 'Oat Milk'])
+
+        Product.objects.create(name='Oatmeal', category=self.category, price='2.00', stock=5)
+        self.assertEqual(self.names('oat'), ['Oat Milk', 'Oatmeal'])
+
+        self.shake.delete()
+        self.assertEqual(self.names('amul'), [])
+
+    def test_catalog_changes_rebuild_the_index(self):
+        self.assertEqual(self.names('froz'), [])
+        Category.objects.create(name='Frozen')
+        self.assertEqual(self.names('froz'), ['Frozen'])
+        self.subcategory.name = 'Farm Fresh'
+        self.subcategory.save()
+        self.assertEqual(self.names('farm'), ['Farm Fresh'])
+
+    def test_version_is_checked_without_rebuilding(self):
+        self.names('milk')
+        index = suggest._index
+        with self.assertNumQueries(2):
+            self.names('milk')
+        self.assertIs(suggest._index, index)
+
+    @override_settings(SUGGEST_REBUILD_INTERVAL=timedelta(0))
+    def test_old_indexes_are_rebuilt(self):
+        self.names('milk')
+        index = suggest._index
+        self.names('milk')
+        self.assertIsNot(suggest._index, index)
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Task
+from ..taskqueue import _claim_next, requeue_stale, run_task, task, work
+
+
+calls = []
+
+
+@task(queue='test')
+def record(value, flag=False):
+    calls.append((value, flag))
+
+
+@task(queue='test', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def enqueue(self, func, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            func.enqueue(*args, **kwargs)
+        return Task.objects.order_by('id').last()
+
+    def test_enqueue_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.enqueue(1, flag=True)
+            self.assertFalse(Task.objects.exists())
+        callbacks[0]()
+        job = Task.objects.get()
+        self.assertEqual((job.name, job.queue, job.args, job.kwargs), (record.name, 'test', [1], {'flag': True}))
+        self.assertEqual(job.status, 'queued')
+
+    def test_enqueue_in_delays_the_task(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.enqueue_in(60, 1)
+        self.assertIsNone(_claim_next('test', 'w1'))
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        self.enqueue(record, 2)
+        self.assertEqual(calls, [(2, False)])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claim_is_exclusive_and_per_queue(self):
+        job = self.enqueue(record, 3)
+        self.assertIsNone(_claim_next('default', 'w1'))
+        claimed = _claim_next('test', 'w1')
+        self.assertEqual((claimed.id, claimed.status, claimed.locked_by), (job.id, 'running', 'w1'))
+        self.assertIsNone(_claim_next('test', 'w2'))
+
+    def test_success(self):
+        self.enqueue(record, 4)
+        run_task(_claim_next('test', 'w1'))
+        job = Task.objects.get()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('done', 1, ''))
+        self.assertEqual(calls, [(4, False)])
+
+    @override_settings(TASK_RETRY_BACKOFF=10)
+    def test_failures_retry_with_backoff_then_give_up(self):
+        self.enqueue(explode)
+        before = timezone.now()
+        with self.assertLogs('api.taskqueue', 'WARNING'):
+            run_task(_claim_next('test', 'w1'))
+        job = Task.objects.get()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+        self.assertIsNone(_claim_next('test', 'w1'))  # not due yet
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('api.taskqueue', 'ERROR'):
+            run_task(_claim_next('test', 'w1'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_requeue_stale(self):
+        job = self.enqueue(record, 5)
+        _claim_next('test', 'dead-worker')
+        self.assertEqual(requeue_stale(timedelta(minutes=15)), 0)
+        Task.objects.update(locked_at=timezone.now() - timedelta(minutes=16))
+        self.assertEqual(requeue_stale(timedelta(minutes=15)), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.locked_at), ('queued', '', None))
+
+    @override_settings(TASK_REQUEUE_INTERVAL=timedelta(0))
+    def test_workers_requeue_stale_tasks_while_running(self):
+        self.enqueue(record, 6)
+        _claim_next('test', 'dead-worker')
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        with mock.patch('api.taskqueue.close_old_connections'), self.assertLogs('api.taskqueue', 'WARNING'):
+            work(queue='test', burst=True)
+        self.assertEqual(calls, [(6, False)])
+        self.assertEqual(Task.objects.get().status, 'done')
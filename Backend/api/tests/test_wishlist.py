@@ -0,0 +1,45 @@
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from ..models import Wishlist, WishlistItem
+from .base import CatalogTestCase
+
+
+class WishlistTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def wishlist(self, **extra):
+        return self.client.get('/api/wishlist/', **extra)
+
+    def test_add_remove_and_flags(self):
+        self.client.post('/api/wishlist/add/', {'product_id': self.milk.id}, format='json')
+        self.assertEqual(self.wishlist().data, {'wishlist': [self.milk.id]})
+        detail = self.client.get(f'/api/product/{self.milk.id}/').data
+        self.assertTrue(detail['is_wishlisted'])
+
+        self.client.delete(f'/api/wishlist/remove/{self.milk.id}/')
+        self.assertEqual(self.wishlist().data, {'wishlist': []})
+
+    def test_etag_changes_with_the_wishlist(self):
+        etag = self.wishlist()['ETag']
+        self.assertEqual(self.wishlist(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.post('/api/wishlist/add/', {'product_id': self.bread.id}, format='json')
+        self.assertEqual(self.wishlist(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_without_shared_cache_other_workers_writes_show_up(self):
+        self.wishlist()
+        # A write in another process only clears that process's local cache
+        wishlist = Wishlist.objects.create(user=self.user)
+        WishlistItem.objects.bulk_create([WishlistItem(wishlist=wishlist, product=self.milk)])
+        self.assertEqual(self.wishlist().data, {'wishlist': [self.milk.id]})
+
+    @override_settings(SHARED_CACHE=True)
+    def test_shared_cache_is_dropped_on_change(self):
+        self.assertEqual(self.wishlist().data, {'wishlist': []})
+        self.client.post('/api/wishlist/add/', {'product_id': self.milk.id}, format='json')
+        self.assertEqual(self.wishlist().data, {'wishlist': [self.milk.id]})
+        WishlistItem.objects.filter(product=self.milk).delete()
+        self.assertEqual(self.wishlist().data, {'wishlist': []})
@@ -1,21 +1,29 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the high-traffic endpoints are served by their async versions
+hot_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     # Product endpoints (for buyers)
-    path('products/', views.get_products, name='products'),
-    path('product/<int:product_id>/', views.get_product_detail, name='product_detail'),   
+    path('products/', hot_views.get_products, name='products'),
+    path('products/suggest/', views.suggest_products, name='suggest_products'),
+    path('product/<int:product_id>/', hot_views.get_product_detail, name='product_detail'),   
+    path('product/<int:product_id>/page/', views.get_product_page, name='product_page'),
     path('products/subcategory/<str:subcategory_name>/', views.get_products_by_subcategory, name='products-by-subcategory'),
     path('products/category/<int:category_id>/grouped/', views.get_products_grouped_by_subcategory, name='products-by-subcategory-grouped'),  
     path('categories/<str:category_name>/subcategories/', views.get_subcategories_by_name, name='get_subcategories_by_name'),
+    path('catalog/<slug:category_slug>/subcategories/', hot_views.get_subcategories_by_slug, name='get_subcategories_by_slug'),
+    path('catalog/<slug:category_slug>/<slug:subcategory_slug>/products/', hot_views.get_products_by_subcategory_slug, name='products-by-subcategory-slug'),
 
     # Categories
-    path('categories/', views.get_categories, name='categories'),
-    path('subcategories/<int:category_id>/', views.get_subcategories, name="get_subcategories"),
+    path('categories/', hot_views.get_categories, name='categories'),
+    path('subcategories/<int:category_id>/', hot_views.get_subcategories, name="get_subcategories"),
     
     # Authentication
     path('auth/register/', views.register_user, name='register'),
-    path('auth/login/', views.login_user, name='login'),
+    path('auth/login/', hot_views.login_user, name='login'),
     path('auth/seller-login/', views.seller_login, name='seller_login'),
 
     # Cart
@@ -24,9 +32,10 @@ urlpatterns = [
     path('cart/remove/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
 
     # Order
+    path('order/checkout/', views.start_checkout, name='start_checkout'),
     path('order/place/', views.place_order, name='place_order'),
-    path('orders/', views.get_orders, name='get_orders'),
-    path('ordersall/', views.get_allorders, name='get_orders'),
+    path('orders/', hot_views.get_orders, name='get_orders'),
+    path('ordersall/', views.get_allorders, name='get_allorders'),
     path('order/<int:order_id>/', views.get_order_details, name='get_order_details'),
     path('admin/orders/<int:order_id>/assign/', views.assign_order_to_agent, name='assign_order'),
     path('admin/agents/', views.get_all_agents, name='get_all_agents'),
@@ -35,18 +44,26 @@ urlpatterns = [
     path('wishlist/add/', views.add_to_wishlist, name='add_to_wishlist'),
     path('wishlist/remove/<int:product_id>/', views.remove_from_wishlist, name='remove_from_wishlist'),
 
+    # Notifications
+    path('notifications/', views.get_notifications, name='get_notifications'),
+    path('notifications/unread-count/', views.get_unread_notification_count, name='get_unread_notification_count'),
+    path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
+
     # Sellers
     path('seller/add-product/', views.add_product_by_seller, name="add_product_by_seller"),
     path('seller/products/', views.seller_products, name='seller_products'),
+    path('seller/products/low-stock/', views.seller_low_stock_products, name='seller_low_stock_products'),
+    path('seller/products/low-stock/threshold/', views.seller_set_low_stock_threshold, name='seller_set_low_stock_threshold'),
     path('seller/orders/', views.seller_orders, name="seller_orders"),
-    path('seller/dashboard/', views.seller_dashboard, name='seller_dashboard'),
+    path('seller/dashboard/', hot_views.seller_dashboard, name='seller_dashboard'),
     path('seller/profile/', views.seller_profile, name='seller_profile'),
+    path('seller/reports/sales/', views.seller_sales_report, name='seller_sales_report'),
 
 
 
     # Delivery agent
     path('auth/delivery-login/', views.delivery_agent_login, name='delivery_agent_login'),
-    path('delivery/orders/', views.get_assigned_orders, name='get_assigned_orders'),
+    path('delivery/orders/', hot_views.get_assigned_orders, name='get_assigned_orders'),
     path('delivery/order/<int:assignment_id>/update/', views.update_order_status, name='update_order_status'),
 
 
@@ -68,4 +85,11 @@ urlpatterns = [
     path('admin/users/<int:user_id>/promote/agent/', views.admin_promote_to_delivery_agent, name='admin_promote_to_delivery_agent'),
     path('admin/products/<int:product_id>/delete/', views.admin_delete_product, name='admin_delete_product'),
     path('admin/users/<int:user_id>/delete/', views.admin_delete_user, name='admin_delete_user'),
+    path('admin/reports/sales/', views.admin_sales_report, name='admin_sales_report'),
+    path('admin/profiles/', views.admin_list_profiles, name='admin_list_profiles'),
+    path('admin/profiles/token/', views.admin_profile_token, name='admin_profile_token'),
+    path('admin/profiles/<int:profile_id>/', views.admin_profile_detail, name='admin_profile_detail'),
+
+    # Monitoring
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
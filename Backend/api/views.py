@@ -2,16 +2,44 @@ from django.contrib.auth.models import User
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated,IsAdminUser
 from rest_framework.response import Response
-from .models import Product, Category, SubCategory, CartItem, Cart, Order, OrderItem,Wishlist,WishlistItem,Seller,DeliveryAssignment,DeliveryAgent,UserAddress
+from .models import Product, Category, SubCategory, Cart, Order, OrderItem,Wishlist,WishlistItem,Seller,DeliveryAssignment,DeliveryAgent,UserAddress,RequestProfile,Notification,SalesRollup
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from .serializers import ProductSerializer, CategorySerializer,DeliveryOrderSerializer, CartSerializer, OrderSerializer,WishlistItemSerializer,SellerSerializer,SubCategorySerializer,DeliveryAgentSerializer,DeliveryAssignmentSerializer,UserAddressSerializer,UserListSerializer
+from .serializers import parse_field_selection, ProductSerializer, CategorySerializer,DeliveryOrderSerializer, OrderSerializer,OrderSummarySerializer,WishlistItemSerializer,SellerSerializer,SubCategorySerializer,DeliveryAgentSerializer,DeliveryAssignmentSerializer,UserAddressSerializer,UserListSerializer,RequestProfileSerializer,RequestProfileSummarySerializer,NotificationSerializer,RecommendedProductSerializer,LowStockProductSerializer
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum
+from datetime import datetime, time, timedelta
+import hmac
+from django.db.models import Count, Sum
+from django.utils.dateparse import parse_date
 from django.utils.timesince import timesince
+from django.db import transaction
+from django.views.decorators.http import condition
+from .pagination import NotificationPagination, OrderHistoryPagination
+from .notifications import invalidate_unread_counts, unread_count
+from .recommendations import recommendations_for
+from .rollups import sales_report
+from .suggest import suggestions
+from .stock_alerts import low_stock_products, set_product_threshold, set_seller_threshold
+from .catalog import category_for_name, subcategories_for_name
+from .conditional import conditional
+from .db_router import replica_reads
+from . import cart_store
+from .cart_store import CartBusy, cart_data
+from .guest_cart import attach_guest_cart, guest_cart_data, load_guest_cart, merge_guest_cart
+from .idempotency import idempotent
+from .product_page import product_page
+from .promotions import find_coupon, price_lines
+from .metrics import registry, render
+from .profiling import make_profile_token
+from .tasks import delete_user
+from .wishlist import invalidate_wishlist, wishlist_ids, wishlist_version
+from .reservations import InsufficientStock, available_stock, commit_reservations, reserve_cart
 
 # ------------------- Product and Category -------------------
 
@@ -37,63 +65,163 @@ def add_product(request):
 
 
 @api_view(['GET'])
+@replica_reads
+@conditional(lambda request: Category.objects.all())
 def get_categories(request):
     categories = Category.objects.all()
     serializer = CategorySerializer(categories, many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
+@replica_reads
+@conditional(lambda request, category_id: SubCategory.objects.filter(category_id=category_id))
 def get_subcategories(request, category_id):
     subcategories = SubCategory.objects.filter(category_id=category_id)
     serializer = SubCategorySerializer(subcategories, many=True)
     return Response(serializer.data)
 
+def _category_id_for_name(category_name):
+    category = category_for_name(category_name)
+    return category['id'] if category else None
+
+
 @api_view(['GET'])
+@replica_reads
+@conditional(lambda request, category_name: SubCategory.objects.filter(category_id=_category_id_for_name(category_name)))
 def get_subcategories_by_name(request, category_name):
-    try:
-        category = Category.objects.get(name__iexact=category_name)
-    except Category.DoesNotExist:
+    # Legacy name route; resolved through the cached name map
+    category_id = _category_id_for_name(category_name)
+    if category_id is None:
         return Response({"error": "Category not found"}, status=404)
 
+    subcategories = SubCategory.objects.filter(category_id=category_id).select_related('category')
+    serializer = SubCategorySerializer(subcategories, many=True)
+    return Response(serializer.data)
+
+@api_view(['GET'])
+@replica_reads
+@conditional(lambda request, category_slug: SubCategory.objects.filter(category__slug=category_slug))
+def get_subcategories_by_slug(request, category_slug):
+    category = get_object_or_404(Category, slug=category_slug)
     subcategories = SubCategory.objects.filter(category=category)
     serializer = SubCategorySerializer(subcategories, many=True)
     return Response(serializer.data)
 
 
 
+def _product_context(request):
+    """Field selection plus the user's wishlisted ids for `is_wishlisted`."""
+    context = parse_field_selection(request)
+    context['wishlisted_ids'] = frozenset(wishlist_ids(request.user))
+    return context
+
+
+def _wishlist_etag(request):
+    return wishlist_version(request.user)
+
+
 @api_view(['GET'])
+@replica_reads
+@conditional(lambda request: Product.objects.all(), vary_on=_wishlist_etag)
 def get_products(request):
-    products = Product.objects.all().order_by('-created_at')
-    serializer = ProductSerializer(products, many=True)
+    context = _product_context(request)
+    products = ProductSerializer.setup_queryset(Product.objects.all(), context).order_by('-created_at')
+    serializer = ProductSerializer(products, many=True, context=context)
     return Response(serializer.data)
 
+def _subcategory_ids_for_name(subcategory_name):
+    return [sub['id'] for sub in subcategories_for_name(subcategory_name)]
+
+
 @api_view(['GET'])
+@replica_reads
+@conditional(lambda request, subcategory_name: Product.objects.filter(subcategory_id__in=_subcategory_ids_for_name(subcategory_name)), vary_on=_wishlist_etag)
 def get_products_by_subcategory(request, subcategory_name):
-    subcategory = get_object_or_404(SubCategory, name=subcategory_name)
-    products = Product.objects.filter(subcategory=subcategory)
-    serializer = ProductSerializer(products, many=True)
+    # Legacy name route. Names repeat across categories ("Fresh"), so this
+    # returns the products of every subcategory with that name.
+    subcategory_ids = _subcategory_ids_for_name(subcategory_name)
+    if not subcategory_ids:
+        return Response({"detail": "No SubCategory matches the given query."}, status=404)
+    context = _product_context(request)
+    products = ProductSerializer.setup_queryset(Product.objects.filter(subcategory_id__in=subcategory_ids), context)
+    serializer = ProductSerializer(products, many=True, context=context)
+    return Response({
+        "subcategory": subcategory_name,
+        "products": serializer.data
+    })
+
+@api_view(['GET'])
+@replica_reads
+@conditional(lambda request, category_slug, subcategory_slug: Product.objects.filter(
+    subcategory__category__slug=category_slug, subcategory__slug=subcategory_slug), vary_on=_wishlist_etag)
+def get_products_by_subcategory_slug(request, category_slug, subcategory_slug):
+    subcategory = get_object_or_404(
+        SubCategory.objects.select_related('category'), category__slug=category_slug, slug=subcategory_slug
+    )
+    context = _product_context(request)
+    products = ProductSerializer.setup_queryset(Product.objects.filter(subcategory=subcategory), context)
+    serializer = ProductSerializer(products, many=True, context=context)
     return Response({
+        "category": subcategory.category.name,
         "subcategory": subcategory.name,
         "products": serializer.data
     })
 
 @api_view(['GET'])
+@replica_reads
+@conditional(lambda request, category_id: Product.objects.filter(subcategory__category_id=category_id), vary_on=_wishlist_etag)
 def get_products_grouped_by_subcategory(request, category_id):
     subcategories = SubCategory.objects.filter(category_id=category_id)
+    context = _product_context(request)
     result = {}
     for sub in subcategories:
-        products = Product.objects.filter(subcategory=sub)
-        serializer = ProductSerializer(products, many=True)
+        products = ProductSerializer.setup_queryset(Product.objects.filter(subcategory=sub), context)
+        serializer = ProductSerializer(products, many=True, context=context)
         result[sub.name] = serializer.data
     return Response(result)
 
 
 
 @api_view(['GET'])
+@replica_reads
+@conditional(lambda request, product_id: Product.objects.filter(id=product_id), vary_on=_wishlist_etag)
 def get_product_detail(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    serializer = ProductSerializer(product)
-    return Response(serializer.data)
+    context = _product_context(request)
+    product = get_object_or_404(ProductSerializer.setup_queryset(Product.objects.all(), context), id=product_id)
+    serializer = ProductSerializer(product, context=context)
+    data = serializer.data
+    # Precomputed by build_recommendations; a single indexed read
+    if context.get('fields') is None or 'frequently_bought_together' in context['fields']:
+        data['frequently_bought_together'] = RecommendedProductSerializer(recommendations_for(product.id), many=True).data
+    return Response(data)
+
+
+@api_view(['GET'])
+@replica_reads
+def get_product_page(request, product_id):
+    """
+    Product page in one request: the product, its category and subcategory,
+    related products, and the user's wishlist flags and cart quantity.
+    """
+    user = request.user
+    if user.is_authenticated:
+        cart_quantities = cart_store.quantities(user)
+    else:
+        cart_quantities = load_guest_cart(request)
+    return Response(product_page(product_id, frozenset(wishlist_ids(user)), cart_quantities))
+
+
+@api_view(['GET'])
+def suggest_products(request):
+    """
+    Search box autocomplete: ?q=<prefix>&limit=<n>. Returns matching
+    categories, subcategories and products, most popular first.
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', settings.SUGGEST_DEFAULT_LIMIT)), 1), settings.SUGGEST_MAX_LIMIT)
+    except ValueError:
+        return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(suggestions(request.query_params.get('q', ''), limit))
 
 
 # ------------------- User Authentication -------------------
@@ -110,13 +238,14 @@ def register_user(request):
 
     user = User.objects.create_user(username=username, email=email, password=password)
     refresh = RefreshToken.for_user(user)
-    print(refresh);
-    return Response({
+    response = Response({
         'user_id': user.id,
         'username': user.username,
         'access': str(refresh.access_token),
         'refresh': str(refresh)
     })
+    merge_guest_cart(request, user, response)
+    return response
 
 
 
@@ -132,56 +261,98 @@ def login_user(request):
         return Response({'error': 'Invalid username or password'}, status=status.HTTP_400_BAD_REQUEST)
 
     refresh = RefreshToken.for_user(user)
-    print(refresh)
 
     # Include is_staff to check admin
-    return Response({
+    response = Response({
         'user_id': user.id,
         'username': user.username,
         'is_staff': user.is_staff,
         'access': str(refresh.access_token),
         'refresh': str(refresh),
     })
+    merge_guest_cart(request, user, response)
+    return response
 # ------------------- Cart Views -------------------
+# Logged-in carts live in the cache and are written behind (see api/cart_store.py);
+# anonymous shoppers get a guest cart kept in a signed cookie (see api/guest_cart.py)
+
+def _cart_busy():
+    # Retry-After also keeps @idempotent from storing this as the final answer
+    response = Response({'error': 'Your cart is being updated; try again'}, status=status.HTTP_409_CONFLICT)
+    response['Retry-After'] = '1'
+    return response
+
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
 def get_cart(request):
+    """Add ?coupon=CODE to price the cart with a coupon."""
     user = request.user
-    try:
-        cart = Cart.objects.get(user=user)
-    except Cart.DoesNotExist:
+    coupon = None
+    if request.query_params.get('coupon'):
+        coupon = find_coupon(request.query_params['coupon'])
+        if coupon is None:
+            return Response({'error': 'Invalid or expired coupon'}, status=status.HTTP_400_BAD_REQUEST)
+    if not user.is_authenticated:
+        return Response(guest_cart_data(load_guest_cart(request), parse_field_selection(request), coupon))
+    entry = cart_store.load(user)
+    if entry['id'] is None:
         return Response({'items': [], 'total_price': 0})
-
-    serializer = CartSerializer(cart)
-    return Response(serializer.data)
+    return Response(cart_data(entry, parse_field_selection(request), coupon))
 
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@idempotent
 def add_to_cart(request):
     user = request.user
-    print(user)
     product_id = request.data.get('product_id')
-    quantity = int(request.data.get('quantity', 1))
+    try:
+        quantity = int(request.data.get('quantity', 1))
+    except (TypeError, ValueError):
+        quantity = 0
+    if quantity < 1:
+        return Response({'error': 'quantity must be a whole number of at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not user.is_authenticated:
+        return _add_to_guest_cart(request, product_id, quantity)
+
+    product = get_object_or_404(Product.objects.only('id', 'stock'), id=product_id)
+    in_cart = cart_store.quantities(user).get(product.id, 0)
+    if in_cart + quantity > available_stock(product, exclude_user=user):
+        return Response({'error': 'Not enough stock available'}, status=status.HTTP_409_CONFLICT)
+    try:
+        entry = cart_store.add(user, {product.id: quantity})
+    except CartBusy:
+        return _cart_busy()
+    return Response(cart_data(entry, parse_field_selection(request)))
 
-    cart, _ = Cart.objects.get_or_create(user=user)
-    product = get_object_or_404(Product, id=product_id)
-    cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-    cart_item.quantity += quantity
-    cart_item.save()
 
-    serializer = CartSerializer(cart)
-    return Response(serializer.data)
+def _add_to_guest_cart(request, product_id, quantity):
+    lines = load_guest_cart(request)
+    product = get_object_or_404(Product.objects.only('id', 'stock'), id=product_id)
+    if lines.get(product.id, 0) + quantity > available_stock(product):
+        return Response({'error': 'Not enough stock available'}, status=status.HTTP_409_CONFLICT)
+    if product.id not in lines and len(lines) >= settings.GUEST_CART_MAX_LINES:
+        return Response({'error': 'Guest carts are limited to %d products; log in to add more'
+                         % settings.GUEST_CART_MAX_LINES}, status=status.HTTP_400_BAD_REQUEST)
+    lines[product.id] = lines.get(product.id, 0) + quantity
+    return attach_guest_cart(Response(guest_cart_data(lines, parse_field_selection(request))), lines)
 
 
 @api_view(['DELETE'])
-@permission_classes([IsAuthenticated])
 def remove_from_cart(request, product_id):
     user = request.user
-    cart = get_object_or_404(Cart, user=user)
-    cart_item = get_object_or_404(CartItem, cart=cart, product_id=product_id)
-    cart_item.delete()
+    if not user.is_authenticated:
+        lines = load_guest_cart(request)
+        if lines.pop(product_id, None) is None:
+            return Response({'detail': 'No CartItem matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+        response = Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
+        return attach_guest_cart(response, lines)
+    try:
+        removed = cart_store.remove(user, product_id)
+    except CartBusy:
+        return _cart_busy()
+    if removed is None:
+        return Response({'detail': 'No CartItem matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
     return Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -189,54 +360,178 @@ def remove_from_cart(request, product_id):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def place_order(request):
+    """Optional body: {"coupon": "CODE"}."""
     user = request.user
+    coupon = None
+    if request.data.get('coupon'):
+        coupon = find_coupon(request.data['coupon'])
+        if coupon is None:
+            return Response({'error': 'Invalid or expired coupon'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        with cart_store.checkout(user):
+            return _place_order(user, coupon)
+    except CartBusy:
+        return _cart_busy()
+
+
+def _place_order(user, coupon):
     cart = get_object_or_404(Cart, user=user)
-    if not cart.items.exists():
+    items = list(cart.items.select_related('product'))
+    if not items:
         return Response({"error": "Cart is empty"}, status=400)
+    priced = price_lines([
+        {'product_id': item.product_id, 'subcategory_id': item.product.subcategory_id,
+         'category_id': item.product.category_id, 'seller_id': item.product.seller_id,
+         'unit_price': item.product.discounted_price(), 'quantity': item.quantity}
+        for item in items
+    ], coupon)
 
-    order = Order.objects.create(user=user)
-    total = 0
+    try:
+        with transaction.atomic():
+            # Turn checkout holds into permanent stock decrements
+            commit_reservations(user, items)
+
+            order = Order.objects.create(user=user)
+            total = 0
+
+            for item, promotion in zip(items, priced):
+                price = item.product.discounted_price()
+                OrderItem.objects.create(
+                    order=order,
+                    product=item.product,
+                    quantity=item.quantity,
+                    price=price,
+                    discount=promotion['discount'],
+                    promotions=promotion['promotions'],
+                )
+                total += price * item.quantity - promotion['discount']
+
+            order.total_price = total
+            order.save()
+
+            cart.items.all().delete()  # Clear cart
+    except InsufficientStock as e:
+        return Response(
+            {"error": str(e), "product_id": e.product.id, "available": e.available},
+            status=status.HTTP_409_CONFLICT
+        )
+    cart_store.discard(user.pk)
 
-    for item in cart.items.all():
-        price = item.product.discounted_price()
-        OrderItem.objects.create(
-            order=order,
-            product=item.product,
-            quantity=item.quantity,
-            price=price
+    serializer = OrderSerializer(order)
+    return Response(serializer.data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_checkout(request):
+    """
+    Reserve stock for every item in the cart until the reservation expires.
+    """
+    user = request.user
+    try:
+        with cart_store.checkout(user):
+            cart = get_object_or_404(Cart, user=user)
+            items = list(cart.items.all())
+    except CartBusy:
+        return _cart_busy()
+    if not items:
+        return Response({"error": "Cart is empty"}, status=400)
+
+    try:
+        reservations = reserve_cart(user, items)
+    except InsufficientStock as e:
+        return Response(
+            {"error": str(e), "product_id": e.product.id, "available": e.available},
+            status=status.HTTP_409_CONFLICT
         )
-        total += price * item.quantity
 
-    order.total_price = total
-    order.save()
+    return Response({
+        "reserved": [{"product_id": r.product_id, "quantity": r.quantity} for r in reservations],
+        "expires_at": reservations[0].expires_at,
+    })
 
-    cart.items.all().delete()  # Clear cart
-    serializer = OrderSerializer(order)
+
+def _parse_day(value):
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
+def _order_history_query(request, orders):
+    """
+    Apply the order history query params. Returns the queryset with the
+    serializer class and context to render it; ValueError for a bad date.
+
+    Query params: from / to (YYYY-MM-DD, inclusive), is_paid (true/false),
+    summary=1 for item counts instead of item bodies, and page / page_size
+    to paginate. Without page or page_size the full list is returned as before.
+    """
+    params = request.query_params
+    date_from = _parse_day(params.get('from'))
+    date_to = _parse_day(params.get('to'))
+
+    # Compare against datetimes, not __date, so the (user, created_at) index is usable
+    if date_from:
+        orders = orders.filter(created_at__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+    if date_to:
+        orders = orders.filter(created_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+    if 'is_paid' in params:
+        orders = orders.filter(is_paid=params['is_paid'].lower() in ('1', 'true', 'yes'))
+    orders = orders.order_by('-created_at')
+
+    if params.get('summary') in ('1', 'true'):
+        orders = orders.annotate(item_count=Count('items'))
+        serializer_class, context = OrderSummarySerializer, {}
+    else:
+        context = parse_field_selection(request)
+        orders = OrderSerializer.setup_queryset(orders, context)
+        serializer_class = OrderSerializer
+    return orders, serializer_class, context
+
+
+def _order_history(request, orders):
+    """Shared body of the order history endpoints; see _order_history_query."""
+    try:
+        orders, serializer_class, context = _order_history_query(request, orders)
+    except ValueError:
+        return Response({"error": "Dates must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if 'page' in request.query_params or 'page_size' in request.query_params:
+        paginator = OrderHistoryPagination()
+        page = paginator.paginate_queryset(orders, request)
+        serializer = serializer_class(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
+
+    serializer = serializer_class(orders, many=True, context=context)
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(lambda request: Order.objects.filter(user=request.user))
 def get_orders(request):
     user = request.user
-    orders = Order.objects.filter(user=user).order_by('-created_at')
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    return _order_history(request, Order.objects.filter(user=user))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(lambda request: Order.objects.all())
 def get_allorders(request):
-    orders = Order.objects.filter().order_by('-created_at')
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    return _order_history(request, Order.objects.all())
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(lambda request, order_id: Order.objects.filter(id=order_id, user=request.user))
 def get_order_details(request, order_id):
     user = request.user
-    order = get_object_or_404(Order, id=order_id, user=user)
-    serializer = OrderSerializer(order)
+    context = parse_field_selection(request)
+    order = get_object_or_404(OrderSerializer.setup_queryset(Order.objects.all(), context), id=order_id, user=user)
+    serializer = OrderSerializer(order, context=context)
     return Response(serializer.data)
 
 
@@ -247,18 +542,15 @@ def get_order_details(request, order_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=lambda request: wishlist_version(request.user))
 def get_wishlist(request):
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    items = WishlistItem.objects.filter(wishlist=wishlist)
-    
-    # Return only product IDs
-    wishlist_ids = [item.product.id for item in items]
-
-    return Response({"wishlist": wishlist_ids})
+    # Only product ids, straight from the per-user cache
+    return Response({"wishlist": wishlist_ids(request.user)})
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent
 def add_to_wishlist(request):
     user = request.user
     product_id = request.data.get("product_id")
@@ -266,17 +558,16 @@ def add_to_wishlist(request):
     if not product_id:
         return Response({"error": "Product ID is required"}, status=400)
 
-    try:
-        product = Product.objects.get(id=product_id)
-    except Product.DoesNotExist:
+    if not Product.objects.filter(id=product_id).exists():
         return Response({"error": "Product not found"}, status=404)
 
-    wishlist, created = Wishlist.objects.get_or_create(user=user)
-
-    if WishlistItem.objects.filter(wishlist=wishlist, product=product).exists():
+    if int(product_id) in wishlist_ids(user):
         return Response({"message": "Product already in wishlist"})
 
-    WishlistItem.objects.create(wishlist=wishlist, product=product)
+    wishlist, created = Wishlist.objects.get_or_create(user=user)
+    # unique_wishlist_product turns a concurrent duplicate into a no-op
+    WishlistItem.objects.bulk_create([WishlistItem(wishlist=wishlist, product_id=product_id)], ignore_conflicts=True)
+    invalidate_wishlist(user.pk)
 
     return Response({"message": "Added", "product_id": product_id})
 
@@ -285,14 +576,11 @@ def add_to_wishlist(request):
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def remove_from_wishlist(request, product_id):
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-
-    try:
-        item = WishlistItem.objects.get(wishlist=wishlist, product_id=product_id)
-        item.delete()
-        return Response({"message": "Removed", "product_id": product_id})
-    except WishlistItem.DoesNotExist:
+    # post_delete (signals.py) drops the cached ids
+    deleted, _ = WishlistItem.objects.filter(wishlist__user=request.user, product_id=product_id).delete()
+    if not deleted:
         return Response({"error": "Item not found"}, status=404)
+    return Response({"message": "Removed", "product_id": product_id})
 
 
 
@@ -336,6 +624,10 @@ def add_product_by_seller(request):
 
     seller = user.seller_profile
     data = request.data
+    try:
+        low_stock_override = _parse_threshold(data.get("low_stock_threshold"))
+    except (TypeError, ValueError):
+        return Response({"error": "low_stock_threshold must be a whole number"}, status=status.HTTP_400_BAD_REQUEST)
 
     product = Product.objects.create(
         seller=seller,
@@ -346,7 +638,8 @@ def add_product_by_seller(request):
         stock=data.get("stock"),
         discount_percentage=data.get("discount_percentage", 0),
         description=data.get("description", ""),
-        image=data.get("image")
+        image=data.get("image"),
+        low_stock_override=low_stock_override,
     )
     return Response(ProductSerializer(product).data, status=201)
 
@@ -355,6 +648,7 @@ def add_product_by_seller(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def seller_products(request):
     try:
         # Check if seller exists
@@ -366,8 +660,9 @@ def seller_products(request):
             )
 
         # Get seller's products
-        products = Product.objects.filter(seller=seller)
-        serializer = ProductSerializer(products, many=True)
+        context = parse_field_selection(request)
+        products = ProductSerializer.setup_queryset(Product.objects.filter(seller=seller), context)
+        serializer = ProductSerializer(products, many=True, context=context)
         
 
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -378,6 +673,7 @@ def seller_products(request):
 # ✅ Get all orders received by the seller
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def seller_orders(request):
     try:
         # Get the logged-in user
@@ -394,9 +690,7 @@ def seller_orders(request):
         # seller = get_object_or_404(Seller, user=user)
 
         # More efficient query with select_related and prefetch_related
-        orders = Order.objects.filter(
-            items__product__seller=seller
-        ).distinct().select_related('user').prefetch_related('items', 'items__product')
+        orders = _seller_orders_query(seller)
 
         # Check if orders exist
         if not orders.exists():
@@ -409,6 +703,13 @@ def seller_orders(request):
         return Response({"error": str(e)}, status=500)
 
 
+def _seller_orders_query(seller):
+    # Also EXPLAINed by `manage.py audit_query_plans`
+    return Order.objects.filter(
+        items__product__seller=seller
+    ).distinct().select_related('user').prefetch_related('items', 'items__product')
+
+
 # seller login
 @api_view(['POST'])
 def seller_login(request):
@@ -446,51 +747,58 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import Product, Order, Seller
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def seller_dashboard(request):
-    user = request.user
+def _seller_dashboard_orders(seller):
+    """The dashboard's order querysets. `manage.py audit_query_plans` EXPLAINs these same ones."""
+    return {
+        'pending_orders': Order.objects.filter(
+            items__product__seller=seller,
+            is_paid=False  # or status='pending' if you have that field
+        ).distinct(),
 
-    # Get seller instance
-    try:
-        seller = Seller.objects.get(user=user)
-    except Seller.DoesNotExist:
-        return Response({"error": "Seller profile not found"}, status=404)
+        'completed_orders': Order.objects.filter(
+            items__product__seller=seller,
+            is_paid=True,  # or status='completed'
+            created_at__gte=timezone.now() - timedelta(days=30)
+        ).distinct(),
 
-    # --- PRODUCT STATS ---
-    total_products = Product.objects.filter(seller=seller).count()
+        'recent_orders': Order.objects.filter(items__product__seller=seller).distinct().order_by('-created_at')[:5],
+    }
 
-    # --- ORDER STATS ---
-    pending_orders = Order.objects.filter(
-        items__product__seller=seller,
-        is_paid=False  # or status='pending' if you have that field
-    ).distinct().count()
 
-    completed_orders = Order.objects.filter(
-        items__product__seller=seller,
-        is_paid=True,  # or status='completed'
-        created_at__gte=timezone.now() - timedelta(days=30)
-    ).distinct().count()
+def _seller_dashboard_queries(seller):
+    """The dashboard's independent queries, as callables so the async view can run them concurrently."""
+    orders = _seller_dashboard_orders(seller)
+    return {
+        # --- PRODUCT STATS ---
+        'total_products': Product.objects.filter(seller=seller).count,
 
-    total_revenue = (
-        Order.objects.filter(
-            items__product__seller=seller,
-            is_paid=True  # or status='completed'
-        ).aggregate(total=Sum('total_price'))['total'] or 0
-    )
+        # --- ORDER STATS ---
+        'pending_orders': orders['pending_orders'].count,
+        'completed_orders': orders['completed_orders'].count,
+
+        # Only this seller's items, from the daily rollups (see api/rollups.py)
+        'total_revenue': lambda: (
+            SalesRollup.objects.filter(dimension='seller', key=seller.id).aggregate(total=Sum('paid_revenue'))['total'] or 0
+        ),
+
+        'recent_orders': lambda: list(orders['recent_orders']),
+    }
+
+
+def _seller_dashboard_data(user, seller, results):
+    total_revenue = results['total_revenue']
 
     # --- STATS LIST ---
     stats = [
-        {'key': 'total_products', 'value': str(total_products), 'change': '+12%', 'color': 'green', 'icon': '📦', 'description': 'Active in store'},
-        {'key': 'pending_orders', 'value': str(pending_orders), 'change': '+5%', 'color': 'blue', 'icon': '⏳', 'description': 'Need attention'},
-        {'key': 'completed_orders', 'value': str(completed_orders), 'change': '+23%', 'color': 'purple', 'icon': '✅', 'description': 'This month'},
+        {'key': 'total_products', 'value': str(results['total_products']), 'change': '+12%', 'color': 'green', 'icon': '📦', 'description': 'Active in store'},
+        {'key': 'pending_orders', 'value': str(results['pending_orders']), 'change': '+5%', 'color': 'blue', 'icon': '⏳', 'description': 'Need attention'},
+        {'key': 'completed_orders', 'value': str(results['completed_orders']), 'change': '+23%', 'color': 'purple', 'icon': '✅', 'description': 'This month'},
         {'key': 'total_revenue', 'value': f'${total_revenue:,.2f}', 'change': '+18%', 'color': 'orange', 'icon': '💰', 'description': 'All time sales'}
     ]
 
     # --- RECENT ACTIVITIES ---
     recent_activities = []
-    recent_orders = Order.objects.filter(items__product__seller=seller).distinct().order_by('-created_at')[:5]
-    for order in recent_orders:
+    for order in results['recent_orders']:
         recent_activities.append({
             'id': order.id,
             'activity': f'New order #{order.id} received',
@@ -499,14 +807,30 @@ def seller_dashboard(request):
             'status': 'success'
         })
 
-    return Response({
+    return {
         'stats': stats,
         'recent_activities': recent_activities,
         'user': {
             'username': user.username,
             'store_name': seller.store_name if hasattr(seller, 'store_name') else '',
         }
-    })
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def seller_dashboard(request):
+    user = request.user
+
+    # Get seller instance
+    try:
+        seller = Seller.objects.get(user=user)
+    except Seller.DoesNotExist:
+        return Response({"error": "Seller profile not found"}, status=404)
+
+    results = {name: query() for name, query in _seller_dashboard_queries(seller).items()}
+    return Response(_seller_dashboard_data(user, seller, results))
 
 
 @api_view(['GET'])
@@ -678,6 +1002,7 @@ def delete_user_address(request, pk):
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@replica_reads
 def admin_list_users(request):
     users = User.objects.all().order_by('-date_joined')
     serializer = UserListSerializer(users, many=True)
@@ -686,9 +1011,11 @@ def admin_list_users(request):
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@replica_reads
 def admin_list_products(request):
-    products = Product.objects.all().order_by('-created_at')
-    serializer = ProductSerializer(products, many=True)
+    context = parse_field_selection(request)
+    products = ProductSerializer.setup_queryset(Product.objects.all(), context).order_by('-created_at')
+    serializer = ProductSerializer(products, many=True, context=context)
     return Response(serializer.data)
 
 
@@ -760,8 +1087,11 @@ def admin_delete_user(request, user_id):
     if user.is_superuser:
         return Response({'error': 'Cannot delete superuser'}, status=status.HTTP_403_FORBIDDEN)
 
-    user.delete()
-    return Response({'message': 'User deleted'}, status=status.HTTP_204_NO_CONTENT)
+    # Block logins right away; the cascading delete runs in the task worker
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    delete_user.enqueue(user.id)
+    return Response({'message': 'User deletion scheduled'}, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['POST'])
@@ -842,4 +1172,205 @@ def user_delivery_assignments(request):
     assignments = DeliveryAssignment.objects.filter(order__user=request.user).order_by('-assigned_at')
     
     serializer = DeliveryAssignmentSerializer(assignments, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def seller_low_stock_products(request):
+    """The seller's products at or below their low stock threshold, emptiest first."""
+    seller = Seller.objects.filter(user=request.user).first()
+    if seller is None:
+        return Response({"error": "Seller profile not found"}, status=404)
+    products = low_stock_products(seller).only(*LowStockProductSerializer.Meta.fields).order_by('stock')
+    return Response({
+        'default_threshold': seller.low_stock_threshold,
+        'products': LowStockProductSerializer(products, many=True).data,
+    })
+
+
+def _parse_threshold(value):
+    """A low stock threshold from a request: None when missing, else a whole number >= 0 (ValueError otherwise)."""
+    if value is None:
+        return None
+    threshold = int(value)
+    if threshold < 0:
+        raise ValueError(threshold)
+    return threshold
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def seller_set_low_stock_threshold(request):
+    """
+    {"threshold": n} sets the seller's default; with "product_id" it sets
+    that product's own threshold instead ("threshold": null clears it).
+    """
+    seller = Seller.objects.filter(user=request.user).first()
+    if seller is None:
+        return Response({"error": "Seller profile not found"}, status=404)
+    threshold = request.data.get('threshold')
+    product_id = request.data.get('product_id')
+    try:
+        threshold = _parse_threshold(threshold)
+    except (TypeError, ValueError):
+        return Response({"error": "threshold must be a whole number"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if product_id is None:
+        if threshold is None:
+            return Response({"error": "threshold is required"}, status=status.HTTP_400_BAD_REQUEST)
+        set_seller_threshold(seller, threshold)
+        return Response({'default_threshold': threshold})
+
+    product = get_object_or_404(Product, id=product_id, seller=seller)
+    set_product_threshold(product, threshold)
+    return Response(LowStockProductSerializer(product).data)
+
+
+# ------------------- Sales Reports -------------------
+
+def _report_range(request):
+    """(from, to) from the query string, inclusive; the last 30 days by default."""
+    date_to = _parse_day(request.query_params.get('to')) or timezone.localdate()
+    date_from = _parse_day(request.query_params.get('from')) or date_to - timedelta(days=29)
+    return date_from, date_to
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@replica_reads
+def admin_sales_report(request):
+    """
+    Store-wide sales from the daily rollups. by=day (default) gives one row
+    per day; by=product|seller|category ranks them by revenue, top `limit`.
+    """
+    try:
+        date_from, date_to = _report_range(request)
+        limit = min(int(request.query_params.get('limit', 50)), 500)
+    except ValueError:
+        return Response({"error": "Dates must be YYYY-MM-DD and limit a number"}, status=status.HTTP_400_BAD_REQUEST)
+    by = request.query_params.get('by', 'day')
+    if by not in ('day', 'product', 'seller', 'category'):
+        return Response({"error": "by must be one of day, product, seller, category"}, status=status.HTTP_400_BAD_REQUEST)
+    if by == 'day':
+        rows = sales_report('total', date_from, date_to, per_day=True)
+    else:
+        rows = sales_report(by, date_from, date_to, limit=limit)
+    return Response({'from': date_from, 'to': date_to, 'by': by, 'rows': rows})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def seller_sales_report(request):
+    """The seller's own sales: by=day (default) or by=product."""
+    seller = Seller.objects.filter(user=request.user).first()
+    if seller is None:
+        return Response({"error": "Seller profile not found"}, status=404)
+    try:
+        date_from, date_to = _report_range(request)
+    except ValueError:
+        return Response({"error": "Dates must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+    by = request.query_params.get('by', 'day')
+    if by == 'day':
+        rows = sales_report('seller', date_from, date_to, keys=[seller.id], per_day=True)
+    elif by == 'product':
+        product_ids = Product.objects.filter(seller=seller).values('id')
+        rows = sales_report('product', date_from, date_to, keys=product_ids)
+    else:
+        return Response({"error": "by must be day or product"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'from': date_from, 'to': date_to, 'by': by, 'rows': rows})
+
+
+# ------------------- Notifications -------------------
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_notifications(request):
+    """Newest first, paginated with page / page_size. ?unread=1 lists unread ones only."""
+    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
+    if request.query_params.get('unread') in ('1', 'true'):
+        notifications = notifications.filter(is_read=False)
+    paginator = NotificationPagination()
+    page = paginator.paginate_queryset(notifications, request)
+    response = paginator.get_paginated_response(NotificationSerializer(page, many=True).data)
+    response.data['unread_count'] = unread_count(request.user)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_unread_notification_count(request):
+    return Response({'unread_count': unread_count(request.user)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read(request):
+    """Mark the notifications in `ids` as read, or all of them when `ids` is omitted."""
+    notifications = Notification.objects.filter(user=request.user, is_read=False)
+    ids = request.data.get('ids')
+    if ids is not None:
+        notifications = notifications.filter(id__in=ids)
+    updated = notifications.update(is_read=True)
+    if updated:
+        invalidate_unread_counts([request.user.pk])
+    return Response({'updated': updated, 'unread_count': unread_count(request.user)})
+
+
+# ------------------- Profiling -------------------
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def admin_profile_token(request):
+    """Token for the X-Profile-Token header; any request carrying it is profiled."""
+    return Response({
+        'token': make_profile_token(request.user),
+        'header': 'X-Profile-Token',
+        'expires_in': settings.PROFILE_TOKEN_MAX_AGE,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_list_profiles(request):
+    profiles = RequestProfile.objects.defer('queries', 'stats').order_by('-created_at')
+    route = request.query_params.get('route')
+    if route:
+        profiles = profiles.filter(route=route)
+    serializer = RequestProfileSummarySerializer(profiles, many=True)
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_profile_detail(request, profile_id):
+    profile = get_object_or_404(RequestProfile, id=profile_id)
+    return Response(RequestProfileSerializer(profile).data)
+
+
+# ------------------- Metrics -------------------
+
+def _is_staff(request):
+    """Staff signed in to the admin site, or presenting a staff JWT."""
+    if request.user.is_staff:
+        return True
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return result is not None and result[0].is_staff
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. Plain Django view so JWT auth doesn't get in
+    the way: scrapers send `Bearer <METRICS_TOKEN>`. Without a token set,
+    only staff can read it.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    if not token and not _is_staff(request):
+        return HttpResponse(status=403)
+    return HttpResponse(render(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,56 @@
+"""
+Cached wishlist product ids, one entry per user.
+
+get_wishlist answers from the cache, and the product endpoints use the same
+set to fill in `is_wishlisted` without a query per product. The entry is
+dropped whenever a WishlistItem is saved or deleted (see signals.py) and
+after the bulk insert in add_to_wishlist, which sends no signals.
+
+A process can only drop entries from its own local memory cache, so
+without SHARED_CACHE the ids are read from the database every time (one
+indexed query) rather than served stale by other workers.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import WishlistItem
+
+
+def _cache_key(user_id):
+    return f'wishlist:{user_id}:ids'
+
+
+def _from_db(user_id):
+    ids = list(WishlistItem.objects.filter(wishlist__user_id=user_id).order_by('pk').values_list('product_id', flat=True))
+    return {'ids': ids, 'version': hashlib.md5(','.join(map(str, ids)).encode()).hexdigest()}
+
+
+def _entry(user):
+    if not settings.SHARED_CACHE:
+        return _from_db(user.pk)
+    key = _cache_key(user.pk)
+    entry = cache.get(key)
+    if entry is None:
+        entry = _from_db(user.pk)
+        cache.set(key, entry, settings.WISHLIST_CACHE_TIMEOUT)
+    return entry
+
+
+def wishlist_ids(user):
+    """Product ids in the user's wishlist, oldest first. Empty for anonymous users."""
+    if not user.is_authenticated:
+        return []
+    return _entry(user)['ids']
+
+
+def wishlist_version(user):
+    """Changes whenever the user's wishlist does; used in ETags."""
+    if not user.is_authenticated:
+        return ''
+    return f"{user.pk}:{_entry(user)['version']}"
+
+
+def invalidate_wishlist(user_id):
+    cache.delete(_cache_key(user_id))
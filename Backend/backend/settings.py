@@ -13,8 +13,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
-from decouple import config
+from decouple import Csv, config
 import dj_database_url
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,6 +27,111 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+# How long checkout holds stock before the sweeper releases it
+STOCK_RESERVATION_TTL = timedelta(minutes=10)
+
+# Stored responses for Idempotency-Key retries, and how long a duplicate
+# request waits (seconds) for the original to finish
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+
+# Background tasks (see api/taskqueue.py). Eager mode runs them inline on commit.
+TASKS_ALWAYS_EAGER = config("TASKS_ALWAYS_EAGER", default=False, cast=bool)
+TASK_RETRY_BACKOFF = 10
+# Running tasks locked longer than this are put back by the workers, which check every TASK_REQUEUE_INTERVAL
+TASK_LOCK_TIMEOUT = timedelta(minutes=15)
+TASK_REQUEUE_INTERVAL = timedelta(minutes=1)
+
+# Request metrics (see api/metrics.py). With several worker processes point
+# METRICS_DIR at a directory they share so /api/metrics/ reports all of them.
+# Scrapers authenticate with METRICS_TOKEN; without one only staff can read it.
+METRICS_DIR = config("METRICS_DIR", default=None)
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = config("METRICS_TOKEN", default=None)
+
+# On-demand profiling (see api/profiling.py) and the slow query log. A
+# threshold of 0 turns slow query logging off.
+PROFILE_TOKEN_MAX_AGE = 3600
+PROFILE_STATS_LIMIT = 60
+PROFILE_STACK_DEPTH = 8
+PROFILE_MAX_STORED = 200
+SLOW_QUERY_THRESHOLD_MS = config("SLOW_QUERY_THRESHOLD_MS", default=500, cast=float)
+
+# Per-user wishlist id sets (see api/wishlist.py), unread notification
+# counts, carts and the catalog name map live in the default cache when it
+# is shared by every process (SHARED_CACHE, i.e. REDIS_URL is set). The
+# local memory fallback isn't shared between workers, and a worker can't
+# drop another's entries, so without REDIS_URL those are read from the
+# database instead.
+SHARED_CACHE = bool(config("REDIS_URL", default=None))
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config("REDIS_URL"),
+        }
+    }
+WISHLIST_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Wishlist notifications (see api/notifications.py). A user gets at most one
+# notification per product and kind per dedupe window, and at most
+# NOTIFICATION_RATE_LIMIT of any kind per rate window.
+NOTIFICATION_BATCH_SIZE = 1000
+NOTIFICATION_DEDUPE_WINDOW = timedelta(hours=24)
+NOTIFICATION_RATE_LIMIT = 5
+NOTIFICATION_RATE_WINDOW = timedelta(hours=24)
+NOTIFICATION_UNREAD_CACHE_TIMEOUT = 60 * 5
+
+# "Frequently bought together" (see api/recommendations.py, run with
+# `manage.py build_recommendations`). Orders younger than the lag wait for
+# the next run.
+RECOMMENDATION_TOP_K = 10
+RECOMMENDATION_MIN_COUNT = 2
+RECOMMENDATION_MAX_ORDER_ITEMS = 50
+RECOMMENDATION_BATCH_ORDERS = 5000
+RECOMMENDATION_ORDER_LAG = timedelta(minutes=5)
+
+# Carts (see api/cart_store.py) are served from the cache and written to the
+# database CART_WRITE_BEHIND_DELAY seconds after a change, by the `carts`
+# task queue (`manage.py run_task_worker --queue carts`); 0 writes through.
+# That needs a cache every worker shares, so without REDIS_URL CART_CACHE is
+# off and carts are read from and written to the database directly.
+# Product fields shown in carts are cached for CART_PRODUCT_CACHE_TIMEOUT.
+CART_CACHE = SHARED_CACHE
+CART_CACHE_TIMEOUT = 60 * 60 * 24
+CART_WRITE_BEHIND_DELAY = config("CART_WRITE_BEHIND_DELAY", default=5, cast=int)
+CART_PRODUCT_CACHE_TIMEOUT = 60 * 5
+
+# Guest carts (see api/guest_cart.py): signed cookies for anonymous shoppers,
+# merged into the user's cart at login
+GUEST_CART_MAX_AGE = timedelta(days=30)
+GUEST_CART_MAX_LINES = 50
+
+# product/<id>/page/ (see api/product_page.py): how many sibling products it
+# shows, and how long its user-independent part is cached
+PRODUCT_PAGE_RELATED_LIMIT = 12
+PRODUCT_PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Search suggestions (see api/suggest.py), ranked by units sold over the
+# popularity window. Each process rebuilds its index at least this often.
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_POPULARITY_WINDOW = timedelta(days=90)
+SUGGEST_REBUILD_INTERVAL = timedelta(hours=1)
+
+# Daily sales rollups (see api/rollups.py), refreshed every SALES_ROLLUP_INTERVAL
+# by the task workers on the default queue, or by hand with `manage.py build_sales_rollups`
+SALES_ROLLUP_LAG = timedelta(minutes=5)
+SALES_ROLLUP_INTERVAL = timedelta(minutes=5)
+
+# Async views (see api/async_views.py). Set ASYNC_VIEWS when serving
+# backend.asgi, e.g. `uvicorn backend.asgi:application --workers 4`, to route
+# the read-heavy endpoints to their async versions. Independent queries in one
+# view and password hashing at login each run on a bounded thread pool.
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+ASYNC_QUERY_WORKERS = config("ASYNC_QUERY_WORKERS", default=8, cast=int)
+ASYNC_PASSWORD_HASH_WORKERS = config("ASYNC_PASSWORD_HASH_WORKERS", default=2, cast=int)
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -85,6 +191,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -93,8 +200,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilingMiddleware',
+    'api.db_router.ReplicaPinMiddleware',
 ]
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-profile-token', 'x-guest-cart', 'x-replica-pin')
+CORS_EXPOSE_HEADERS = ['x-guest-cart', 'x-replica-pin']
 
 ROOT_URLCONF = 'backend.urls'
 
@@ -124,10 +235,26 @@ DATABASES = {
     'default': dj_database_url.parse(
         config("DATABASE_URL"),
         conn_max_age=600,
-        ssl_require=True
+        # Set DATABASE_SSL_REQUIRE=False for local SQLite databases (load tests, seeding)
+        ssl_require=config("DATABASE_SSL_REQUIRE", default=True, cast=bool)
     )
 }
 
+# Read replicas (see api/db_router.py), as comma separated database URLs.
+# Views marked @replica_reads read from them; everything else uses default.
+# Locally, a copy of a SQLite file works as a replica.
+for index, url in enumerate(config("DATABASE_REPLICA_URLS", default="", cast=Csv())):
+    DATABASES[f'replica_{index}'] = {
+        **dj_database_url.parse(url, conn_max_age=600, ssl_require=config("DATABASE_SSL_REQUIRE", default=True, cast=bool)),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+# After a write, the client's reads stay on the primary this long (read-your-writes)
+REPLICA_PIN_SECONDS = 10
+# A replica is re-checked this often, and skipped while it lags more than REPLICA_MAX_LAG seconds
+REPLICA_HEALTH_CHECK_INTERVAL = 10
+REPLICA_MAX_LAG = 5
+
 
 
 # Password validation